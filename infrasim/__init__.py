@@ -96,6 +96,8 @@ def set_option(_dict, *args):
 
 class InfraSimError(Exception):
     def __init__(self, value):
+        # keep args so that errors can be pickled back from double fork
+        self.args = (value,)
         self.value = value
         logger.exception("{}, stack:\n{}".format(self.value,
                                                  str(inspect.stack()[1:]).replace("), (", "),\n(")))
@@ -114,6 +116,7 @@ class DirectoryNotFound(InfraSimError):
 
 class CommandRunFailed(InfraSimError):
     def __init__(self, value, output):
+        self.args = (value, output)
         self.value = value
         self.output = output
 
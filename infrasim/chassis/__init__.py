@@ -4,15 +4,15 @@ Copyright @ 2015 EMC Corporation All Rights Reserved
 *********************************************************
 '''
 import sys
-import subprocess
-import re
 import signal
 import atexit
+from infrasim import InfraSimError
 from infrasim.log import infrasim_log
-from time import sleep
+from infrasim.workspace import ChassisWorkspace
 import traceback
 from share_memory import CShareMemory
 from agent import Agent
+from power import NodePowerMonitor, TITLE_POWER
 
 flag_quit = False
 
@@ -22,32 +22,16 @@ def atexit_cb(sig=signal.SIGTERM, stack=None):
     flag_quit = True
 
 
-def update_power_status(name):
-    # set power status of node according to status of qemu.
-    # 0xff: power is on.
-    # 0x00: power if off.
-    title = "chassis/nodes_power"
-    agent = Agent()
-    agent.open(name)
-    status = agent.get(title)
-    if status:
-        # query status of qemu process.
-        ps = subprocess.Popen("ps -f -C qemu-system-x86_64 | grep '{}_node_.*-node' -o".format(name),
-                              shell=True, stdout=subprocess.PIPE)
-        output = ps.stdout.read()
-        ps.stdout.close()
-        ps.wait()
-        re_obj = re.compile("{}_node_(\d+)-node".format(name))
-        result = re_obj.findall(output)
-        result = map(lambda x: int(x), result)
-
-        # update power status.
-        status = ['\0'] * len(status)
-        for idx in result:
-            if idx < len(status):
-                status[idx] = '\xff'
-        agent.set(title, ''.join(status))
-    agent.close()
+def get_node_names(name, agent):
+    """
+    names of sub nodes in order of their bytes in nodes_power.
+    """
+    try:
+        nodes = ChassisWorkspace.get_chassis_info_in_workspace(name).get("nodes", [])
+        return [node.get("name", "{}_node_{}".format(name, nodes.index(node))) for node in nodes]
+    except InfraSimError:
+        status = agent.get(TITLE_POWER) or ""
+        return ["{}_node_{}".format(name, idx) for idx in range(len(status))]
 
 
 def chassis_main(name, data_file):
@@ -69,9 +53,18 @@ def chassis_main(name, data_file):
             buf = fp.read()
         memory.create(key_name, len(buf))
         memory.write(0, buf)
+        # keep one agent, so section index is built only once
+        agent = Agent()
+        agent.open(name)
+        monitor = NodePowerMonitor(agent, get_node_names(name, agent))
+        monitor.refresh()
         while not flag_quit:
-            sleep(3)
-            update_power_status(name)
+            changed = monitor.poll(3)
+            if changed:
+                logger.info('power status of nodes {} changed: {}'.format(
+                    changed, [ord(x) for x in monitor.get_status()]))
+        monitor.close()
+        agent.close()
         memory.close()
         logger.info('chassis {} closed'.format(name))
     except Exception as e:
@@ -3,92 +3,112 @@
 Copyright @ 2018 Dell EMC Corporation All Rights Reserved
 *********************************************************
 '''
-from infrasim.chassis.dataset import DataSet
+from infrasim.chassis.dataset import DataSet, GENERATION
 from infrasim.chassis.share_memory import CShareMemory
-import os
 import struct
 
 
 class Agent(object):
+    """
+    Access sections of the chassis data set in share memory.
+
+    Offsets of all sections are indexed once at open(), get() and set()
+    then work on slices of the mmap without walking headers or seeking.
+    The index is rebuilt when count of root sections or the generation
+    section changes.
+    """
 
     def __init__(self):
         self.__shm = CShareMemory()
         self.__file = None
+        self.__index = {}
+        self.__root_count = 0
+        self.__generation = None
 
     def open(self, name):
         self.__file = self.__shm.open("share_mem_{}".format(name))
+        self.__build_index()
 
     def close(self):
         self.__shm.close()
+        self.__file = None
+        self.__index = {}
+
+    def __build_index(self):
+        self.__index = DataSet().build_index(self.__file)
+        self.__root_count = struct.unpack_from("I", self.__file, 0)[0]
+        self.__generation = self.__read_generation()
+
+    def __layout_changed(self):
+        return struct.unpack_from("I", self.__file, 0)[0] != self.__root_count or \
+            self.__read_generation() != self.__generation
+
+    def __read_generation(self):
+        item = self.__index.get(GENERATION)
+        if item is None:
+            return None
+        return struct.unpack_from("I", self.__file, item[0])[0]
+
+    def get_generation(self):
+        return self.__generation
 
     def __get_section(self, title):
         """
-        find the section level by level
-        :return <0: not found specified section.
-        :return 0:  more sub sections.
-        :return >0: the length of data
+        :return: (offset, length) of data of a leaf section, None if
+            not found or it has sub sections.
         """
-        ids = title.split('/')
-        self.__file.seek(0, os.SEEK_SET)
-        ds = DataSet()
-        for sub_title in ids:
-            ret = ds.find_section(self.__file, sub_title)
-            if ret is None:
-                return -1
-            self.__file.seek(ret[0], os.SEEK_CUR)
-        if len(ds.get_header_list(self.__file)) == 0:
-            return ret[1] - 4
-        else:
-            return 0
+        if self.__layout_changed():
+            self.__build_index()
+        item = self.__index.get(title)
+        if item is None or not item[2]:
+            return None
+        return item[:2]
 
     def get(self, title):
         """
         return the content of section.
         :param title: full name of section.
-        :return data: whole data of the section.
+        :return data: a read only buffer on the section in share memory,
+            mmap of python 2 doesn't export memoryview.
         """
-        length = self.__get_section(title)
-        if length > 0:
-            return self.__file.read(length)
+        item = self.__get_section(title)
+        if item and item[1] > 0:
+            return buffer(self.__file, item[0], item[1])
         else:
             return None
 
-    def set(self, title, data):
+    def set(self, title, data, offset=0):
         """
         change value of section.
         fail if data length exceeds the size.
         :param  title: full name of section will be modified.
         :param  data:  data will be saved.
+        :param  offset: position in section to save data.
         """
-        length = self.__get_section(title)
-        if length >= len(data):
-            self.__file.write(data)
+        item = self.__get_section(title)
+        if item and item[1] >= offset + len(data):
+            start = item[0] + offset
+            self.__file[start:start + len(data)] = data
             return True
         else:
             return False
 
-    def __iterate_sections(self, length=0):
-        ds = DataSet()
-        start = self.__file.tell()
-        headers = ds.get_header_list(self.__file)
-        if len(headers) == 0:
-            sub_len = length if length < 8 else 8
-            # only read 8 bytes in max
-            content = struct.unpack("{}s".format(sub_len), self.__file.read(sub_len))[0]
-            content = content.rstrip('\0')
-            return (length, content)
-
-        ret = {}
-        for header in headers:
-            self.__file.seek(start + header[1], os.SEEK_SET)
-            subs = self.__iterate_sections(header[2] - 4)
-            ret[header[0]] = subs
-        return ret
-
     def get_all_sections(self):
         """
         get the the dict of data sections.
         Only 8 bytes of data will be returnd.
         """
-        self.__file.seek(0, os.SEEK_SET)
-        return self.__iterate_sections()
+        ret = {}
+        for title in sorted(self.__index.keys()):
+            offset, length, is_leaf = self.__index[title]
+            parent = ret
+            names = title.split('/')
+            for name in names[:-1]:
+                parent = parent.setdefault(name, {})
+            if is_leaf:
+                # only read 8 bytes in max
+                content = self.__file[offset:offset + min(length, 8)].rstrip('\0')
+                parent[names[-1]] = (length, content)
+            else:
+                parent.setdefault(names[-1], {})
+        return ret
@@ -4,7 +4,13 @@ Copyright @ 2018 Dell EMC Corporation All Rights Reserved
 *********************************************************
 '''
 import math
+import os
 import struct
+from collections import OrderedDict
+
+# first leaf section in the root of data set, a counter bumped on every
+# save so that readers can tell the layout is changed
+GENERATION = "generation"
 
 
 class DataSet(object):
@@ -61,7 +67,25 @@ class DataSet(object):
             for key in data.keys():
                 self.write_bin_file(fo, data[key], length[key])
 
+    def __next_generation(self, filename):
+        if not os.path.isfile(filename):
+            return 1
+        with open(filename, 'rb') as fi:
+            buf = fi.read()
+        try:
+            item = self.build_index(buf).get(GENERATION)
+        except struct.error:
+            item = None
+        if item is None:
+            return 1
+        return struct.unpack_from("I", buf, item[0])[0] % 0xffffffff + 1
+
     def save(self, filename):
+        # generation goes first, so it stays at the same offset as long
+        # as the count of root sections is not changed
+        sections = OrderedDict([(GENERATION, struct.pack("I", self.__next_generation(filename)))])
+        sections.update((k, v) for k, v in self.__sections.items() if k != GENERATION)
+        self.__sections = sections
         with open(filename, 'wb') as fo:
             self.write_bin_file(fo, self.__sections, self.__get_length(self.__sections))
 
@@ -80,3 +104,27 @@ class DataSet(object):
         if len(section) == 1:
             return (section[0][1] - len_headers, section[0][2])
         return None
+
+    def build_index(self, buf, start=0, length=None, prefix=""):
+        """
+        Walk all section headers of data set in buf once.
+        :return: dict of full section name -> (offset of data, length of
+            data, is leaf section)
+        """
+        index = {}
+        count = struct.unpack_from("I", buf, start)[0]
+        if length is None:
+            length = len(buf) - start
+        header_size = struct.calcsize(self._fmt)
+        for i in range(count):
+            title, offset, sub_len = struct.unpack_from(self._fmt, buf, start + 4 + i * header_size)
+            title = prefix + title.rstrip('\0')
+            sub_start = start + offset
+            if sub_start + sub_len > start + length:
+                continue
+            if struct.unpack_from("I", buf, sub_start)[0] == 0:
+                index[title] = (sub_start + 4, sub_len - 4, True)
+            else:
+                index[title] = (sub_start + 4, sub_len - 4, False)
+                index.update(self.build_index(buf, sub_start, sub_len, title + "/"))
+        return index
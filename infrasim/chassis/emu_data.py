@@ -6,6 +6,7 @@ This file contains the function to modify Emulation data.
 Refer to Platform Management FRU Information Storage Definition V1.3
 '''
 import re
+from infrasim.materialize import write_file
 
 
 class FruCmd(object):
@@ -347,5 +348,4 @@ class FruFile(object):
         for f in self._fru_cmds:
             f.merge = merge
         result = [str(item) for item in self._data]
-        with open(emu, "w") as fo:
-            fo.write("".join(result))
+        write_file(emu, "".join(result))
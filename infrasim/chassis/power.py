@@ -0,0 +1,137 @@
+'''
+*********************************************************
+Copyright @ 2018 Dell EMC Corporation All Rights Reserved
+*********************************************************
+'''
+import errno
+import os
+import select
+import struct
+from infrasim import config, helper
+
+TITLE_POWER = "chassis/nodes_power"
+# counter bumped on every power change, peers poll it to tell whether
+# nodes_power needs to be read again
+TITLE_POWER_CHANGES = "chassis/power_changes"
+
+POWER_ON = '\xff'
+POWER_OFF = '\0'
+
+
+class NodePowerMonitor(object):
+    """
+    Track power of chassis sub nodes by pid files of their QEMU.
+
+    Node workspaces are watched with inotify for pid file creation and
+    removal, a running QEMU is watched with a pidfd, so a power change is
+    written to share memory once it happens. Only the byte of the node
+    is written, then the change counter is bumped.
+    """
+
+    def __init__(self, agent, node_names):
+        self.__agent = agent
+        self.__pid_files = [os.path.join(config.infrasim_home, node_name,
+                                         ".{}-node.pid".format(node_name))
+                            for node_name in node_names]
+        self.__status = [None] * len(node_names)
+        # node index -> (pid, pidfd)
+        self.__pidfds = {}
+        self.__inotify = -1
+        self.__watched = set()
+
+    def __watch(self):
+        """
+        (Re)watch node workspaces which exist, infrasim home is watched
+        as well to know when a node workspace is created.
+        """
+        folders = set(os.path.dirname(pid_file) for pid_file in self.__pid_files
+                      if os.path.isdir(os.path.dirname(pid_file)))
+        if folders == self.__watched and self.__inotify >= 0:
+            return
+        if self.__inotify >= 0:
+            os.close(self.__inotify)
+        self.__watched = folders
+        self.__inotify = helper.inotify_watch(
+            sorted(folders) + [config.infrasim_home],
+            helper.IN_CLOSE_WRITE | helper.IN_MOVED_TO | helper.IN_CREATE |
+            helper.IN_DELETE | helper.IN_MOVED_FROM)
+
+    def __get_pid(self, index):
+        try:
+            with open(self.__pid_files[index], "r") as f:
+                pid = int(f.readline().strip())
+        except (IOError, ValueError):
+            return None
+        return pid if os.path.exists("/proc/{}".format(pid)) else None
+
+    def __close_pidfd(self, index):
+        if index in self.__pidfds:
+            if self.__pidfds[index][1] is not None:
+                os.close(self.__pidfds[index][1])
+            del self.__pidfds[index]
+
+    def __bump_changes(self):
+        counter = self.__agent.get(TITLE_POWER_CHANGES)
+        if counter is None or len(counter) < 4:
+            return
+        value = struct.unpack("I", counter[:4])[0]
+        self.__agent.set(TITLE_POWER_CHANGES, struct.pack("I", (value + 1) & 0xffffffff))
+
+    def refresh(self):
+        """
+        Read pid files of all nodes and write changed power status.
+        :return: list of index of changed nodes
+        """
+        # watch before reading pid files, so no change in between is lost
+        self.__watch()
+        changed = []
+        for index in range(len(self.__pid_files)):
+            pid = self.__get_pid(index)
+            if pid is None or self.__pidfds.get(index, (None,))[0] != pid:
+                self.__close_pidfd(index)
+            if pid is not None and index not in self.__pidfds:
+                self.__pidfds[index] = (pid, helper.pidfd_open(pid))
+
+            status = POWER_OFF if pid is None else POWER_ON
+            if status != self.__status[index]:
+                if self.__agent.set(TITLE_POWER, status, index):
+                    changed.append(index)
+                self.__status[index] = status
+
+        if changed:
+            self.__bump_changes()
+        return changed
+
+    def get_status(self):
+        return list(self.__status)
+
+    def poll(self, timeout):
+        """
+        Wait up to timeout for pid file or process events, then refresh.
+        Without inotify, it works as polling every timeout seconds.
+        """
+        self.__watch()
+
+        fds = [fd for _, fd in self.__pidfds.values() if fd is not None]
+        if self.__inotify >= 0:
+            fds.append(self.__inotify)
+        try:
+            readable, _, _ = select.select(fds, [], [], timeout)
+        except select.error as e:
+            # interrupted by signal, let caller check its quit flag
+            if e.args[0] != errno.EINTR:
+                raise
+            readable = []
+        if self.__inotify in readable:
+            try:
+                os.read(self.__inotify, 4096)
+            except OSError:
+                pass
+        return self.refresh()
+
+    def close(self):
+        for index in self.__pidfds.keys():
+            self.__close_pidfd(index)
+        if self.__inotify >= 0:
+            os.close(self.__inotify)
+            self.__inotify = -1
@@ -3,8 +3,36 @@
 Copyright @ 2018 Dell EMC Corporation All Rights Reserved
 *********************************************************
 '''
+import hashlib
+import os
 import struct
 import uuid
+from infrasim.materialize import replace_file
+
+# compiled formats, (fmt, length) -> (struct.Struct, pad) of a table
+_structs = {}
+_table_structs = {}
+
+
+def get_struct(fmt):
+    if fmt not in _structs:
+        _structs[fmt] = struct.Struct(fmt)
+    return _structs[fmt]
+
+
+def get_table_struct(fmt, length):
+    """
+    Struct of fmt without fields beyond length of table, and number of
+    fields dropped
+    """
+    key = (fmt, length)
+    if key not in _table_structs:
+        pad = 0
+        while get_struct(fmt).size > length:
+            fmt = fmt[:-1]
+            pad = pad + 1
+        _table_structs[key] = (get_struct(fmt), pad)
+    return _table_structs[key]
 
 
 class SMBios(object):
@@ -76,23 +104,73 @@ class SMBios(object):
         '''
         self.__dict = []
         self.__entry = None
-        self.__type1_index = None
-        self.__type2_index = None
-        self.__type3_index = None
-        self.__type4_index_list = []
-        self.__type16_index_list = []
-        self.__type17_index_list = []
+        # type -> index list of structures in __dict
+        self.__index = {}
         self.save = None
+        self.__src = src
         with open(src, "rb") as fin:
             self._buf = fin.read()
+        self.__digest = hashlib.sha1(self._buf).digest()
         if self.__decode() is False:
             if self.__decode3() is False:
                 if self.__decode_no_entry() is False:
                     raise Exception("can't identify bios version")
 
+    @property
+    def __type1_index(self):
+        return self.__index.get(SMBios.TYPE_SystemInformation, [None])[-1]
+
+    @property
+    def __type2_index(self):
+        return self.__index.get(SMBios.TYPE_BaseboardInformation, [None])[-1]
+
+    @property
+    def __type3_index(self):
+        return self.__index.get(SMBios.TYPE_ChassisInformation, [None])[-1]
+
+    @property
+    def __type4_index_list(self):
+        return self.__index.get(SMBios.TYPE_ProcessorInformation, [])
+
+    @property
+    def __type16_index_list(self):
+        return self.__index.get(SMBios.TYPE_PhysicalMemoryArrayInformation, [])
+
+    @property
+    def __type17_index_list(self):
+        return self.__index.get(SMBios.TYPE_MemoryDevice, [])
+
+    def get_structures(self, smbios_type):
+        """
+        Raw structures of smbios_type
+        """
+        return [self.__dict[idx] for idx in self.__index.get(smbios_type, [])]
+
+    def __write(self, dst, data):
+        """
+        Write data to dst unless dst has the same content already
+        :return: True if dst is written
+        """
+        digest = hashlib.sha1(data).digest()
+        if os.path.abspath(dst) == os.path.abspath(self.__src):
+            same = digest == self.__digest
+        elif os.path.isfile(dst):
+            with open(dst, "rb") as f:
+                same = digest == hashlib.sha1(f.read()).digest()
+        else:
+            same = False
+        if same:
+            return False
+
+        # dst may be a hard link of the bundled data file
+        replace_file(dst, data)
+        if os.path.abspath(dst) == os.path.abspath(self.__src):
+            self.__digest = digest
+        return True
+
     def __decode3(self):
         # unpack Entry Table
-        entry = struct.unpack_from(SMBios._fmt3_entry, self._buf, 0)
+        entry = get_struct(SMBios._fmt3_entry).unpack_from(self._buf, 0)
         if not (entry[0] == "_SM3_" and entry[3] == 3):
             return False
         self.save = self.__save3
@@ -110,18 +188,14 @@ class SMBios(object):
         entry[8] = size
 
         # update checksum
+        entry_struct = get_struct(SMBios._fmt3_entry)
         entry[SMBios.Id_Checksum] = 0
-        entry[SMBios.Id_Checksum] = self.__get_checksum(struct.pack(SMBios._fmt3_entry, *entry))
+        entry[SMBios.Id_Checksum] = self.__get_checksum(entry_struct.pack(*entry))
 
         # calculate pad between header and tables.
         offset = entry[9]
-        pad = offset - struct.calcsize(SMBios._fmt3_entry)
-        # write file.
-        with open(dst, "wb") as fo:
-            fo.write(struct.pack(SMBios._fmt3_entry, *entry))
-            fo.write('\0' * pad)
-            for item in self.__dict:
-                fo.write(item)
+        pad = offset - entry_struct.size
+        return self.__write(dst, "".join([entry_struct.pack(*entry), '\0' * pad] + self.__dict))
 
     def __decode_no_entry(self):
         # process special file without Entry Table
@@ -141,40 +215,28 @@ class SMBios(object):
         Decode the SMBIOSEntryPoint
         """
         # unpack Entry Table
-        entry = struct.unpack_from(SMBios._fmt_entry, self._buf, 0)
+        entry = get_struct(SMBios._fmt_entry).unpack_from(self._buf, 0)
         if not (entry[0] == "_SM_"):
             return False
 
         self.save = self.__save
         self.__entry = entry
-        offset = struct.calcsize(SMBios._fmt_entry)
+        offset = get_struct(SMBios._fmt_entry).size
         for _ in range(0, entry[12]):
             offset = self.__decode_entry(offset)
         return True
 
     def __decode_entry(self, offset):
-        header = struct.unpack_from(SMBios._fmt_header, self._buf, offset)
+        header = get_struct(SMBios._fmt_header).unpack_from(self._buf, offset)
         start = offset
-        offset += header[1]
-        while self._buf[offset] != '\0' or self._buf[offset + 1] != '\0':
-            offset += 1
-        offset += 2
-        structure = self._buf[start:offset]
-
-        if header[0] == SMBios.TYPE_SystemInformation:  # mark the system information structure.
-            self.__type1_index = len(self.__dict)
-        if header[0] == SMBios.TYPE_ChassisInformation:
-            self.__type3_index = len(self.__dict)
-        if header[0] == SMBios.TYPE_BaseboardInformation:
-            self.__type2_index = len(self.__dict)
-        if header[0] == SMBios.TYPE_ProcessorInformation:
-            self.__type4_index_list.append(len(self.__dict))
-        if header[0] == SMBios.TYPE_PhysicalMemoryArrayInformation:
-            self.__type16_index_list.append(len(self.__dict))
-        if header[0] == SMBios.TYPE_MemoryDevice:
-            self.__type17_index_list.append(len(self.__dict))
-
-        self.__dict.append(structure)
+        # strings of structure end with double NUL
+        end = self._buf.find('\0\0', offset + header[1])
+        if end < 0:
+            raise IndexError("SMBIOS structure at {} is not terminated".format(start))
+        offset = end + 2
+
+        self.__index.setdefault(header[0], []).append(len(self.__dict))
+        self.__dict.append(self._buf[start:offset])
         return offset
 
     def __get_checksum(self, buf):
@@ -194,32 +256,27 @@ class SMBios(object):
         entry[SMBios.Id_TotalLength] = size
         entry[SMBios.Id_NumberOfStructures] = len(self.__dict)
         # update checksum
+        entry_struct = get_struct(SMBios._fmt_entry)
         entry[SMBios.Id_Checksum2] = 0
         entry[SMBios.Id_Checksum] = 0
-        entry[SMBios.Id_Checksum2] = self.__get_checksum(struct.pack(SMBios._fmt_entry, *entry)[0x10:0x1f])
-        entry[SMBios.Id_Checksum] = self.__get_checksum(struct.pack(SMBios._fmt_entry, *entry))
-        # write file.
-        with open(dst, "wb") as fo:
-            fo.write(struct.pack(SMBios._fmt_entry, *entry))
-            for item in self.__dict:
-                fo.write(item)
+        entry[SMBios.Id_Checksum2] = self.__get_checksum(entry_struct.pack(*entry)[0x10:0x1f])
+        entry[SMBios.Id_Checksum] = self.__get_checksum(entry_struct.pack(*entry))
+        return self.__write(dst, "".join([entry_struct.pack(*entry)] + self.__dict))
 
     def _unpack_table(self, fmt, src):
         # unpack data. drop end of fmt if src is not long enough.
         length = ord(src[1])
-        pad = 0
-        while struct.calcsize(fmt) > length:
-            fmt = fmt[:-1]
-            pad = pad + 1
-        result = list(struct.unpack_from(fmt, src))
+        table_struct, pad = get_table_struct(fmt, length)
+        result = list(table_struct.unpack_from(src))
         result.extend([0] * pad)
         strings = src[length:].split('\0')
         return result, strings
 
     def _pack_table(self, fmt, info, strings):
         # pack data. drop end of src if fmt is smaller.
-        info[1] = struct.calcsize(fmt)
-        result = struct.pack(fmt, *info)
+        table_struct = get_struct(fmt)
+        info[1] = table_struct.size
+        result = table_struct.pack(*info)
         result += '\0'.join(strings)
         return result
 
@@ -313,9 +370,9 @@ class SMBios(object):
         # decode header.
         info, string_values = self._unpack_table(chassis_info_fmt, chassis_info)
         # check contained element count * size
-        if info[1] > struct.calcsize(chassis_info_fmt):
-            chassis_info_fmt = chassis_info_fmt + "{}s".format(info[1] - struct.calcsize(chassis_info_fmt))
-            info.append(chassis_info[struct.calcsize(chassis_info_fmt):info[1]])
+        if info[1] > get_struct(chassis_info_fmt).size:
+            chassis_info_fmt = chassis_info_fmt + "{}s".format(info[1] - get_struct(chassis_info_fmt).size)
+            info.append(chassis_info[get_struct(chassis_info_fmt).size:info[1]])
 
         # modify SN string.
         sn_index = info[6]  # position number of SN.
@@ -9,9 +9,11 @@ from texttable import Texttable
 from global_status import InfrasimMonitor
 from infrasim import InfraSimError
 from infrasim.config_manager import NodeMap, ChassisMap
+from infrasim.fleet import Fleet
 import infrasim.helper as helper
 from infrasim.init import infrasim_init
 import infrasim.model as model
+from infrasim.model.elements.storage_diskarray import TopoCache
 from infrasim.version import version
 from infrasim.workspace import Workspace, ChassisWorkspace
 from infrasim.yaml_loader import YAMLLoader
@@ -292,8 +294,12 @@ class NodeCommands(object):
         node.precheck()
 
     @args("node_name", nargs='?', default="default", help="Specify node name to start")
-    def start(self, node_name):
+    @args("--rebuild-topology", dest="rebuild_topology", action="store_true",
+          help="Build disk array topology again even if storage backend is not changed")
+    def start(self, node_name, rebuild_topology=False):
         try:
+            if rebuild_topology:
+                TopoCache.clear_node(node_name)
             if Workspace.check_workspace_exists(node_name):
                 node_info = Workspace.get_node_info_in_workspace(node_name)
             else:
@@ -306,7 +312,7 @@ class NodeCommands(object):
             logger_cmd.error("cmd res: {}".format(e.value))
             return
 
-        node.start()
+        elapsed = node.start()
 
         vnc_port = node_info["compute"].get("vnc_display", 1) + 5900
 
@@ -316,20 +322,26 @@ class NodeCommands(object):
             "VNC port: {} \n" \
             "Either host IP: {} \n" \
             "depending on host in which network VNC viewer is running \n"\
-            "Node log folder: {}". \
+            "Node log folder: {}\n" \
+            "Tasks started in {:.3f}s ({})". \
             format(node.get_node_name(),
                    vnc_port,
                    helper.ip4_addresses(netns=node_info.get("namespace")),
-                   infrasim_log.get_log_path(node_name))
+                   infrasim_log.get_log_path(node_name),
+                   node.get_startup_time(),
+                   ", ".join("{}: {:.3f}s".format(task.get_task_name(), elapsed[task.get_task_name()])
+                             for task in node.get_task_list() if task.get_task_name() in elapsed))
         logger_cmd.info("cmd res: start node {} OK".format(node_name))
 
     @node_workspace_exists
     @args("node_name", nargs='?', default="default", help="Specify node name to stop")
     def stop(self, node_name):
         try:
-            node_info = Workspace.get_node_info_in_workspace(node_name)
-            node = model.CNode(node_info)
-            self._node_preinit(node, ignore_check=True)
+            node = model.NodeRuntime.load(node_name)
+            if node is None:
+                node_info = Workspace.get_node_info_in_workspace(node_name)
+                node = model.CNode(node_info)
+                self._node_preinit(node, ignore_check=True)
             node.stop()
             logger_cmd.info("cmd res: stop node {} OK".format(node_name))
         except InfraSimError as e:
@@ -349,9 +361,11 @@ class NodeCommands(object):
     @args("node_name", nargs='?', default="default", help="Specify node name to check status")
     def status(self, node_name):
         try:
-            node_info = Workspace.get_node_info_in_workspace(node_name)
-            node = model.CNode(node_info)
-            self._node_preinit(node, ignore_check=True)
+            node = model.NodeRuntime.load(node_name)
+            if node is None:
+                node_info = Workspace.get_node_info_in_workspace(node_name)
+                node = model.CNode(node_info)
+                self._node_preinit(node, ignore_check=True)
             node.status()
             logger_cmd.info("cmd res: get node {} status OK".format(node_name))
         except InfraSimError as e:
@@ -530,6 +544,46 @@ class ChassisCommands(object):
         logger_cmd.info("cmd res: destroy chassis {} OK".format(chassis_name))
 
 
+class FleetCommands(object):
+
+    @staticmethod
+    def _check_result(fleet, action, nodes):
+        # exit with failure if any node fails, so that automation finds a
+        # partial start or stop of fleet
+        failed = fleet.get_failed()
+        if failed:
+            logger_cmd.error("cmd res: {} fleet {} failed on {} node(s): {}".format(
+                action, " ".join(nodes), len(failed),
+                ", ".join("{} ({})".format(name, error) for name, _, _, error in failed)))
+            sys.exit(1)
+        logger_cmd.info("cmd res: {} fleet {} OK".format(action, " ".join(nodes)))
+
+    @args("nodes", nargs='+', help="Node names, comma separated lists or glob patterns, e.g. 'rack1-*'")
+    @args("-j", "--concurrency", dest="concurrency", type=int, default=None,
+          help="Maximum number of nodes to start at the same time, default is CPU count")
+    @args("--rebuild-topology", dest="rebuild_topology", action="store_true",
+          help="Build disk array topology again even if storage backend is not changed")
+    def start(self, nodes, concurrency=None, rebuild_topology=False):
+        fleet = Fleet(nodes, concurrency, rebuild_topology=rebuild_topology)
+        fleet.start()
+        fleet.print_summary("start")
+        self._check_result(fleet, "start", nodes)
+
+    @args("nodes", nargs='+', help="Node names, comma separated lists or glob patterns, e.g. 'rack1-*'")
+    @args("-j", "--concurrency", dest="concurrency", type=int, default=None,
+          help="Maximum number of nodes to stop at the same time, default is CPU count")
+    def stop(self, nodes, concurrency=None):
+        fleet = Fleet(nodes, concurrency)
+        fleet.stop()
+        fleet.print_summary("stop")
+        self._check_result(fleet, "stop", nodes)
+
+    @args("nodes", nargs='*', default=["*"], help="Node names, comma separated lists or glob patterns")
+    def status(self, nodes):
+        Fleet(nodes).print_status()
+        logger_cmd.info("cmd res: get fleet {} status OK".format(" ".join(nodes)))
+
+
 class InfrasimCommands(object):
 
     def status(self):
@@ -579,6 +633,7 @@ def get_func_args(func, matchargs):
 CATEGORIES = {
     'node': NodeCommands,
     'chassis': ChassisCommands,
+    'fleet': FleetCommands,
     'config': ConfigCommands,
     'global': InfrasimCommands,
 }
@@ -44,3 +44,6 @@ infrasim_default_config = os.path.join(infrasim_node_config_map, "default.yml")
 
 # infrasim log location
 infrasim_log_dir = "/var/log/infrasim"
+
+# infrasim log level, set INFRASIM_LOG_LEVEL=DEBUG to log QMP and vBMC console traffic
+infrasim_log_level = os.environ.get('INFRASIM_LOG_LEVEL') or "INFO"
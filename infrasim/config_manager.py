@@ -8,7 +8,7 @@ import os
 import yaml
 from texttable import Texttable
 from infrasim import config
-from infrasim.yaml_loader import YAMLLoader
+from infrasim.yaml_loader import YAMLLoader, load_yaml
 from infrasim import DirectoryNotFound, InfraSimError
 from .log import LoggerType, infrasim_log
 
@@ -77,7 +77,7 @@ class BaseMap(object):
 
         dst = os.path.join(self.__mapping_folder, "{}.yml".format(item_name))
         with open(dst, 'w') as fp:
-            yaml.dump(node_info, fp, default_flow_style=False, indent=2)
+            yaml.safe_dump(node_info, fp, default_flow_style=False, indent=2)
         os.chmod(dst, 0o664)
 
         self.__name_list.append(item_name)
@@ -140,7 +140,7 @@ class BaseMap(object):
         try:
             node_info["name"] = item_name
             with open(dst, 'w') as fp:
-                yaml.dump(node_info, fp, default_flow_style=False)
+                yaml.safe_dump(node_info, fp, default_flow_style=False)
             os.chmod(dst, 0o664)
         except IOError:
             logger_config.exception("Item {}'s configuration failed to be updated.".format(item_name))
@@ -190,9 +190,7 @@ class BaseMap(object):
             raise InfraSimError("Item {0}'s configuration is not defined.\n"
                                 "Please add config mapping with command:\n"
                                 "    infrasim config add {0} [your_config_path]".format(item_name))
-        with open(src, 'r') as fp:
-            node_info = YAMLLoader(fp).get_data()
-            return node_info
+        return load_yaml(src)
 
 
 class NodeMap(BaseMap):
@@ -226,8 +224,7 @@ class ChassisMap(BaseMap):
         logger_config = self.get_logger(item_name)
 
         try:
-            with open(config_path, 'r') as fp:
-                chassis_info = YAMLLoader(fp).get_data()
+            chassis_info = load_yaml(config_path)
         except IOError:
             logger_config.exception("Cannot find config {}".format(config_path))
             raise InfraSimError("Cannot find config {}".format(config_path))
@@ -258,7 +255,7 @@ class ChassisMap(BaseMap):
             node['type'] = chassis_info['type']
             filename = os.path.join("/tmp/", node_name + ".yml")
             with open(filename, 'w') as fo:
-                yaml.dump(node, fo, default_flow_style=False)
+                yaml.safe_dump(node, fo, default_flow_style=False)
             os.chmod(filename, 0o664)
             sub_nodes.append({"node_name": node_name, "file": filename})
             logger_config.info("Item {}'s yaml file: {}".format(node_name, filename))
@@ -0,0 +1,129 @@
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+# -*- coding: utf-8 -*-
+
+import copy
+import json
+import os
+import time
+from infrasim import config
+from infrasim.cpu_topology import get_host_topology
+from infrasim.filelock import FileLock
+from infrasim.log import infrasim_log, LoggerType
+
+logger = infrasim_log.get_logger(LoggerType.model.value)
+
+LEDGER = ".cpu_ledger.json"
+
+# an allocation whose task hasn't written pid file yet is kept this long
+STARTING_GRACE = 5 * 60
+
+
+def get_pid(pid_file):
+    try:
+        with open(pid_file, "r") as f:
+            return int(f.read().strip())
+    except (IOError, ValueError):
+        return -1
+
+
+class CPULedger(object):
+    """
+    Physical cpus and NUMA nodes held by each running node, shared by all
+    infrasim processes on this host through a file under infrasim home.
+
+    An allocation is given up when its node stops. Allocations of nodes
+    which are gone without stop are found by their pid file and dropped
+    when the ledger is used next time.
+    """
+
+    def __init__(self, path=None):
+        self.__path = path or os.path.join(config.infrasim_home, LEDGER)
+
+    def __load(self):
+        try:
+            with open(self.__path, "r") as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    def __save(self, ledger):
+        folder = os.path.dirname(self.__path)
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        tmp = "{}.tmp".format(self.__path)
+        with open(tmp, "w") as f:
+            json.dump(ledger, f, indent=4, sort_keys=True)
+        os.rename(tmp, self.__path)
+
+    @staticmethod
+    def __is_alive(entry):
+        pid = get_pid(entry["pid_file"])
+        if pid > 0:
+            return os.path.exists("/proc/{}".format(pid))
+        # task is starting
+        return not os.path.exists(entry["pid_file"]) and \
+            time.time() - entry.get("time", 0) < STARTING_GRACE
+
+    def __reconcile(self, ledger):
+        for owner in list(ledger):
+            if not self.__is_alive(ledger[owner]):
+                logger.info("[CPULedger] Release cpus {} of stopped {}".
+                            format(ledger[owner]["cpus"], owner))
+                del ledger[owner]
+        return ledger
+
+    def get_allocations(self):
+        with FileLock("{}.lck".format(self.__path)).acquire():
+            return self.__reconcile(self.__load())
+
+    def get_cpus(self, owner):
+        """
+        :return: processors held by owner, [] if it holds none
+        """
+        return self.get_allocations().get(owner, {}).get("cpus", [])
+
+    def allocate(self, owner, pid_file, num, numactl):
+        """
+        Allocate num processors to owner on the socket where least
+        processors are held, an earlier allocation of owner is replaced.
+        :param numactl: NumaCtl of this host, it's not changed
+        :return: list of processors
+        """
+        with FileLock("{}.lck".format(self.__path)).acquire():
+            ledger = self.__reconcile(self.__load())
+            ledger.pop(owner, None)
+
+            available = copy.deepcopy(numactl)
+            held = {}
+            for entry in ledger.values():
+                available.reserve(entry["cpus"])
+                for cpu in entry["cpus"]:
+                    socket = numactl.get_socket(cpu)
+                    held[socket] = held.get(socket, 0) + 1
+            sockets = sorted(numactl._socket_list, key=lambda s: (held.get(s, 0), s))
+
+            cpus = available.get_cpu_list(num, sockets) or []
+            topology = get_host_topology()
+            nodes = sorted(set([topology.get_node(cpu) for cpu in cpus if cpu in topology.get_cpus()]))
+            ledger[owner] = {
+                "cpus": cpus,
+                "nodes": nodes,
+                "pid_file": pid_file,
+                "time": time.time()
+            }
+            self.__save(ledger)
+            logger.info("[CPULedger] Allocate cpus {} on NUMA nodes {} to {}".format(cpus, nodes, owner))
+            return cpus
+
+    def release(self, owner):
+        if not os.path.exists(self.__path):
+            return
+        with FileLock("{}.lck".format(self.__path)).acquire():
+            ledger = self.__load()
+            if ledger.pop(owner, None) is not None:
+                self.__save(ledger)
+                logger.info("[CPULedger] Release cpus of {}".format(owner))
@@ -0,0 +1,117 @@
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+# -*- coding: utf-8 -*-
+
+import os
+import re
+
+SYS_CPU = "/sys/devices/system/cpu"
+
+# topology of this host, read once per process
+_host_topology = None
+
+
+def parse_cpu_list(text):
+    """
+    Parse cpu list like "0-3,8,10-11" as in sysfs and taskset
+    """
+    cpus = []
+    for item in str(text).strip().split(","):
+        item = item.strip()
+        if not item:
+            continue
+        if "-" in item:
+            first, last = item.split("-", 1)
+            cpus.extend(range(int(first), int(last) + 1))
+        else:
+            cpus.append(int(item))
+    return cpus
+
+
+def format_cpu_list(cpus):
+    return ",".join([str(cpu) for cpu in cpus])
+
+
+def get_host_topology():
+    global _host_topology
+    if _host_topology is None:
+        _host_topology = CPUTopology()
+    return _host_topology
+
+
+class CPUTopology(object):
+    """
+    Sockets, cores, hyper-thread siblings and NUMA nodes of online CPUs,
+    read from sysfs in one pass.
+    """
+
+    def __init__(self, root=SYS_CPU):
+        self.__root = root
+        # cpu -> (socket, core id, numa node)
+        self.__cpus = {}
+        self.online = self.__read_list("online")
+        self.isolated = self.__read_list("isolated")
+
+        for name in os.listdir(root):
+            m = re.match(r"cpu(\d+)$", name)
+            if not m:
+                continue
+            cpu = int(m.group(1))
+            if self.online and cpu not in self.online:
+                continue
+            cpu_dir = os.path.join(root, name)
+            socket = self.__read_int(os.path.join(cpu_dir, "topology", "physical_package_id"))
+            core = self.__read_int(os.path.join(cpu_dir, "topology", "core_id"), cpu)
+            node = 0
+            for entry in os.listdir(cpu_dir):
+                m = re.match(r"node(\d+)$", entry)
+                if m:
+                    node = int(m.group(1))
+                    break
+            self.__cpus[cpu] = (socket, core, node)
+
+    def __read_list(self, name):
+        try:
+            with open(os.path.join(self.__root, name), "r") as f:
+                return parse_cpu_list(f.read())
+        except IOError:
+            return []
+
+    @staticmethod
+    def __read_int(path, default=0):
+        try:
+            with open(path, "r") as f:
+                return int(f.read().strip())
+        except (IOError, ValueError):
+            return default
+
+    def get_cpus(self):
+        return sorted(self.__cpus)
+
+    def get_socket(self, cpu):
+        return self.__cpus[cpu][0]
+
+    def get_node(self, cpu):
+        return self.__cpus[cpu][2]
+
+    def get_core(self, cpu):
+        """
+        :return: (socket, core id), the same for hyper-thread siblings
+        """
+        return self.__cpus[cpu][:2]
+
+    def get_siblings(self, cpu):
+        core = self.get_core(cpu)
+        return [c for c in self.get_cpus() if self.get_core(c) == core]
+
+    def get_sockets(self):
+        return sorted(set([value[0] for value in self.__cpus.values()]))
+
+    def get_nodes(self):
+        return sorted(set([value[2] for value in self.__cpus.values()]))
+
+    def get_node_cpus(self, node):
+        return [cpu for cpu in self.get_cpus() if self.get_node(cpu) == node]
@@ -0,0 +1,186 @@
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+# -*- coding: utf-8 -*-
+
+import fnmatch
+import multiprocessing
+import os
+import time
+from texttable import Texttable
+from infrasim import config, InfraSimError
+from infrasim.config_manager import NodeMap
+from infrasim.global_status import get_dir_list, NodeStatus
+from infrasim.log import infrasim_log, LoggerType
+from infrasim.model import CNode, NodeRuntime
+from infrasim.model.elements.storage_diskarray import TopoCache
+from infrasim.workspace import Workspace
+
+logger = infrasim_log.get_logger(LoggerType.cmd.value)
+
+# CNode objects are built once in the CLI process and inherited by the
+# pool workers through fork(), they hold loggers and locks which can't
+# be pickled to the workers.
+_fleet_nodes = {}
+
+
+def _run_node_action(job):
+    node_name, action = job
+    start = time.time()
+    try:
+        getattr(_fleet_nodes[node_name], action)()
+    except Exception as e:
+        return node_name, False, time.time() - start, str(getattr(e, "value", e))
+    return node_name, True, time.time() - start, ""
+
+
+class Fleet(object):
+    """
+    Start, stop or check a group of nodes in one infrasim process.
+
+    Node models are initialized in this process, then start/stop runs in
+    a pool of worker processes; a fresh process per node keeps setns()
+    and double fork of each node apart from others.
+    """
+
+    def __init__(self, patterns, concurrency=None, rebuild_topology=False):
+        self.__patterns = []
+        for pattern in patterns:
+            self.__patterns.extend([p.strip() for p in pattern.split(",") if p.strip()])
+        self.__concurrency = concurrency or multiprocessing.cpu_count()
+        self.__rebuild_topology = rebuild_topology
+        self.__results = []
+        self.__elapsed = 0
+
+    @staticmethod
+    def get_workspace_names():
+        if not os.path.isdir(config.infrasim_home):
+            return []
+        return [name for name in get_dir_list(config.infrasim_home)
+                if not name.startswith(".") and Workspace.check_node(name)]
+
+    @staticmethod
+    def get_config_names():
+        try:
+            return NodeMap().get_name_list()
+        except InfraSimError:
+            return []
+
+    def match(self, candidates):
+        matched = []
+        for pattern in self.__patterns:
+            for name in sorted(candidates):
+                if fnmatch.fnmatchcase(name, pattern) and name not in matched:
+                    matched.append(name)
+        return matched
+
+    def __build_node(self, node_name, ignore_check):
+        if ignore_check:
+            # a started node is stopped from its runtime manifest
+            runtime = NodeRuntime.load(node_name)
+            if runtime is not None:
+                return runtime
+        if self.__rebuild_topology:
+            TopoCache.clear_node(node_name)
+        if Workspace.check_workspace_exists(node_name):
+            node_info = Workspace.get_node_info_in_workspace(node_name)
+        else:
+            node_info = NodeMap().get_item_info(node_name)
+        node = CNode(node_info)
+        node.init()
+        if not ignore_check:
+            node.precheck()
+        return node
+
+    def __run(self, action, node_names):
+        self.__results = []
+        _fleet_nodes.clear()
+        start = time.time()
+
+        for node_name in node_names:
+            init_start = time.time()
+            try:
+                _fleet_nodes[node_name] = self.__build_node(node_name, action != "start")
+            except Exception as e:
+                self.__results.append((node_name, False, time.time() - init_start,
+                                       str(getattr(e, "value", e))))
+
+        jobs = [(node_name, action) for node_name in node_names if node_name in _fleet_nodes]
+        if jobs:
+            pool = multiprocessing.Pool(min(self.__concurrency, len(jobs)), maxtasksperchild=1)
+            try:
+                for result in pool.imap_unordered(_run_node_action, jobs):
+                    self.__results.append(result)
+                    logger.info("[Fleet] {} node {}: {} in {:.3f}s {}".format(
+                        action, result[0], "OK" if result[1] else "failed", result[2], result[3]))
+            finally:
+                pool.close()
+                pool.join()
+
+        _fleet_nodes.clear()
+        self.__elapsed = time.time() - start
+        return self.__results
+
+    def start(self):
+        node_names = self.match(set(self.get_workspace_names()) | set(self.get_config_names()))
+        return self.__run("start", node_names)
+
+    def stop(self):
+        return self.__run("stop", self.match(self.get_workspace_names()))
+
+    def get_results(self):
+        return self.__results
+
+    def get_failed(self):
+        """
+        :return: results of nodes failed in last start or stop
+        """
+        return [result for result in self.__results if not result[1]]
+
+    def print_summary(self, action):
+        if not self.__results:
+            print "No node matches {}.".format(" ".join(self.__patterns))
+            return
+
+        table = Texttable()
+        table.set_deco(Texttable.HEADER)
+        table.set_cols_align(["l", "l", "r", "l"])
+        rows = [["name", "result", "latency(s)", "error"]]
+        for node_name, ok, elapsed, error in sorted(self.__results):
+            rows.append([node_name, "OK" if ok else "failed", "{:.3f}".format(elapsed), error or "-"])
+        table.add_rows(rows)
+        print table.draw()
+
+        failed = len(self.get_failed())
+        latency = [r[2] for r in self.__results]
+        print "{} {} node(s) in {:.3f}s with concurrency {}, {} failed, " \
+              "latency min/avg/max: {:.3f}/{:.3f}/{:.3f}s".format(
+                  action, len(self.__results), self.__elapsed, self.__concurrency, failed,
+                  min(latency), sum(latency) / len(latency), max(latency))
+
+    def print_status(self):
+        node_names = self.match(self.get_workspace_names())
+        if not node_names:
+            print "No node matches {}.".format(" ".join(self.__patterns))
+            return
+
+        task_names = NodeStatus.TASK_NAMES
+        table = Texttable()
+        table.set_deco(Texttable.HEADER)
+        rows = [["name", "state"] + ["{} pid".format(t) for t in task_names]]
+        running = 0
+        for node_name in node_names:
+            pids = NodeStatus(node_name).get_node_status()
+            if "node" in pids and "bmc" in pids:
+                state = "running"
+                running += 1
+            elif pids:
+                state = "partial"
+            else:
+                state = "stopped"
+            rows.append([node_name, state] + [pids.get(t, "-") for t in task_names])
+        table.add_rows(rows)
+        print table.draw()
+        print "{} of {} node(s) running".format(running, len(node_names))
@@ -1,10 +1,10 @@
 import os
-import re
 from texttable import Texttable
 from infrasim.config import infrasim_home
-from infrasim import run_command
 from infrasim.workspace import Workspace
-from infrasim.helper import run_in_namespace
+
+# st field of a listening socket in /proc/net/tcp
+TCP_LISTEN = "0A"
 
 
 def get_dir_list(p):
@@ -32,8 +32,93 @@ def get_task_pid(pid_file):
     return pid
 
 
+def get_socket_inodes(pid):
+    """
+    Inodes of sockets opened by pid, from links in /proc/<pid>/fd
+    """
+    inodes = set()
+    fd_dir = "/proc/{}/fd".format(pid)
+    try:
+        fds = os.listdir(fd_dir)
+    except OSError:
+        return inodes
+
+    for fd in fds:
+        try:
+            link = os.readlink(os.path.join(fd_dir, fd))
+        except OSError:
+            continue
+        if link.startswith("socket:["):
+            inodes.add(link[8:-1])
+    return inodes
+
+
+def read_proc_net(pid, protocol):
+    """
+    Sockets in network namespace of pid, /proc/<pid>/net shows the
+    namespace of pid so no setns() is needed.
+    :param protocol: "TCP" or "UDP", TCP sockets are listed only in LISTEN
+    :return: {inode: port}
+    """
+    sockets = {}
+    for name in [protocol.lower(), "{}6".format(protocol.lower())]:
+        try:
+            with open("/proc/{}/net/{}".format(pid, name), "r") as f:
+                lines = f.readlines()[1:]
+        except IOError:
+            continue
+
+        for line in lines:
+            fields = line.split()
+            if len(fields) < 10:
+                continue
+            if protocol == "TCP" and fields[3] != TCP_LISTEN:
+                continue
+            sockets[fields[9]] = str(int(fields[1].rsplit(":", 1)[1], 16))
+    return sockets
+
+
+class PortCollector(object):
+    """
+    Collect UDP and listening TCP ports of processes, same as
+    "lsof -Pan -p <pid> -iUDP" and "-iTCP -sTCP:LISTEN" but socket tables
+    are read once per network namespace for all processes.
+    """
+
+    def __init__(self):
+        # network namespace -> {protocol: {inode: port}}
+        self.__sockets = {}
+
+    def __get_sockets(self, pid):
+        try:
+            netns = os.readlink("/proc/{}/ns/net".format(pid))
+        except OSError:
+            netns = pid
+
+        if netns not in self.__sockets:
+            self.__sockets[netns] = {
+                "UDP": read_proc_net(pid, "UDP"),
+                "TCP": read_proc_net(pid, "TCP")
+            }
+        return self.__sockets[netns]
+
+    def get_ports(self, pid):
+        inodes = get_socket_inodes(pid)
+        if not inodes:
+            return []
+
+        sockets = self.__get_sockets(pid)
+        port_list = []
+        for protocol in ["UDP", "TCP"]:
+            ports = set([port for inode, port in sockets[protocol].items() if inode in inodes])
+            port_list.extend(sorted(ports, key=int))
+        return port_list
+
+
 class NodeStatus(object):
 
+    TASK_NAMES = ['socat', 'bmc', 'node', 'racadm', 'ipmi_console']
+
     def __init__(self, node_name):
         self.__node_name = node_name
 
@@ -44,7 +129,7 @@ class NodeStatus(object):
         self.__node_info = Workspace.get_node_info_in_workspace(self.__node_name)
         self.netns = self.__node_info.get("namespace", None)
         base_path = os.path.join(infrasim_home, self.__node_name)
-        task_name = ['socat', 'bmc', 'node', 'racadm', 'ipmi_console']
+        task_name = NodeStatus.TASK_NAMES
         task_list = {}
         for task in task_name:
             if task is 'ipmi_console':
@@ -59,20 +144,7 @@ class NodeStatus(object):
                     task_list[task] = "{:<6}".format(task_pid)
         return task_list
 
-    def __get_ports(self, pid, protocol):
-        cmd = "lsof -Pan -p {} -i{}".format(pid, protocol)
-        if protocol == "TCP":
-            cmd = " ".join([cmd, "-sTCP:LISTEN"])
-        try:
-            res = run_command(cmd)
-        except Exception:
-            return None
-
-        ports = re.findall(r":(\d.+?) ", res[1])
-        return set(ports)
-
-    @run_in_namespace
-    def get_port_status(self):
+    def get_port_status(self, collector=None):
         # SSH ~ ipmi-console        default: 9300   tcp
         # ipmi-console ~ ipmi-sim   default: 9000   tcp
         # ipmi-sim ~ qemu           default: 9002   tcp
@@ -80,10 +152,11 @@ class NodeStatus(object):
         # telnet client ~ qemu      default: 2345   tcp
         # VNC client ~ qemu         default: 5901   tcp
         # telnet client ~ racadm    default: 10022  tcp
+        collector = collector or PortCollector()
         port_list = []
         task_pid = []
         base_path = os.path.join(infrasim_home, self.__node_name)
-        task_name = ['socat', 'bmc', 'node', 'racadm', 'ipmi_console']
+        task_name = NodeStatus.TASK_NAMES
         for task in task_name:
             if task is 'ipmi_console':
                 pid_file = os.path.join(base_path, '.ipmi_console.pid')
@@ -95,12 +168,7 @@ class NodeStatus(object):
                 if pid > 0 and os.path.exists("/proc/{}".format(pid)):
                     task_pid.append(pid)
         for pid in task_pid:
-            ports = self.__get_ports(pid, "UDP")
-            if ports:
-                port_list.extend(ports)
-            ports = self.__get_ports(pid, "TCP")
-            if ports:
-                port_list.extend(ports)
+            port_list.extend(collector.get_ports(pid))
         return port_list
 
 
@@ -124,16 +192,15 @@ class InfrasimMonitor(object):
         if not self.__node_list:
             print "There is no node."
             return
+        node_status = {}
         for node in self.__node_list:
-            nd_status = node.get_node_status()
+            nd_status = node_status[node] = node.get_node_status()
             if 'socat' in nd_status:
                 socat_flag = True
             if 'racadm' in nd_status:
                 racadm_flag = True
             if 'ipmi_console' in nd_status:
                 ipmi_console_flag = True
-            if racadm_flag and ipmi_console_flag and socat_flag:
-                break
         header_line = ['name', 'netns', 'bmc pid', 'node pid']
         width = [12, 12, 6, 6]
         align = ['c', 'l', 'l', 'l']
@@ -156,8 +223,9 @@ class InfrasimMonitor(object):
         align.append('l')
         rows = []
         rows.append(header_line)
+        collector = PortCollector()
         for node in self.__node_list:
-            nd_status = node.get_node_status()
+            nd_status = node_status[node]
             line = [node.get_node_name()]
             if getattr(node, 'netns'):
                 line.append(node.netns)
@@ -188,7 +256,7 @@ class InfrasimMonitor(object):
                     line.append('-')
             port = ''
             try:
-                for p in node.get_port_status():
+                for p in node.get_port_status(collector):
                     port += "{} ".format(p)
             except Exception:
                 pass
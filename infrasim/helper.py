@@ -4,6 +4,9 @@ Copyright @ 2015 EMC Corporation All Rights Reserved
 *********************************************************
 '''
 import os
+import errno
+import logging
+import fcntl
 import time
 import sys
 import hashlib
@@ -16,9 +19,11 @@ import string
 import random
 import subprocess
 import struct
+import select
+import threading
 from functools import wraps
 from functools import reduce
-from ctypes import cdll
+from ctypes import cdll, CDLL, sizeof, c_ulong
 from socket import AF_INET, AF_INET6, inet_ntop
 from ctypes import (
     Structure, Union, POINTER,
@@ -30,11 +35,14 @@ from ctypes import (
 import paramiko
 import yaml
 from infrasim import InfraSimError, run_command
+from infrasim.log import log_writer, fork
 from . import logger
 
 
 libc = cdll.LoadLibrary('libc.so.6')
 setns = libc.setns
+# a libc handle which keeps errno for get_errno()
+libc_errno = CDLL('libc.so.6', use_errno=True)
 
 # From linux/socket.h
 AF_UNIX = 1
@@ -42,6 +50,29 @@ AF_UNIX = 1
 SIOCGIFCONF = 0x8912
 SIOCGIFADDR = 0x8915
 
+# From linux/inotify.h
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+
+# From linux/fs.h, clone all extents of a file
+FICLONE = 0x40049409
+
+# From unistd.h
+SEEK_DATA = 3
+SEEK_HOLE = 4
+
+# pidfd_open shares the same number on all architectures
+SYS_PIDFD_OPEN = 434
+
+# From net/tcp_states.h
+TCP_LISTEN = 0x0A
+
+# From linux/net.h
+SO_ACCEPTCON = 0x00010000
+
 
 def check_kvm_existence():
     if os.path.exists("/dev/kvm"):
@@ -257,6 +288,218 @@ def check_if_port_in_use(address, port):
         return False
 
 
+def _get_proc_net_path(name):
+    # /proc/net follows network namespace of the main thread, while
+    # /proc/thread-self/net follows the calling thread, which matters
+    # when tasks are started in namespace by different threads
+    path = os.path.join("/proc/thread-self/net", name)
+    if os.path.exists(path):
+        return path
+    return os.path.join("/proc/net", name)
+
+
+def check_if_port_listening(port):
+    """
+    True if a TCP socket in current network namespace listens on port,
+    unlike check_if_port_in_use(), no connection is made to the listener
+    """
+    port = int(port)
+    for name in ["tcp", "tcp6"]:
+        try:
+            with open(_get_proc_net_path(name), "r") as fp:
+                fp.readline()
+                for line in fp:
+                    # sl local_address rem_address st ...
+                    fields = line.split()
+                    if int(fields[3], 16) == TCP_LISTEN and \
+                            int(fields[1].rsplit(":", 1)[1], 16) == port:
+                        return True
+        except IOError:
+            continue
+    return False
+
+
+def check_if_unix_socket_listening(path):
+    """
+    True if a UNIX socket is bound to path and accepts connections
+    """
+    path = os.path.abspath(path)
+    try:
+        with open(_get_proc_net_path("unix"), "r") as fp:
+            fp.readline()
+            for line in fp:
+                # Num RefCount Protocol Flags Type St Inode Path
+                fields = line.split()
+                if len(fields) > 7 and fields[7] == path and \
+                        int(fields[3], 16) & SO_ACCEPTCON:
+                    return True
+    except IOError:
+        pass
+    return False
+
+
+def pidfd_open(pid):
+    """
+    Get a file descriptor of process pid which becomes readable once the
+    process exits, None if the kernel doesn't support pidfd
+    """
+    try:
+        fd = libc.syscall(SYS_PIDFD_OPEN, int(pid), 0)
+    except Exception:
+        return None
+    return fd if fd >= 0 else None
+
+
+def sched_setaffinity(pid, cpus):
+    """
+    Set CPU affinity of thread or process pid to cpus in this process,
+    instead of running taskset
+    """
+    cpus = [int(cpu) for cpu in cpus]
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(int(pid), cpus)
+        return
+
+    bits = 8 * sizeof(c_ulong)
+    mask = (c_ulong * (max(cpus) // bits + 1))()
+    for cpu in cpus:
+        mask[cpu // bits] |= 1 << (cpu % bits)
+    if libc_errno.sched_setaffinity(int(pid), sizeof(mask), mask) != 0:
+        err = get_errno()
+        raise OSError(err, "sched_setaffinity({}, {}): {}".format(pid, cpus, os.strerror(err)))
+
+
+def sched_getaffinity(pid, max_cpus=1024):
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(int(pid)))
+
+    bits = 8 * sizeof(c_ulong)
+    mask = (c_ulong * (max_cpus // bits))()
+    if libc_errno.sched_getaffinity(int(pid), sizeof(mask), mask) != 0:
+        err = get_errno()
+        raise OSError(err, "sched_getaffinity({}): {}".format(pid, os.strerror(err)))
+    return [cpu for cpu in range(max_cpus) if mask[cpu // bits] >> (cpu % bits) & 1]
+
+
+def reflink(src, dst):
+    """
+    Make dst a copy-on-write clone of src, return False if the file
+    system doesn't support it, e.g. ext4, nothing is left at dst then
+    """
+    fd_src = os.open(src, os.O_RDONLY)
+    try:
+        fd_dst = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0644)
+        try:
+            fcntl.ioctl(fd_dst, FICLONE, fd_src)
+        except IOError:
+            os.close(fd_dst)
+            os.remove(dst)
+            return False
+        os.close(fd_dst)
+        return True
+    finally:
+        os.close(fd_src)
+
+
+def copy_sparse(src, dst, chunk=1 << 20):
+    """
+    Copy data extents of src to dst and leave holes as holes, so an
+    empty image stays sparse
+    """
+    with open(src, "rb") as f_src, open(dst, "wb") as f_dst:
+        fd = f_src.fileno()
+        size = os.fstat(fd).st_size
+        offset = 0
+        while offset < size:
+            try:
+                data = os.lseek(fd, offset, SEEK_DATA)
+                hole = os.lseek(fd, data, SEEK_HOLE)
+            except OSError as e:
+                if e.errno == errno.ENXIO:
+                    # no data after offset
+                    break
+                # SEEK_DATA is not supported, take the rest as data
+                data, hole = offset, size
+            f_src.seek(data)
+            f_dst.seek(data)
+            while data < hole:
+                buf = f_src.read(min(chunk, hole - data))
+                if not buf:
+                    break
+                f_dst.write(buf)
+                data += len(buf)
+            offset = hole
+        f_dst.truncate(size)
+
+
+def wait_pid_exit(pid, timeout):
+    """
+    Block until process pid exits or timeout, return True if it exits
+    """
+    fd = pidfd_open(pid)
+    if fd is None:
+        start = time.time()
+        while os.path.exists("/proc/{}".format(pid)):
+            if time.time() - start > timeout:
+                return False
+            time.sleep(0.05)
+        return True
+
+    try:
+        r, _, _ = select.select([fd], [], [], timeout)
+        return len(r) > 0
+    finally:
+        os.close(fd)
+
+
+def inotify_watch(folders, mask):
+    """
+    Get an inotify file descriptor watching events in mask on folders,
+    -1 if inotify is not available or any folder can't be watched
+    """
+    try:
+        fd = libc.inotify_init1(os.O_NONBLOCK)
+    except AttributeError:
+        return -1
+    if fd < 0:
+        return -1
+    for folder in folders:
+        if libc.inotify_add_watch(fd, folder, mask) < 0:
+            os.close(fd)
+            return -1
+    return fd
+
+
+def wait_file_event(path, predicate, timeout):
+    """
+    Block until predicate() is True or timeout, predicate is evaluated
+    each time a file is created or written in the folder of path
+    """
+    fd = inotify_watch([os.path.dirname(os.path.abspath(path))],
+                       IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE)
+
+    start = time.time()
+    try:
+        while True:
+            if predicate():
+                return True
+            remaining = timeout - (time.time() - start)
+            if remaining <= 0:
+                return False
+            if fd < 0:
+                time.sleep(min(0.5, remaining))
+                continue
+            r, _, _ = select.select([fd], [], [], remaining)
+            if r:
+                try:
+                    os.read(fd, 4096)
+                except OSError:
+                    pass
+    finally:
+        if fd >= 0:
+            os.close(fd)
+
+
 def get_ns_path(nspath=None, nsname=None, nspid=None):
     if nsname:
         nspath = '/var/run/netns/%s' % nsname
@@ -287,6 +530,10 @@ class Namespace(object):
         self.myns.close()
 
 
+# serializes fork of threads in this process
+_fork_lock = threading.Lock()
+
+
 def double_fork(func):
 
     @wraps(func)
@@ -299,7 +546,10 @@ def double_fork(func):
         # do the UNIX double-fork magic, see Stevens' "Advanced
         # Programming in the UNIX Environment" for details (ISBN 0201563177)
         try:
-            pid = os.fork()
+            # tasks of a node are started by parallel threads, they fork
+            # one at a time and wait for their children in parallel
+            with _fork_lock:
+                pid = fork()
             if pid > 0:
                 rsp = p_r.recv()
                 if "ret" in rsp:
@@ -333,6 +583,8 @@ def double_fork(func):
                 "ret": ret
             })
 
+        # os._exit skips atexit, write queued logs of this process first
+        log_writer.flush()
         os._exit(os.EX_OK)
 
     return wrapper
@@ -542,7 +794,25 @@ class NumaCtl(object):
 
         self.__class__.HT_FACTOR = len(self._core_map[(0, 0)])
 
-    def get_cpu_list(self, num):
+    def reserve(self, cpus):
+        """
+        Mark processors in cpus as not available, e.g. held by other nodes
+        """
+        for key, processors in self._core_map.items():
+            for i, processor in enumerate(processors):
+                if processor in cpus:
+                    self._core_map_avai[key][i] = False
+
+    def get_socket(self, cpu):
+        for key, processors in self._core_map.items():
+            if cpu in processors:
+                return key[0]
+        return None
+
+    def get_cpu_list(self, num, sockets=None):
+        """
+        :param sockets: order to try sockets, all sockets by default
+        """
         processor_use_up = True
         cpu_list = []
         assigned_count = 0
@@ -550,7 +820,7 @@ class NumaCtl(object):
         socket = None
 
         # Find available socket (with enough processor) to bind
-        for socket in self._socket_list:
+        for socket in sockets or self._socket_list:
             count_avai = 0
             for core in self._core_list:
                 for avai in self._core_map_avai[(socket, core)]:
@@ -625,28 +895,159 @@ class NumaCtl(object):
             print "\n"
 
 
+# characters which open or close a JSON value, or start a string
+_JSON_TOKEN = re.compile(r'[{}\[\]"]')
+# characters which end a JSON string or escape the next one
+_JSON_STRING_TOKEN = re.compile(r'["\\]')
+
+
+class JSONStream(object):
+    """
+    Incremental decoder of a stream of JSON objects such as QMP. Data is
+    fed in fragments of any size, every fragment is scanned once to find
+    where an object ends, so a large reply is not parsed again and again
+    until it's complete.
+
+    With a socket, read_message() and read_reply() receive until a message
+    is complete; asynchronous QMP events met on the way are kept in events.
+    """
+
+    def __init__(self, sock=None, bufsize=65536):
+        self.sock = sock
+        self.bufsize = bufsize
+        self.events = []
+        self.greeting = None
+        # fragments of the message being scanned
+        self.__fragments = []
+        self.__depth = 0
+        self.__in_string = False
+        self.__escape = False
+        # raw text of complete messages
+        self.__messages = []
+
+    def feed(self, data):
+        """
+        Scan a fragment of the stream.
+        :return: number of messages ready to read
+        """
+        start = 0
+        pos = 0
+        if self.__escape and data:
+            pos = 1
+            self.__escape = False
+
+        while True:
+            if self.__in_string:
+                m = _JSON_STRING_TOKEN.search(data, pos)
+                if m is None:
+                    break
+                if m.group() == "\\":
+                    if m.end() == len(data):
+                        self.__escape = True
+                        break
+                    pos = m.end() + 1
+                else:
+                    self.__in_string = False
+                    pos = m.end()
+                continue
+
+            m = _JSON_TOKEN.search(data, pos)
+            if m is None:
+                break
+            pos = m.end()
+            if m.group() == '"':
+                self.__in_string = True
+            elif m.group() in "{[":
+                self.__depth += 1
+            elif self.__depth > 0:
+                self.__depth -= 1
+                if self.__depth == 0:
+                    self.__fragments.append(data[start:pos])
+                    self.__messages.append("".join(self.__fragments).strip())
+                    self.__fragments = []
+                    start = pos
+
+        if self.__depth > 0 or self.__in_string:
+            self.__fragments.append(data[start:])
+        return len(self.__messages)
+
+    def pop_raw(self):
+        """
+        :return: raw text of next complete message, None if there is none
+        """
+        if self.__messages:
+            return self.__messages.pop(0)
+        return None
+
+    def pop_message(self):
+        raw = self.pop_raw()
+        return None if raw is None else json.loads(raw)
+
+    def read_raw(self):
+        """
+        Receive from socket until a message is complete.
+        :return: raw text of the message, "" if the peer closes
+        """
+        while not self.__messages:
+            data = self.sock.recv(self.bufsize)
+            if not data:
+                return ""
+            self.feed(data)
+        return self.pop_raw()
+
+    def read_message(self):
+        raw = self.read_raw()
+        return json.loads(raw) if raw else None
+
+    def read_reply(self, qmp_id=None):
+        """
+        Receive until a QMP reply, of request qmp_id if it's given. Greeting
+        and events are kept aside, replies of other requests are dropped.
+        :return: the reply, None if the peer closes
+        """
+        while True:
+            msg = self.read_message()
+            if msg is None:
+                return None
+            if "QMP" in msg:
+                self.greeting = msg
+            elif "event" in msg:
+                self.events.append(msg)
+            elif qmp_id is None or msg.get("id") == qmp_id:
+                return msg
+
+
 class UnixSocket(object):
 
-    def __init__(self, path):
+    def __init__(self, path, timeout=10):
         self.path = path
         self.s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # QMP serves one client at a time, don't wait forever for a turn
+        self.s.settimeout(timeout)
+        self.stream = JSONStream(self.s)
 
     def connect(self):
         self.s.connect(self.path)
 
     def send(self, payload):
-        logger.info("C:" + json.dumps(payload, indent=4).decode('string_escape'))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("C:%s", payload)
         self.s.send(payload)
 
     def recv(self):
-        rsp = ""
-        while True:
-            snip = self.s.recv(1024)
-            rsp += snip
-            if len(snip) < 1024:
-                break
-
-        logger.info("S:" + json.dumps(rsp, indent=4).decode('string_escape'))
+        """
+        Receive the QMP greeting, then a reply on each call. Events sent
+        before a reply are kept in stream.events.
+        :return: the message as JSON text, "" if the peer closes
+        """
+        if self.stream.greeting is None:
+            msg = self.stream.read_message()
+            self.stream.greeting = msg
+        else:
+            msg = self.stream.read_reply()
+        rsp = "" if msg is None else json.dumps(msg)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("S:%s", rsp)
         return rsp
 
     def close(self):
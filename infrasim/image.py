@@ -0,0 +1,182 @@
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+# -*- coding: utf-8 -*-
+
+import copy
+import errno
+import json
+import math
+import os
+import struct
+from infrasim import config, helper, run_command
+from infrasim.filelock import FileLock
+from infrasim.log import infrasim_log, LoggerType
+
+logger = infrasim_log.get_logger(LoggerType.model.value)
+
+# base images are shared by all nodes under infrasim home
+IMAGE_CACHE = ".images"
+
+QCOW2_MAGIC = "QFI\xfb"
+
+# preallocation modes which keep a sparse copy equal to the image
+SPARSE_PREALLOCATION = [None, "off", "metadata"]
+
+# (path, mtime, size) -> image info
+_info_cache = {}
+
+# (device of image cache, device of drive folder) -> reflink supported
+_reflink_cache = {}
+
+
+def get_cache_folder():
+    return os.path.join(config.infrasim_home, IMAGE_CACHE)
+
+
+def make_cache_folder():
+    folder = get_cache_folder()
+    try:
+        os.makedirs(folder)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+    return folder
+
+
+def can_reflink(path):
+    """
+    Whether a base image in cache can be reflinked to path, checked once
+    per pair of file systems
+    """
+    folder = make_cache_folder()
+    drive_folder = os.path.dirname(os.path.abspath(path))
+    key = (os.stat(folder).st_dev, os.stat(drive_folder).st_dev)
+    if key not in _reflink_cache:
+        probe = os.path.join(folder, ".reflink.{}".format(os.getpid()))
+        clone = os.path.join(drive_folder, ".reflink.{}".format(os.getpid()))
+        with open(probe, "wb") as f:
+            f.write("\0")
+        try:
+            _reflink_cache[key] = helper.reflink(probe, clone)
+            if _reflink_cache[key]:
+                os.remove(clone)
+        finally:
+            os.remove(probe)
+    return _reflink_cache[key]
+
+
+def get_image_bytes(size):
+    """
+    Image size in bytes for size in GB, qemu-img rounds it up to sector
+    """
+    return int(math.ceil(size * 1024 * 1024 * 1024 / 512) * 512)
+
+
+def create_image(path, fmt, size, cluster_size=None, preallocation=None):
+    """
+    Create an empty image with qemu-img, a raw image without
+    preallocation is just a sparse file so no qemu-img is needed
+    """
+    if fmt == "raw" and preallocation in [None, "off"]:
+        with open(path, "wb") as f:
+            f.truncate(get_image_bytes(size))
+        return
+
+    create_option_list = []
+    if cluster_size:
+        create_option_list.append("=".join(["cluster_size", cluster_size]))
+
+    if preallocation:
+        create_option_list.append("=".join(["preallocation", preallocation]))
+
+    command = "qemu-img create -f {0} {1} {2}G".format(fmt, path, size)
+    if len(create_option_list) > 0:
+        command = "{} -o {}".format(command, ",".join(create_option_list))
+
+    run_command(command)
+
+
+def get_base_image(fmt, size, cluster_size=None, preallocation=None):
+    """
+    Get the cached empty image of these attributes, create it on first use.
+    Sector size is not a part of the key, it's a property of the QEMU
+    device and doesn't change the image file.
+    """
+    folder = make_cache_folder()
+
+    path = os.path.join(folder, "base-{}-{}G-{}-{}.img".format(
+        fmt, size, cluster_size or "default", preallocation or "off"))
+    if os.path.exists(path):
+        return path
+
+    with FileLock("{}.lck".format(path)).acquire():
+        if not os.path.exists(path):
+            logger.info("[Image] Creating base image: {}".format(path))
+            # other nodes may look at the cache at the same time, only
+            # a complete image is put at path
+            tmp = "{}.{}.tmp".format(path, os.getpid())
+            try:
+                create_image(tmp, fmt, size, cluster_size, preallocation)
+                os.rename(tmp, path)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+    return path
+
+
+def create_drive_image(path, fmt, size, cluster_size=None, preallocation=None):
+    """
+    Create a drive image as a copy of the cached base image. The copy is a
+    reflink clone where the file system supports it, otherwise a sparse
+    copy. A preallocated image can't be copied sparse, so without reflink
+    it is created with qemu-img as before, and no base image is made for
+    it.
+    """
+    if preallocation not in SPARSE_PREALLOCATION and not can_reflink(path):
+        create_image(path, fmt, size, cluster_size, preallocation)
+        return
+
+    base = get_base_image(fmt, size, cluster_size, preallocation)
+    if helper.reflink(base, path):
+        return
+    if preallocation in SPARSE_PREALLOCATION:
+        helper.copy_sparse(base, path)
+    else:
+        create_image(path, fmt, size, cluster_size, preallocation)
+
+
+def read_image_header(path, fmt=None):
+    """
+    Get format and virtual size from image header without qemu-img,
+    None if the image is not a regular qcow2 or raw file
+    """
+    st = os.stat(path)
+    if not os.path.isfile(path):
+        return None
+
+    with open(path, "rb") as f:
+        header = f.read(32)
+    if header[:4] == QCOW2_MAGIC and fmt in [None, "qcow2"]:
+        return {"format": "qcow2", "virtual-size": struct.unpack(">Q", header[24:32])[0]}
+    if fmt == "raw":
+        return {"format": "raw", "virtual-size": st.st_size}
+    return None
+
+
+def get_image_info(path, fmt=None):
+    """
+    Same as "qemu-img info --output json", results are cached by path,
+    mtime and size of the image
+    """
+    st = os.stat(path)
+    key = (path, st.st_mtime, st.st_size)
+    if key not in _info_cache:
+        info = read_image_header(path, fmt)
+        if info is None:
+            cmd = "qemu-img info {} --output json".format(path)
+            info = json.loads(run_command(cmd)[1])
+        _info_cache[key] = info
+    return copy.deepcopy(_info_cache[key])
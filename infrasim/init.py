@@ -1,6 +1,5 @@
 import os
 import uuid
-import jinja2
 import random
 import string
 import shutil
@@ -17,6 +16,7 @@ from .version import version
 from infrasim.yaml_loader import YAMLLoader
 from .config import infrasim_default_config
 from infrasim.workspace import Workspace
+from infrasim.materialize import render_template, write_file
 
 mac_base = "00:60:16:"
 pre_serial_number = "infrasim"
@@ -74,14 +74,10 @@ def init_infrasim_conf(node_type):
     disks.append({"size": 8})
 
     # Render infrasim.yml
-    infrasim_conf = ""
-    with open(config.infrasim_config_template, "r") as f:
-        infrasim_conf = f.read()
-    template = jinja2.Template(infrasim_conf)
-    infrasim_conf = template.render(node_type=node_type, disks=disks, networks=networks,
+    infrasim_conf = render_template(os.path.basename(config.infrasim_config_template),
+                                    node_type=node_type, disks=disks, networks=networks,
                                     splash_path=splash_path, uuid=uuid_num, serial_number=sn)
-    with open(config.infrasim_default_config, "w") as f:
-        f.write(infrasim_conf)
+    write_file(config.infrasim_default_config, infrasim_conf)
 
 
 def config_library_link():
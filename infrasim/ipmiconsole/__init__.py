@@ -22,6 +22,7 @@ from infrasim import run_command
 from .command import Command_Handler
 from .common import msg_queue
 from .common import IpmiError
+from .scheduler import SensorScheduler
 import env
 import sdr
 import common
@@ -29,7 +30,7 @@ from infrasim.log import infrasim_log, LoggerType
 
 
 logger_ic = infrasim_log.get_logger(LoggerType.ipmi_console.value)
-sensor_thread_list = []
+sensor_scheduler = None
 
 
 def atexit_cb(sig=signal.SIGTERM, stack=None):
@@ -125,35 +126,28 @@ def _stop_console():
         env.local_env.server.stop()
 
 
-def _spawn_sensor_thread():
-    for sensor_obj in sdr.sensor_list:
-        if sensor_obj.get_event_type() == "threshold":
-            if env.local_env.quit_flag:
-                return
-            t = threading.Thread(target=sensor_obj.execute)
-            t.setDaemon(True)
-            sensor_thread_list.append(t)
-            common.logger.info('spawn a thread for sensor ' +
-                               sensor_obj.get_name())
-            t.start()
+def _start_sensor_scheduler():
+    global sensor_scheduler
+    if env.local_env.quit_flag:
+        return
+    sensor_scheduler = SensorScheduler()
+    sensors = [s for s in sdr.sensor_list if s.get_event_type() == "threshold"]
+    for sensor_obj in sensors:
+        sensor_scheduler.add(sensor_obj)
+    common.logger.info("sensor scheduler starts for {} threshold sensors".format(len(sensors)))
+    sensor_scheduler.start()
 
 
 def _free_resource():
-    # close telnet session
-    # common.close_telnet_session()
-
-    # join the sensor thread
     for sensor_obj in sdr.sensor_list:
         sensor_obj.set_mode("user")
-        # set quit flag
         sensor_obj.set_quit(True)
-        # acquire the lock that before notify
-        sensor_obj.condition.acquire()
-        sensor_obj.condition.notify()
-        sensor_obj.condition.release()
 
-    for thread in sensor_thread_list:
-        thread.join()
+    if sensor_scheduler:
+        sensor_scheduler.stop()
+
+    # close telnet session
+    common.close_telnet_session()
 
 
 def start(instance="default"):
@@ -177,11 +171,12 @@ def start(instance="default"):
                        format(instance, fp.read().strip()))
 
     # parse the sdrs and build all sensors
-    sdr.parse_sdrs()
+    sdr.parse_sdrs(env.EMU_FILE,
+                   os.path.join(config.infrasim_home, instance, ".sdr.bin"))
 
-    # running thread for each threshold based sensor
+    # one scheduler thread drives all threshold based sensors
     _start_monitor(instance)
-    _spawn_sensor_thread()
+    _start_sensor_scheduler()
     _start_console(instance)
 
 
@@ -4,7 +4,7 @@ Copyright @ 2015 EMC Corporation All Rights Reserved
 *********************************************************
 '''
 from .common import logger, msg_queue
-from .sdr import sensor_id_map
+from .sdr import sensor_id_map, refresh_sensor_values
 from .sel import SEL
 
 import sel
@@ -21,38 +21,55 @@ class Command_Handler:
     def add_msg(self, msg):
         logger.info(msg)
 
-    def get_sensor_instance(self, str_num, mc=int("0x20", 16)):
+    def get_sensor_instance(self, str_num, mc=int("0x20", 16), quiet=False):
         """
         return sensor instance if the sensor exist
         otherwise return None
+        :param quiet: don't report error of an illegal id or a sensor not
+            exist
         """
         try:
             sensor_id = int(str_num, 16)
         except ValueError:
-            logger.error('illegal sensor id %s' % str_num)
+            if not quiet:
+                logger.error('illegal sensor id %s' % str_num)
             return None
 
         if (sensor_id, mc) not in sensor_id_map:
-            error_info = "sensor: {0} not exist\n".format(str_num)
-            msg_queue.put(error_info)
+            if not quiet:
+                error_info = "sensor: {0} not exist\n".format(str_num)
+                msg_queue.put(error_info)
             return None
 
         return sensor_id_map[(sensor_id, mc)]
 
     # args contain the sensor id list
     def output_sensors(self, args):
+        # sensors up to the first one not exist are read from vBMC in one
+        # batch, and printed before the error of that one as they were
+        # printed one by one
+        sensors = []
         for str_num in args:
-            sensor_obj = self.get_sensor_instance(str_num)
+            sensor_obj = self.get_sensor_instance(str_num, quiet=True)
             if sensor_obj is None:
-                return
+                break
+            sensors.append(sensor_obj)
+
+        refresh_sensor_values(sensors)
+        for sensor_obj in sensors:
             info = sensor_obj.output_info()
             info += '\n'
             msg_queue.put(info)
 
+        if len(sensors) < len(args):
+            self.get_sensor_instance(args[len(sensors)])
+
     def dump_all_sensor_info(self):
         """
         dump all sensor info
         """
+        elapsed = refresh_sensor_values(sensor_id_map.values())
+        logger.info("read {} sensors from vBMC in {:.3f}s".format(len(sensor_id_map), elapsed))
         for ID, sensor_obj in sensor_id_map.items():
             info = sensor_obj.output_info()
             info += '\n'
@@ -91,14 +108,8 @@ class Command_Handler:
 
             sensor_obj.set_fault_level(fault_level)
 
-        pre_mode = sensor_obj.get_mode()
+        # sensor scheduler is woken up to update it at once
         sensor_obj.set_mode(mode)
-        if (mode == "auto" or mode == 'fault') and pre_mode == "user":
-            logger.info('set to auto mode and wakeup sensor thread')
-            # notify the sensor thread
-            sensor_obj.condition.acquire()
-            sensor_obj.condition.notify()
-            sensor_obj.condition.release()
         sensor_name = sensor_obj.get_name()
         info = "Sensor " + str(sensor_name) + " changed to " + mode + '\n'
         msg_queue.put(info)
@@ -134,6 +145,36 @@ class Command_Handler:
         else:
             return
 
+    # ######### SENSOR INTERVAL FUNCTION ##########
+    def handle_sensor_interval(self, args):
+        """
+        Available 'sensor interval' commands:
+            sensor interval set <sensorID> <seconds>
+            sensor interval get <sensorID>
+        """
+        if len(args) < 2 or args[0] not in ["set", "get"]:
+            msg_queue.put(self.handle_sensor_interval.__doc__ + '\n')
+            return
+
+        sensor_obj = self.get_sensor_instance(args[1])
+        if sensor_obj is None:
+            return
+
+        if args[0] == "set":
+            try:
+                interval = float(args[2])
+                if interval <= 0:
+                    raise ValueError
+            except (IndexError, ValueError):
+                msg_queue.put(self.handle_sensor_interval.__doc__ + '\n')
+                return
+            sensor_obj.set_interval(interval)
+
+        info = "Sensor {} update interval: {}s\n".format(sensor_obj.get_name(),
+                                                         sensor_obj.get_interval())
+        msg_queue.put(info)
+        self.add_msg(info)
+
     # ######### SET SENSOR VALUE FUNCTION ##########
     def set_sensor_value(self, args):
         """
@@ -150,9 +191,6 @@ class Command_Handler:
         # switch to "user" mode if in "auto" mode
         if sensor_obj.get_mode() == "auto":
             sensor_obj.set_mode("user")
-            sensor_obj.condition.acquire()
-            sensor_obj.condition.notify()
-            sensor_obj.condition.release()
 
         # <sensor id>, <sensor value>: set value to the id
         if len(args) == 2:
@@ -217,8 +255,8 @@ class Command_Handler:
     # ######### GET SENSOR VALUE FUNCTION ##########
     def get_sensor_value(self, args):
         """
-        Get sensor value from sensor object, NOT from openipmi data
-        structure.
+        Get sensor value from vBMC, the value kept in sensor object is
+        used if vBMC is not reachable.
         :param args: <sensor id>
         """
         if len(args) != 1:
@@ -229,6 +267,8 @@ class Command_Handler:
         if sensor_obj is None:
             return
 
+        refresh_sensor_values([sensor_obj])
+
         raw_value = sensor_obj.get_value()
         if sensor_obj.get_event_type() == 'threshold':
             formula = sensor_obj.get_reading_factor()[0]
@@ -264,7 +304,7 @@ class Command_Handler:
     def handle_sensor_command(self, args):
         """
         Available sensor commands:
-            info mode value
+            info mode value interval
         """
         if len(args) == 0:
             msg_queue.put(self.handle_sensor_command.__doc__ + '\n')
@@ -275,102 +315,120 @@ class Command_Handler:
             self.handle_sensor_mode(args[1:])
         elif args[0] == "value":
             self.handle_sensor_value(args[1:])
+        elif args[0] == "interval":
+            self.handle_sensor_interval(args[1:])
         else:
             return
 
     # ######### SEL FUNCTIONS ##########
-    def set_oem_sel(self, args):
+    @staticmethod
+    def get_oem_sel_args_len(args):
+        """
+        :return: number of args of an OEM SEL record from its record type
+            in args[0], 0 if the type is illegal
+        """
         try:
             record_type = int(args[0], 16)
-        except ValueError:
+        except (ValueError, IndexError):
             logger.error('record type illegal\n')
-            return
+            return 0
 
         if record_type == 0x02:
-            if len(args) != 9:
-                msg_queue.put(self.handle_sel_command.__doc__ + '\n')
-                return
-            try:
-                gid_1 = int(args[1], 16)
-                gid_2 = int(args[2], 16)
-                sensor_type = int(args[3], 16)
-                sensor_num = int(args[4], 16)
-                event_type = int(args[5], 16)
-                event_data_1 = int(args[6], 16)
-                event_data_2 = int(args[7], 16)
-                event_data_3 = int(args[8], 16)
-            except ValueError:
-                logger.error('illegal data format\n')
-                return
-            sel_obj = SEL()
-            sel_obj.set_sensor_type(sensor_type)
-            sel_obj.set_gid_1(gid_1)
-            sel_obj.set_gid_2(gid_2)
-            sel_obj.set_sensor_num(sensor_num)
-            sel_obj.set_event_type(event_type)
-            sel_obj.set_event_data_1(event_data_1)
-            sel_obj.set_event_data_2(event_data_2)
-            sel_obj.set_event_data_3(event_data_3)
-            sel_obj.send_event()
-            return
+            return 9
         elif record_type >= 0xC0 and record_type <= 0xDF:
-            if len(args) != 7:
-                msg_queue.put(self.handle_sel_command.__doc__ + '\n')
-                return
-            sel_obj = sel.OEM_SEL_C0_DF()
+            return 7
         elif record_type >= 0xE0 and record_type <= 0xFF:
-            if len(args) != 14:
-                msg_queue.put(self.handle_sel_command.__doc__ + '\n')
-                return
-            sel_obj = sel.OEM_SEL_E0_FF()
+            return 14
         else:
             logger.error('unkown record type')
-            return
+            return 0
+
+    def build_oem_sel(self, args):
+        """
+        :return: SEL record of args, None if args are illegal
+        """
+        args_len = self.get_oem_sel_args_len(args)
+        if args_len == 0:
+            return None
+        if len(args) != args_len:
+            msg_queue.put(self.handle_sel_command.__doc__ + '\n')
+            return None
 
-        elements = []
         try:
-            elements = [int(x, 16) for x in args[1:]]
+            elements = [int(x, 16) for x in args]
         except ValueError:
             logger.error('illegal data format\n')
-            return
+            return None
 
-        sel_obj.set_sensor_type(record_type)
-        sel_obj.set_oem_defined_bytes(elements)
-        sel_obj.send_event()
+        record_type = elements[0]
+        if record_type == 0x02:
+            sel_obj = SEL()
+            sel_obj.set_gid_1(elements[1])
+            sel_obj.set_gid_2(elements[2])
+            sel_obj.set_sensor_type(elements[3])
+            sel_obj.set_sensor_num(elements[4])
+            sel_obj.set_event_type(elements[5])
+            sel_obj.set_event_data_1(elements[6])
+            sel_obj.set_event_data_2(elements[7])
+            sel_obj.set_event_data_3(elements[8])
+            return sel_obj
+        elif record_type <= 0xDF:
+            sel_obj = sel.OEM_SEL_C0_DF()
+        else:
+            sel_obj = sel.OEM_SEL_E0_FF()
 
-    def set_sel(self, args):
-        """
-        add SEL entry for a particular sensor or OEM sensor
-        """
-        if len(args) < 3:
-            msg_queue.put(self.handle_sel_command.__doc__ + '\n')
-            self.add_msg(self.handle_sel_command.__doc__ + '\n')
-            return
+        sel_obj.set_record_type(record_type)
+        sel_obj.set_oem_defined_bytes(elements[1:])
+        return sel_obj
 
-        if args[0].lower() == 'oem':
-            self.set_oem_sel(args[1:])
-            return
+    def set_oem_sel(self, args):
+        sel_obj = self.build_oem_sel(args)
+        if sel_obj is not None:
+            sel_obj.send_event()
 
+    def build_sensor_sel(self, args):
+        """
+        :param args: <sensorID> <event_id> <'assert'/'deassert'>
+        :return: SEL record of the sensor event, None if args are illegal
+        """
         sensor_obj = self.get_sensor_instance(args[0])
         if sensor_obj is None:
-            return
+            return None
 
         try:
             event_id = int(args[1])
         except ValueError:
             logger.error('illegal event id')
-            return
+            return None
 
         # action indicate assert/deassert
         action = args[2]
 
         if action == 'assert':
-            sensor_obj.set_sel(event_id, 0)
+            return sensor_obj.build_sel(event_id, 0)
         elif action == 'deassert':
-            sensor_obj.set_sel(event_id, 1)
+            return sensor_obj.build_sel(event_id, 1)
         else:
             msg_queue.put(self.handle_sel_command.__doc__ + '\n')
             self.add_msg(self.handle_sel_command.__doc__ + '\n')
+            return None
+
+    def set_sel(self, args):
+        """
+        add SEL entry for a particular sensor or OEM sensor
+        """
+        if len(args) < 3:
+            msg_queue.put(self.handle_sel_command.__doc__ + '\n')
+            self.add_msg(self.handle_sel_command.__doc__ + '\n')
+            return
+
+        if args[0].lower() == 'oem':
+            self.set_oem_sel(args[1:])
+            return
+
+        sel_obj = self.build_sensor_sel(args)
+        if sel_obj is not None:
+            sel_obj.send_event()
 
     def get_sel(self, args):
         if len(args) != 1:
@@ -383,11 +441,56 @@ class Command_Handler:
 
         sensor_obj.get_sel()
 
+    def burst_sel(self, args):
+        """
+        add count entries of a sensor event or an OEM SEL record in burst
+        """
+        if len(args) > 0 and args[0].lower() == 'oem':
+            args_len = self.get_oem_sel_args_len(args[1:])
+            if args_len == 0:
+                return
+            record_args = args[1:args_len + 1]
+            burst_args = args[args_len + 1:]
+        else:
+            record_args = args[:3]
+            burst_args = args[3:]
+
+        if len(record_args) < 3 or len(burst_args) not in (1, 2):
+            msg_queue.put(self.handle_sel_command.__doc__ + '\n')
+            self.add_msg(self.handle_sel_command.__doc__ + '\n')
+            return
+
+        try:
+            count = int(burst_args[0])
+            rate = float(burst_args[1]) if len(burst_args) == 2 else 0
+        except ValueError:
+            count = 0
+        if count <= 0 or rate < 0:
+            msg_queue.put('count should be a positive integer and rate not negative\n')
+            return
+
+        if args[0].lower() == 'oem':
+            sel_obj = self.build_oem_sel(record_args)
+        else:
+            sel_obj = self.build_sensor_sel(record_args)
+        if sel_obj is None:
+            return
+
+        result = sel.SELBurst(sel_obj, count, rate).run()
+        info = 'SEL burst: {added}/{sent} entries added in {elapsed:.3f}s, ' \
+            '{rate:.1f} entries/s, {lost} lost\n'.format(**result)
+        if result["sel_full"]:
+            info += 'SEL is full, {unsent} entries not sent\n'.format(**result)
+        self.add_msg(info)
+        msg_queue.put(info)
+
     def handle_sel_command(self, args):
         """
         Available 'sel' commands:
             set <sensorID> <event_id> <'assert'/'deassert'>
             get <sensorID>
+            burst <sensorID> <event_id> <'assert'/'deassert'> <count> [rate]
+            burst oem <record_Type> <record bytes as in 'set oem'> <count> [rate]
 
             'record type 0x2'
             set oem <record_Type> <generate_id_1> <generate_id_2> <sensor_type>
@@ -412,6 +515,8 @@ class Command_Handler:
             self.set_sel(args[1:])
         elif args[0] == "get":
             self.get_sel(args[1:])
+        elif args[0] == "burst":
+            self.burst_sel(args[1:])
         else:
             return
 
@@ -426,8 +531,11 @@ class Command_Handler:
             sensor mode get <sensorID>
             sensor value set <sensorID> <value>
             sensor value get <sensorID>
+            sensor interval set <sensorID> <seconds>
+            sensor interval get <sensorID>
             sel set <sensorID> <event_id> <'assert'/'deassert'>
             sel get <sensorID>
+            sel burst <sensorID> <event_id> <'assert'/'deassert'> <count> [rate]
             help
             history
             quit/exit
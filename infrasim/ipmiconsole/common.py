@@ -5,7 +5,6 @@ Copyright @ 2015 EMC Corporation All Rights Reserved
 '''
 import subprocess
 import os
-import time
 import threading
 import telnetlib
 import logging
@@ -24,9 +23,6 @@ lock = threading.Lock()
 # logger
 logger = logging.getLogger("ipmi-console")
 
-# telnet to vBMC
-tn = telnetlib.Telnet()
-
 msg_queue = Queue.Queue()
 
 
@@ -39,31 +35,15 @@ class IpmiError(Exception):
 
 
 def init_logger(instance="default"):
-
-    logger.setLevel(logging.ERROR)
-
     log_folder = os.path.join(log.infrasim_logdir, instance)
     if not os.path.exists(log_folder):
         os.mkdir(log_folder)
     log_path = os.path.join(log_folder, "ipmi-console.log")
 
-    # create file handler which logs even debug messages
-    fh = logging.FileHandler(log_path)
-
-    # create console handler with a higher log level
-    # ch = logging.StreamHandler()
-    # ch.setLevel(logging.ERROR)
-    logger.setLevel(logging.INFO)
-
-    # create formatter and add it to the handlers
-    formatter = logging.Formatter("%(asctime)s - %(name)s - "
-                                  "%(filename)s:%(lineno)s - "
-                                  "%(levelname)s - %(message)s")
-    fh.setFormatter(formatter)
-
-    # add the handlers to the logger
-    logger.handlers = []
-    logger.addHandler(fh)
+    # share the file handler with ipmi-console logger of the node
+    handler = log.log_writer.get_handler(log_path, rotate=True)
+    logger.handlers = [log.QueueHandler(handler, logger.name)]
+    logger.setLevel(log.get_log_level())
 
 
 def init_env(instance):
@@ -169,6 +149,12 @@ def init_env(instance):
             env.PORT_SSH_FOR_CLIENT = 9300
         logger.info("PORT_SSH_FOR_CLIENT: {}".format(env.PORT_SSH_FOR_CLIENT))
 
+        # - EMU_FILE
+        p_emu = re.compile(r"^\s*emu_file:\s*(?P<emu_file>\S+)", re.MULTILINE)
+        s_emu = p_emu.search(conf)
+        env.EMU_FILE = s_emu.group("emu_file") if s_emu else None
+        logger.info("EMU_FILE: {}".format(env.EMU_FILE))
+
         # check if ipmi_console_ssh port is in use
         if helper.check_if_port_in_use("0.0.0.0", env.PORT_SSH_FOR_CLIENT):
             logger.error("ssh port {} is already in use.".format(env.PORT_SSH_FOR_CLIENT))
@@ -195,6 +181,112 @@ def str_hex_to_int(str_num):
     return int_num
 
 
+class VbmcChannel(object):
+    """
+    A long-lived telnet session to the lanserv console of vBMC.
+
+    lanserv handles console input line by line, echoes it and prints a
+    "> " prompt after each command, so commands written back to back are
+    answered in order and every response ends at the next prompt. Each
+    response is returned as "> <echo>\\r\\n<output>\\r\\n> ", the same
+    shape a fresh connection used to read.
+    """
+    PROMPT = "> "
+
+    def __init__(self, host="localhost", port=None, timeout=5):
+        self.__host = host
+        self.__port = port
+        self.__timeout = timeout
+        self.__tn = None
+        self.__lock = threading.Lock()
+
+    def __open(self):
+        self.__tn = telnetlib.Telnet(self.__host,
+                                     self.__port or env.PORT_TELNET_TO_VBMC,
+                                     self.__timeout)
+        self.__read_prompt()
+
+    def __read_prompt(self):
+        rsp = self.__tn.read_until(self.PROMPT, self.__timeout)
+        if not rsp.endswith(self.PROMPT):
+            raise IpmiError("no prompt from lanserv in {}s: {}".
+                            format(self.__timeout, rsp))
+        return rsp
+
+    def close(self):
+        with self.__lock:
+            self.__close()
+
+    def __close(self):
+        if self.__tn:
+            self.__tn.close()
+        self.__tn = None
+
+    def execute(self, commands):
+        """
+        Write all commands in one round trip and read one response per
+        command. A broken session is re-opened once, and only commands
+        which got no response are written again, since commands such as
+        sel_add are not idempotent.
+        :param commands: list of lanserv console command lines
+        :return: list of responses in the same order, "" for a command
+            not answered before the session broke
+        """
+        responses = []
+        with self.__lock:
+            for retry in (True, False):
+                reused = self.__tn is not None
+                pending = commands[len(responses):]
+                try:
+                    if not reused:
+                        self.__open()
+                    self.__tn.write("".join(cmd if cmd.endswith("\n") else cmd + "\n"
+                                            for cmd in pending))
+                    for _ in pending:
+                        responses.append(self.PROMPT + self.__read_prompt())
+                    return responses
+                except (socket.error, EOFError, IpmiError) as e:
+                    # response stream is out of sync, start over
+                    self.__close()
+                    if retry and reused:
+                        continue
+                    if not responses:
+                        raise
+                    logger.error("lanserv session broken after {} of {} responses: {}".
+                                 format(len(responses), len(commands), e))
+                    return responses + [""] * (len(commands) - len(responses))
+
+
+class VbmcChannelPool(object):
+    """
+    A small pool of VbmcChannel, so that a slow command on one session
+    doesn't hold back sensor threads writing on others.
+    """
+
+    def __init__(self, size=2, **kwargs):
+        self.__channels = Queue.Queue()
+        self.__all = []
+        for _ in range(size):
+            channel = VbmcChannel(**kwargs)
+            self.__all.append(channel)
+            self.__channels.put(channel)
+
+    def execute(self, commands):
+        channel = self.__channels.get()
+        try:
+            return channel.execute(commands)
+        finally:
+            self.__channels.put(channel)
+
+    def close(self):
+        for channel in self.__all:
+            channel.close()
+
+
+# sessions to vBMC console, opened on first use
+vbmc_channels = VbmcChannelPool()
+
+
 # telnet to vBMC console
 def open_telnet_session():
     pass
@@ -202,50 +294,64 @@ def open_telnet_session():
 
 # send IPMI SIM command to the vBMC
 def send_ipmi_sim_command(command):
-    lock.acquire()
-    logger.info("send IPMI SIM command: " + command.strip())
-    result = ""
+    return send_ipmi_sim_commands([command])[0]
+
+
+# send a batch of IPMI SIM commands to the vBMC in one round trip
+def send_ipmi_sim_commands(commands):
+    if logger.isEnabledFor(logging.DEBUG):
+        for command in commands:
+            logger.debug("send IPMI SIM command: %s", command.strip())
     try:
-        tn.open('localhost', env.PORT_TELNET_TO_VBMC)
-        tn.write(command)
-        time.sleep(0.1)
-        result = tn.read_some()
-        tn.close()
-        logger.info("IPMI SIM command result: " + result)
-    except socket.error as se:
+        results = vbmc_channels.execute(commands)
+    except (socket.error, EOFError, IpmiError) as e:
         logger.error("Unable to connect lanserv at {0}: {1}".
-                     format(env.PORT_TELNET_TO_VBMC, se))
-    finally:
-        lock.release()
+                     format(env.PORT_TELNET_TO_VBMC, e))
+        return [""] * len(commands)
 
-    return result
+    if logger.isEnabledFor(logging.DEBUG):
+        for result in results:
+            logger.debug("IPMI SIM command result: %s", result)
+    return results
 
 
 # close telnet session
 def close_telnet_session():
-    pass
+    vbmc_channels.close()
+
+
+# password of VBMC_USER, fetched from vBMC console once and reused until
+# vBMC rejects it
+VBMC_USER = "admin"
+_vbmc_password = None
+
+
+def get_vbmc_password(refresh=False):
+    global _vbmc_password
+    if _vbmc_password is None or refresh:
+        _vbmc_password = None
+        output = send_ipmi_sim_command(
+            "get_user_password 0x20 {}\n".format(VBMC_USER))
+        for line in output.split(os.linesep):
+            pass_obj = re.search(r"(^[^>].*)", line)
+            if pass_obj:
+                _vbmc_password = pass_obj.group().strip('\r\n')
+                break
+    return _vbmc_password
 
 
 # send ipmitool command to vBMC
 def send_ipmitool_command(*cmds):
-    vbmc_user = "admin"
-    output = send_ipmi_sim_command(
-        "get_user_password 0x20 {}\n".format(vbmc_user))
-    for line in output.split(os.linesep):
-        pass_obj = re.search(r"(^[^>].*)", line)
-        if pass_obj:
-            break
-
-    if pass_obj is None:
+    global _vbmc_password
+    vbmc_pass = get_vbmc_password()
+    if vbmc_pass is None:
         return -1
 
-    vbmc_pass = pass_obj.group().strip('\r\n')
-
     lock.acquire()
     dst_cmd = ["ipmitool",
                "-I", "lan",
                "-H", env.VBMC_IP,
-               "-U", vbmc_user,
+               "-U", VBMC_USER,
                "-P", vbmc_pass,
                "-p", str(env.VBMC_PORT)]
     for cmd in cmds:
@@ -258,6 +364,7 @@ def send_ipmitool_command(*cmds):
         (stdout, stderr) = child.communicate()
     except Exception:
         logger.error(traceback.format_exc())
+        lock.release()
         raise
     child.wait()
     logger.info("ipmitool command: " + ' '.join(dst_cmd))
@@ -266,6 +373,8 @@ def send_ipmitool_command(*cmds):
     if stderr != '':
         err_message = "failed to send ipmitool command: {0}".format(dst_cmd)
         logger.error(err_message)
+        # password may be changed, fetch it again next time
+        _vbmc_password = None
         lock.release()
         return -1
     lock.release()
@@ -11,6 +11,7 @@ PORT_TELNET_TO_VBMC = 9000
 PORT_SSH_FOR_CLIENT = 9300
 VBMC_IP = "localhost"
 VBMC_PORT = 623
+EMU_FILE = None
 
 
 # local_env is a thread-safe variable set
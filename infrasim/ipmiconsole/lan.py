@@ -0,0 +1,186 @@
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+# -*- coding: utf-8 -*-
+
+import socket
+import struct
+import time
+from .common import IpmiError
+
+RMCP_HEADER = "\x06\x00\xff\x07"
+
+AUTH_NONE = 0x00
+AUTH_STRAIGHT = 0x04
+PRIV_ADMIN = 0x04
+
+NETFN_SENSOR = 0x04
+NETFN_APP = 0x06
+
+CMD_GET_SENSOR_READING = 0x2d
+CMD_GET_CHANNEL_AUTH_CAP = 0x38
+CMD_GET_SESSION_CHALLENGE = 0x39
+CMD_ACTIVATE_SESSION = 0x3a
+CMD_SET_SESSION_PRIV = 0x3b
+CMD_CLOSE_SESSION = 0x3c
+
+BMC_ADDR = 0x20
+REMOTE_ADDR = 0x81
+
+
+def checksum(data):
+    return -sum(bytearray(data)) & 0xff
+
+
+class IpmiLanSession(object):
+    """
+    A persistent IPMI v1.5 LAN session to vBMC with straight password
+    authentication, so that many requests are served by one session
+    instead of an ipmitool process each.
+
+    request_many() pipelines requests: up to "window" requests are in
+    flight and responses are matched by rqSeq.
+    """
+
+    def __init__(self, host, port, username, password, timeout=1, window=32):
+        self.__addr = (host, port)
+        self.__username = username
+        self.__password = password
+        self.__timeout = timeout
+        self.__window = window
+        self.__sock = None
+        self.__session_id = 0
+        # next session sequence number, 0 before session is activated
+        self.__session_seq = 0
+        self.__rq_seq = 0
+
+    def is_active(self):
+        return self.__sock is not None and self.__session_id != 0
+
+    def __pack(self, netfn, cmd, data, rs_lun=0):
+        self.__rq_seq = (self.__rq_seq + 1) & 0x3f
+        # sensor owner LUN of SDR has channel number in bits 7:4
+        netfn_lun = (netfn << 2) | (rs_lun & 0x03)
+        header = struct.pack("BBB", BMC_ADDR, netfn_lun,
+                             checksum(struct.pack("BB", BMC_ADDR, netfn_lun)))
+        body = struct.pack("BBB", REMOTE_ADDR, self.__rq_seq << 2, cmd) + data
+        msg = header + body + chr(checksum(body))
+
+        auth_type = AUTH_STRAIGHT if self.__session_id else AUTH_NONE
+        session = struct.pack("<BII", auth_type, self.__session_seq, self.__session_id)
+        if self.__session_seq:
+            # wrap around but skip 0
+            self.__session_seq = self.__session_seq % 0xffffffff + 1
+        if auth_type != AUTH_NONE:
+            session += self.__password.ljust(16, "\x00")[:16]
+        return self.__rq_seq, RMCP_HEADER + session + chr(len(msg)) + msg
+
+    def __unpack(self, packet):
+        """
+        :return: (rqSeq, cmd, completion code, response data)
+        """
+        if len(packet) < 14 or packet[:4] != RMCP_HEADER:
+            raise IpmiError("invalid RMCP packet")
+        auth_type = ord(packet[4])
+        offset = 13 + (16 if auth_type != AUTH_NONE else 0)
+        msg = packet[offset + 1:offset + 1 + ord(packet[offset])]
+        if len(msg) < 8:
+            raise IpmiError("IPMI message is too short")
+        return ord(msg[4]) >> 2, ord(msg[5]), ord(msg[6]), msg[7:-1]
+
+    def request_many(self, requests):
+        """
+        Send requests and collect their responses.
+        :param requests: list of (netfn, cmd, data, lun)
+        :return: list of (completion code, data), None for a request
+            without response in time
+        """
+        results = [None] * len(requests)
+        for start in range(0, len(requests), self.__window):
+            pending = {}
+            for index in range(start, min(start + self.__window, len(requests))):
+                netfn, cmd, data, lun = requests[index]
+                rq_seq, packet = self.__pack(netfn, cmd, data, lun)
+                pending[rq_seq] = (index, cmd)
+                self.__sock.send(packet)
+
+            deadline = time.time() + self.__timeout
+            while pending:
+                self.__sock.settimeout(max(deadline - time.time(), 0.001))
+                try:
+                    rq_seq, cmd, cc, data = self.__unpack(self.__sock.recv(1024))
+                except socket.timeout:
+                    break
+                if rq_seq in pending and pending[rq_seq][1] == cmd:
+                    results[pending.pop(rq_seq)[0]] = (cc, data)
+        return results
+
+    def request(self, netfn, cmd, data="", lun=0):
+        result = self.request_many([(netfn, cmd, data, lun)])[0]
+        if result is None:
+            raise IpmiError("no response from vBMC {}:{} to command {:#04x}".
+                            format(self.__addr[0], self.__addr[1], cmd))
+        if result[0] != 0:
+            raise IpmiError("vBMC command {:#04x} fails with completion code {:#04x}".
+                            format(cmd, result[0]))
+        return result[1]
+
+    def open(self):
+        self.__sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.__sock.connect(self.__addr)
+        self.__session_id = 0
+        self.__session_seq = 0
+        try:
+            self.request(NETFN_APP, CMD_GET_CHANNEL_AUTH_CAP, struct.pack("BB", 0x0e, PRIV_ADMIN))
+            rsp = self.request(NETFN_APP, CMD_GET_SESSION_CHALLENGE,
+                               chr(AUTH_STRAIGHT) + self.__username.ljust(16, "\x00")[:16])
+            temp_id, challenge = struct.unpack("<I", rsp[:4])[0], rsp[4:20]
+
+            # activate session carries temporary session id and seq 0
+            self.__session_id = temp_id
+            rsp = self.request(NETFN_APP, CMD_ACTIVATE_SESSION,
+                               struct.pack("BB", AUTH_STRAIGHT, PRIV_ADMIN) +
+                               challenge + struct.pack("<I", 1))
+            self.__session_id, self.__session_seq = struct.unpack("<II", rsp[1:9])
+            self.request(NETFN_APP, CMD_SET_SESSION_PRIV, chr(PRIV_ADMIN))
+        except (socket.error, IpmiError):
+            self.__close_socket()
+            raise
+
+    def close(self):
+        if self.is_active():
+            try:
+                self.request_many([(NETFN_APP, CMD_CLOSE_SESSION,
+                                    struct.pack("<I", self.__session_id), 0)])
+            except socket.error:
+                pass
+        self.__close_socket()
+
+    def __close_socket(self):
+        if self.__sock:
+            self.__sock.close()
+        self.__sock = None
+        self.__session_id = 0
+
+    def get_sensor_readings(self, sensors):
+        """
+        Get readings of many sensors in one session.
+        :param sensors: list of (sensor number, lun, event type), event
+            type is "threshold" or "discrete"
+        :return: list of reading, int for threshold sensor, 2 bytes hex
+            string e.g. 0x1ac0 for discrete sensor, None on failure
+        """
+        results = self.request_many([(NETFN_SENSOR, CMD_GET_SENSOR_READING, chr(num), lun)
+                                     for num, lun, _ in sensors])
+        readings = []
+        for (num, lun, event_type), result in zip(sensors, results):
+            if result is None or result[0] != 0 or len(result[1]) < 1:
+                readings.append(None)
+            elif event_type == "threshold":
+                readings.append(ord(result[1][0]))
+            else:
+                states = bytearray(result[1][2:4].ljust(2, "\x00"))
+                readings.append("0x{:02x}{:02x}".format(states[0], states[1]))
+        return readings
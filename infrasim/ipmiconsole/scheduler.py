@@ -0,0 +1,108 @@
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+# -*- coding: utf-8 -*-
+
+import heapq
+import itertools
+import threading
+import time
+from .common import logger, send_ipmi_sim_commands
+
+
+class SensorScheduler(threading.Thread):
+    """
+    Drive all sensors in auto and fault mode from one thread.
+
+    Sensors are kept in a heap ordered by the time of their next update.
+    Every tick, all sensors due within the tick are updated together and
+    their sensor_set_value lines are written to vBMC in one batch.
+    """
+
+    def __init__(self, tick=0.1, send=send_ipmi_sim_commands):
+        threading.Thread.__init__(self, name="sensor-scheduler")
+        self.daemon = True
+        self.__tick = tick
+        self.__send = send
+        self.__heap = []
+        # sensor -> due time of its only valid heap entry, an entry with
+        # any other due time is stale and dropped when popped
+        self.__due = {}
+        self.__seq = itertools.count()
+        self.__cond = threading.Condition()
+        self.__quit = False
+
+    def add(self, sensor):
+        sensor.set_scheduler(self)
+        self.wakeup(sensor)
+
+    def wakeup(self, sensor, delay=0):
+        """
+        (Re)schedule a sensor to be updated after delay seconds.
+        """
+        if sensor.get_mode() == "user":
+            return
+        with self.__cond:
+            due = time.time() + delay
+            self.__due[sensor] = due
+            heapq.heappush(self.__heap, (due, next(self.__seq), sensor))
+            self.__cond.notify()
+
+    def __pop_due(self):
+        """
+        Wait until some sensors are due, return them or None on quit.
+        """
+        with self.__cond:
+            while not self.__quit:
+                if not self.__heap:
+                    self.__cond.wait()
+                    continue
+                now = time.time()
+                due, _, sensor = self.__heap[0]
+                if due > now + self.__tick:
+                    self.__cond.wait(due - now)
+                    continue
+                sensors = []
+                while self.__heap and self.__heap[0][0] <= now + self.__tick:
+                    due, _, sensor = heapq.heappop(self.__heap)
+                    if self.__due.get(sensor) != due:
+                        continue
+                    del self.__due[sensor]
+                    sensors.append(sensor)
+                return sensors
+        return None
+
+    def run_once(self, sensors):
+        """
+        Update sensors and write new values to vBMC in one batch.
+        :return: list of commands sent
+        """
+        commands = []
+        for sensor in sensors:
+            command = sensor.update()
+            if command:
+                commands.append(command)
+            if sensor.get_mode() == "auto":
+                self.wakeup(sensor, sensor.get_interval())
+        if commands:
+            self.__send(commands)
+        return commands
+
+    def run(self):
+        while True:
+            sensors = self.__pop_due()
+            if sensors is None:
+                return
+            try:
+                self.run_once(sensors)
+            except Exception:
+                logger.exception("sensor scheduler fails to update sensors")
+
+    def stop(self):
+        with self.__cond:
+            self.__quit = True
+            self.__cond.notify()
+        if self.is_alive():
+            self.join()
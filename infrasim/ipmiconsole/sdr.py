@@ -5,9 +5,16 @@ Copyright @ 2015 EMC Corporation All Rights Reserved
 '''
 
 from .sensor import Sensor
-from .common import logger, send_ipmitool_command
+from .common import logger, send_ipmitool_command, get_vbmc_password, IpmiError, VBMC_USER
+from .lan import IpmiLanSession
+import env
 import os
+import re
+import socket
+import struct
 import sys
+import threading
+import time
 
 sensor_list = []
 sensor_name_list = []
@@ -17,6 +24,25 @@ sensor_id_map = {}
 
 SDR_NAME = "/tmp/sdr.bin"
 
+# record id, SDR version, record type, record length
+SDR_HEADER = struct.Struct("<HBBB")
+# sensor fields from byte 5, common to full and compact sensor records,
+# note the readable threshold mask comes before the settable one
+SDR_SENSOR = struct.Struct("<BBB3xBBB4B4B")
+SDR_SENSOR_FIELDS = ("mc", "lun", "num", "cap", "sensor_type", "event_type",
+                     "ltm_lb", "ltm_ub", "utm_lb", "utm_ub", "rtm", "stm", "su1", "su2")
+# linearization factors and thresholds from byte 24 of full sensor record
+SDR_FULL_SENSOR = struct.Struct("<6B6x6B")
+SDR_FULL_SENSOR_FIELDS = ("m_lb", "m_ub", "b_lb", "b_ub", "accuracy", "exp",
+                          "unr", "uc", "unc", "lnr", "lc", "lnc")
+
+# emulation file -> (mtime, sensor records, readings, discrete states)
+_emu_cache = {}
+
+# LAN session to vBMC kept for sensor readings
+lan_session = None
+lan_lock = threading.Lock()
+
 
 def build_sensors(name, ID, mc, value, tp):
     sensor = Sensor(name, ID, value, tp)
@@ -33,7 +59,7 @@ def dump_all_sdrs(file_name):
     send_ipmitool_command("sdr", "dump", file_name)
 
 
-#  read sensor value via ipmitool
+#  read sensor value from vBMC
 def read_sensor_raw_value(sensor_num, event_type="threshold"):
     """
     Get sensor readying:
@@ -44,253 +70,215 @@ def read_sensor_raw_value(sensor_num, event_type="threshold"):
     :return:
     """
 
-    result = send_ipmitool_command('raw', '0x04', '0x2d',
-                                          hex(sensor_num))
-    if result == -1:
+    value = read_sensor_raw_values([(sensor_num, 0, event_type)])[0]
+    if value is None:
         return 0
-    if event_type == "threshold":
-        value = result.split()[0]
-        info = "sensor num: {0} value: 0x{1}".format(hex(sensor_num), value)
-        logger.info(info)
-        return int(value, 16)
-    elif event_type == "discrete":
-        value = '0x' + result.split()[2] + result.split()[3]
-        info = "sensor num: {0} value: {1}".format(hex(sensor_num), value)
-        logger.info(info)
-        return value
-
-
-def parse_sdrs():
-    dump_all_sdrs(SDR_NAME)
-    if os.path.isfile(SDR_NAME) is False:
-        print "The file don't exist, Please double check!"
-        sys.exit(1)
+    info = "sensor num: {0} value: {1}".format(hex(sensor_num), value)
+    logger.info(info)
+    return value
 
-    fd = open(SDR_NAME, 'rb')
-    file_size = os.path.getsize(SDR_NAME)
-    offset = 0
-    record_header_size = 5
-    while offset < file_size:
-        # get record type
-        fd.seek(offset + 3)
-        record_type = ord(fd.read(1))
-
-        # get record length
-        fd.seek(offset + 4)
-        record_length = ord(fd.read(1))
-
-        # we just care record type 0x1 and 0x2 right now
-        if record_type != 0x1 and record_type != 0x2:
-            offset += record_header_size + record_length
-            continue
 
-        # get mc address
-        fd.seek(offset + 5)
-        mc = ord(fd.read(1))
-
-        # get LUN
-        fd.seek(offset + 6)
-        lun = ord(fd.read(1))
-
-        # get sensor num
-        fd.seek(offset + 7)
-        sensor_num = ord(fd.read(1))
+def read_sensor_raw_values(sensors):
+    """
+    Get readings of many sensors in one vBMC LAN session, reading is in
+    the same format as read_sensor_raw_value().
+    :param sensors: list of (sensor num, lun, event type)
+    :return: list of reading, None if it fails to read
+    """
+    global lan_session
+    with lan_lock:
+        for retry in (False, True):
+            try:
+                if lan_session is None or not lan_session.is_active():
+                    password = get_vbmc_password(refresh=retry)
+                    if password is None:
+                        raise IpmiError("fail to get password of {}".format(VBMC_USER))
+                    lan_session = IpmiLanSession(env.VBMC_IP, env.VBMC_PORT, VBMC_USER, password)
+                    lan_session.open()
+                readings = lan_session.get_sensor_readings(sensors)
+                if not sensors or any(r is not None for r in readings):
+                    return readings
+            except (socket.error, IpmiError) as e:
+                logger.warning("fail to read sensors from vBMC: {}".format(e))
+
+            # the session may be timed out by vBMC, start a new one
+            if lan_session:
+                lan_session.close()
+                lan_session = None
+    return [None] * len(sensors)
+
+
+def refresh_sensor_values(sensors):
+    """
+    Update sensor objects with readings of vBMC in one batch.
+    :return: elapsed time in second
+    """
+    start = time.time()
+    sensors = [s for s in sensors if s.get_event_type() != "NA"]
+    readings = read_sensor_raw_values([(s.get_num(), s.get_lun(), s.get_event_type())
+                                       for s in sensors])
+    for sensor_obj, reading in zip(sensors, readings):
+        if reading is not None:
+            sensor_obj.set_raw_value(reading)
+    return time.time() - start
 
-        # get sensor capability
-        fd.seek(offset + 11)
-        sensor_cap = ord(fd.read(1))
 
-        # get sensor type
-        fd.seek(offset + 12)
-        sensor_type = ord(fd.read(1))
+def parse_sdr_records(data):
+    """
+    Decode full (0x01) and compact (0x02) sensor records of a SDR
+    repository, other record types are skipped.
+    :param data: raw SDR records, e.g. output of ipmitool sdr dump
+    :return: list of dict, one per sensor record
+    """
+    view = memoryview(data)
+    records = []
+    offset = 0
+    while offset + SDR_HEADER.size <= len(view):
+        _, _, record_type, record_length = SDR_HEADER.unpack_from(view, offset)
+        end = offset + SDR_HEADER.size + record_length
 
-        # get event type
-        fd.seek(offset + 13)
-        event_type = ord(fd.read(1))
+        # we just care record type 0x1 and 0x2 right now
+        if record_type not in (0x01, 0x02) or end > len(view):
+            offset = end
+            continue
 
-        if event_type == 0x0:
-            sensor_value = None
-        elif event_type == 0x1:
-            sensor_value = read_sensor_raw_value(sensor_num, 'threshold')
+        record = dict(zip(SDR_SENSOR_FIELDS, SDR_SENSOR.unpack_from(view, offset + SDR_HEADER.size)))
+        # channel number in bits 7:4 of owner LUN byte, readings of
+        # ipmi_sim emulation are given by LUN
+        record["lun"] &= 0x03
+        record["record_type"] = record_type
+        if record_type == 0x01:
+            record.update(zip(SDR_FULL_SENSOR_FIELDS, SDR_FULL_SENSOR.unpack_from(view, offset + 24)))
+            record["name"] = view[offset + 48:end].tobytes()
         else:
-            sensor_value = read_sensor_raw_value(sensor_num, "discrete")
-
-        # get lower threshold mask(lower byte)
-        fd.seek(offset + 14)
-        sensor_ltm_lb = ord(fd.read(1))
-
-        # get lower threshold mask(upper byte)
-        fd.seek(offset + 15)
-        sensor_ltm_ub = ord(fd.read(1))
-
-        # get upper threshold mask(lower byte)
-        fd.seek(offset + 16)
-        sensor_utm_lb = ord(fd.read(1))
-
-        # get upper threshold mask(upper byte)
-        fd.seek(offset + 17)
-        sensor_utm_ub = ord(fd.read(1))
-
-        # settable threshold mask
-        fd.seek(offset + 18)
-        sensor_rtm = ord(fd.read(1))
-
-        # readable threshold mask
-        fd.seek(offset + 19)
-        sensor_stm = ord(fd.read(1))
-
-        # get sensor units 1 byte
-        fd.seek(offset + 20)
-        sensor_su1 = ord(fd.read(1))
-
-        # get sensor units 2 byte
-        fd.seek(offset + 21)
-        sensor_su2 = ord(fd.read(1))
-
-        sensor_name = ''
-        sensor_obj = None
-        # Full sensor record
-        if record_type == 0x1:
-            # get sensor name
-            sensor_name_length = record_header_size + record_length - 48
-            fd.seek(offset + 48)
-            for index in range(0, sensor_name_length):
-                sensor_name += chr(ord(fd.read(1)))
-
-            # build sensor
-            sensor_obj = build_sensors(sensor_name,
-                                       sensor_num,
-                                       mc,
-                                       sensor_value,
-                                       sensor_type)
-
-            # get sensor "M" value lower byte
-            fd.seek(offset + 24)
-            sensor_m_lb = ord(fd.read(1))
-
-            # get sensor "M" value upper byte
-            fd.seek(offset + 25)
-            sensor_m_ub = ord(fd.read(1))
-
-            # get sensor "B" value lower byte
-            fd.seek(offset + 26)
-            sensor_b_lb = ord(fd.read(1))
-
-            # get sensor "B" value upper byte
-            fd.seek(offset + 27)
-            sensor_b_ub = ord(fd.read(1))
-
-            # get Accuracy
-            fd.seek(offset + 28)
-            sensor_acc = ord(fd.read(1))
-
-            # get exp value
-            fd.seek(offset + 29)
-            sensor_exp = ord(fd.read(1))
+            record["name"] = view[offset + 32:end].tobytes()
+        records.append(record)
+        offset = end
+    return records
 
-            #  set sensor "M" value lower byte
-            sensor_obj.set_m_lb(sensor_m_lb)
 
-            # set sensor "M" value upper byte
-            sensor_obj.set_m_ub(sensor_m_ub)
-
-            # set sensor "B" value lower byte
-            sensor_obj.set_b_lb(sensor_b_lb)
-
-            # set sensor "B" value upper byte
-            sensor_obj.set_b_ub(sensor_b_ub)
-
-            sensor_obj.set_accuracy(sensor_acc)
-
-            # set exp value
-            sensor_obj.set_exp(sensor_exp)
-
-            # set threshold
-            fd.seek(offset + 36)
-            sensor_obj.set_unr(ord(fd.read(1)))
-
-            fd.seek(offset + 37)
-            sensor_obj.set_uc(ord(fd.read(1)))
-
-            fd.seek(offset + 38)
-            sensor_obj.set_unc(ord(fd.read(1)))
-
-            fd.seek(offset + 39)
-            sensor_obj.set_lnr(ord(fd.read(1)))
-
-            fd.seek(offset + 40)
-            sensor_obj.set_lc(ord(fd.read(1)))
+def read_emu_sdrs(emu_file):
+    """
+    Collect SDR records and initial sensor readings from an ipmi_sim
+    emulation file. Result is cached until the file is modified.
+    :return: (sensor records, {(mc, lun, num): reading}, {(mc, lun, num): state bits})
+    """
+    mtime = os.path.getmtime(emu_file)
+    cached = _emu_cache.get(emu_file)
+    if cached and cached[0] == mtime:
+        return cached[1:]
+
+    with open(emu_file, "r") as f:
+        content = re.sub(r"\\[ \t]*\n", " ", f.read())
+
+    sdr_data = bytearray()
+    values = {}
+    states = {}
+    for line in content.splitlines():
+        words = line.split()
+        if not words:
+            continue
+        if words[0] == "main_sdr_add":
+            sdr_data.extend(int(x, 16) for x in words[2:])
+        elif words[0] == "sensor_set_value":
+            values[tuple(int(x, 16) for x in words[1:4])] = int(words[4], 16)
+        elif words[0] == "sensor_set_bit":
+            key = tuple(int(x, 16) for x in words[1:4])
+            if int(words[5]):
+                states[key] = states.get(key, 0) | (1 << int(words[4]))
+            else:
+                states[key] = states.get(key, 0) & ~(1 << int(words[4]))
+
+    _emu_cache[emu_file] = (mtime, parse_sdr_records(sdr_data), values, states)
+    return _emu_cache[emu_file][1:]
+
+
+def build_sensor_from_record(record, sensor_value):
+    sensor_obj = build_sensors(record["name"],
+                               record["num"],
+                               record["mc"],
+                               sensor_value,
+                               record["sensor_type"])
+
+    # Full sensor record
+    if record["record_type"] == 0x01:
+        sensor_obj.set_m_lb(record["m_lb"])
+        sensor_obj.set_m_ub(record["m_ub"])
+        sensor_obj.set_b_lb(record["b_lb"])
+        sensor_obj.set_b_ub(record["b_ub"])
+        sensor_obj.set_accuracy(record["accuracy"])
+        sensor_obj.set_exp(record["exp"])
+
+        # set threshold
+        sensor_obj.set_unr(record["unr"])
+        sensor_obj.set_uc(record["uc"])
+        sensor_obj.set_unc(record["unc"])
+        sensor_obj.set_lnr(record["lnr"])
+        sensor_obj.set_lc(record["lc"])
+        sensor_obj.set_lnc(record["lnc"])
+
+    sensor_obj.set_mc(record["mc"])
+    sensor_obj.set_lun(record["lun"])
+    sensor_obj.set_ltm_lb(record["ltm_lb"])
+    sensor_obj.set_ltm_ub(record["ltm_ub"])
+    sensor_obj.set_utm_lb(record["utm_lb"])
+    sensor_obj.set_utm_ub(record["utm_ub"])
+    sensor_obj.set_stm(record["stm"])
+    sensor_obj.set_rtm(record["rtm"])
+
+    # Forrest comment this raw value out since we have
+    # no clue how this sensor unit bit [7:6] impacts sensor
+    # reading.
+
+    # if sensor_su1 >> 6 != 0:
+    #     raw_value = struct.unpack('b', chr(sensor_value))[0]
+    #     sensor_obj.set_raw_value(raw_value)
+    sensor_obj.set_su1(record["su1"])
+    sensor_obj.set_su2(record["su2"])
+    sensor_obj.set_cap(record["cap"])
+    sensor_obj.set_event_type(record["event_type"])
+
+    # initialize SEL for the sensor
+    sensor_obj.initialize_sel()
+    return sensor_obj
+
+
+def parse_sdrs(emu_file=None, dump_file=SDR_NAME):
+    """
+    Build sensors from SDRs in the emulation data of vBMC. Without an
+    emulation file, SDRs are dumped from vBMC by ipmitool to dump_file
+    and every sensor reading is fetched from vBMC.
+    """
+    if emu_file and os.path.isfile(emu_file):
+        records, values, states = read_emu_sdrs(emu_file)
+        for record in records:
+            key = (record["mc"], record["lun"], record["num"])
+            if record["event_type"] == 0x0:
+                sensor_value = None
+            elif record["event_type"] == 0x1:
+                sensor_value = values.get(key, 0)
+            else:
+                bits = states.get(key, 0)
+                sensor_value = "0x{:02x}{:02x}".format(bits & 0xff, (bits >> 8) & 0xff)
+            build_sensor_from_record(record, sensor_value)
+        return
+
+    dump_all_sdrs(dump_file)
+    if os.path.isfile(dump_file) is False:
+        print "The file don't exist, Please double check!"
+        sys.exit(1)
 
-            fd.seek(offset + 41)
-            sensor_obj.set_lnc(ord(fd.read(1)))
+    with open(dump_file, "rb") as fd:
+        records = parse_sdr_records(fd.read())
+    # delete temp file
+    os.remove(dump_file)
 
-            # output the sensor reading factor
-            sensor_obj.get_reading_factor()
-        # compact sensor record
+    for record in records:
+        if record["event_type"] == 0x0:
+            sensor_value = None
+        elif record["event_type"] == 0x1:
+            sensor_value = 0
         else:
-            # get sensor name
-            sensor_name_length = record_header_size + record_length - 32
-            fd.seek(offset + 32)
-            for index in range(0, sensor_name_length):
-                sensor_name += chr(ord(fd.read(1)))
-
-            # build sensor
-            sensor_obj = build_sensors(sensor_name,
-                                       sensor_num,
-                                       mc,
-                                       sensor_value,
-                                       sensor_type)
-
-        # set mc address
-        sensor_obj.set_mc(mc)
-
-        # set lun
-        sensor_obj.set_lun(lun)
-
-        # set lower threshold (lower byte)
-        sensor_obj.set_ltm_lb(sensor_ltm_lb)
-
-        # set lower threshold (upper byte)
-        sensor_obj.set_ltm_ub(sensor_ltm_ub)
-
-        # set upper threshold (lower byte)
-        sensor_obj.set_utm_lb(sensor_utm_lb)
-
-        # set upper threshold (upper byte)
-        sensor_obj.set_utm_ub(sensor_utm_ub)
-
-        # set settable threshold mask
-        sensor_obj.set_stm(sensor_stm)
-
-        # set readable threshold mask
-        sensor_obj.set_rtm(sensor_rtm)
-
-        # set sensor units 1 byte
-        sensor_obj.set_su1(sensor_su1)
-
-        # Forrest comment this raw value out since we have
-        # no clue how this sensor unit bit [7:6] impacts sensor
-        # reading.
-
-        # if sensor_su1 >> 6 != 0:
-        #     raw_value = struct.unpack('b', chr(sensor_value))[0]
-        #     sensor_obj.set_raw_value(raw_value)
-
-        # set sensor units 2 byte
-        sensor_obj.set_su2(sensor_su2)
-
-        # set capability
-        sensor_obj.set_cap(sensor_cap)
-
-        # set event type
-        sensor_obj.set_event_type(event_type)
-
-        # initialize SEL for the sensor
-        sensor_obj.initialize_sel()
-
-        # move to next sensor
-        offset = offset + record_length + record_header_size
-
-    # delete temp file
-    fd.close()
-    os.remove(SDR_NAME)
+            sensor_value = "0x0000"
+        build_sensor_from_record(record, sensor_value)
+    refresh_sensor_values(sensor_list)
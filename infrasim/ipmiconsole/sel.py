@@ -3,7 +3,10 @@
 Copyright @ 2015 EMC Corporation All Rights Reserved
 *********************************************************
 '''
-from .common import logger, msg_queue, send_ipmi_sim_command
+import errno
+import re
+import time
+from .common import logger, msg_queue, send_ipmi_sim_command, send_ipmi_sim_commands
 
 # sensor number --> Event Type( 01, 02-0C, 6F ) --> sensor Type
 #                    Event Type
@@ -547,15 +550,19 @@ class SEL:
             return False
         return True
 
-    # send SEL to IPMI simulator
-    def send_event(self):
-        command = 'sel_add ' + hex(self.mc) + ' ' + hex(self.record_type) + ' ' \
+    # sel_add command of this record for IPMI simulator
+    def get_command(self):
+        return 'sel_add ' + hex(self.mc) + ' ' + hex(self.record_type) + ' ' \
             + hex(self.ts_1) + ' ' + hex(self.ts_2) + ' ' + hex(self.ts_3) + ' ' + hex(self.ts_4) + ' ' \
             + hex(self.gid_1) + ' ' + hex(self.gid_2) + ' ' + hex(self.evm_rev) + ' ' \
             + hex(self.sensor_type) + ' ' + hex(self.sensor_num) + ' ' \
             + hex((self.event_dir << 7) | self.event_type) + ' ' \
             + hex(self.event_data_1) + ' ' + hex(self.event_data_2) + ' ' + hex(self.event_data_3) + '\n'
-        logger.info(command)
+
+    # send SEL to IPMI simulator
+    def send_event(self):
+        command = self.get_command()
+        logger.info("add SEL: %s", command.strip())
         send_ipmi_sim_command(command)
 
 
@@ -576,17 +583,22 @@ class OEM_SEL_C0_DF:
         # byte 11 - byte 16
         self.oem_defined = []
 
+    def set_record_type(self, record_type):
+        self.record_type = record_type
+
     def set_oem_defined_bytes(self, elements):
         for element in elements:
             self.oem_defined.append(element)
 
-    def send_event(self, sel):
-        command = 'sel_add ' + hex(self.mc) + ' ' + hex(self.record_type) + ' ' \
-                + hex(self.ts_1) + ' ' + hex(self.ts_2) + ' ' + hex(self.ts_3) + ' ' + hex(self.ts_4) + ' ' \
-                + hex(self.mfg_id_1) + ' ' + hex(self.mfg_id_2) + ' ' + hex(self.mfg_id_3) + ' ' \
-                + ' '.join([hex(x) for x in self.oem_defined]) + '\n'
+    def get_command(self):
+        return 'sel_add ' + hex(self.mc) + ' ' + hex(self.record_type) + ' ' \
+            + hex(self.ts_1) + ' ' + hex(self.ts_2) + ' ' + hex(self.ts_3) + ' ' + hex(self.ts_4) + ' ' \
+            + hex(self.mfg_id_1) + ' ' + hex(self.mfg_id_2) + ' ' + hex(self.mfg_id_3) + ' ' \
+            + ' '.join([hex(x) for x in self.oem_defined]) + '\n'
 
-        logger.info(command)
+    def send_event(self, sel=None):
+        command = self.get_command()
+        logger.info("add SEL: %s", command.strip())
         send_ipmi_sim_command(command)
 
 
@@ -601,12 +613,110 @@ class OEM_SEL_E0_FF:
         # byte 4 - byte 16
         self.oem_defined = []
 
+    def set_record_type(self, record_type):
+        self.record_type = record_type
+
     def set_oem_defined_bytes(self, elements):
         for element in elements:
             self.oem_defined.append(element)
 
-    def send_event(self, sel):
-        command = 'sel_add ' + hex(self.mc) + ' ' + hex(self.record_type) + ' ' \
-                + ' '.join([hex(x) for x in self.oem_defined]) + '\n'
-        logger.info(command)
+    def get_command(self):
+        return 'sel_add ' + hex(self.mc) + ' ' + hex(self.record_type) + ' ' \
+            + ' '.join([hex(x) for x in self.oem_defined]) + '\n'
+
+    def send_event(self, sel=None):
+        command = self.get_command()
+        logger.info("add SEL: %s", command.strip())
         send_ipmi_sim_command(command)
+
+
+# lanserv answers a failed sel_add with the errno of ipmi_mc_add_to_sel
+SEL_ADD_ERROR = re.compile(r"Unable to add to sel(?::\s*(0x[0-9a-fA-F]+|\d+))?", re.I)
+
+# errors of sel_add when SEL of the MC has no free entry
+SEL_FULL_ERRORS = (errno.EAGAIN, errno.ENOSPC)
+
+
+def get_sel_add_error(result):
+    """
+    Check lanserv response of one sel_add command
+    :return: 0 if the entry is added, errno given by lanserv, or -1 if
+        there is no answer or the error is unknown
+    """
+    if not result:
+        return -1
+    m = SEL_ADD_ERROR.search(result)
+    if m is None:
+        return 0
+    if m.group(1) is None:
+        return -1
+    return int(m.group(1), 0)
+
+
+class SELBurst(object):
+    """
+    Inject count entries of one SEL record to vBMC at a target rate.
+
+    All sel_add commands are built before sending and written to lanserv
+    console in batches, one round trip per batch. Batches are spread in
+    time to keep the rate, rate 0 sends them back to back. The burst
+    stops once SEL is full.
+    """
+
+    def __init__(self, record, count, rate=0, batch=50, send=send_ipmi_sim_commands):
+        """
+        :param record: SEL, OEM_SEL_C0_DF or OEM_SEL_E0_FF
+        :param rate: target entries per second
+        :param batch: max commands in one round trip
+        """
+        self.__commands = [record.get_command()] * count
+        self.__rate = rate
+        if rate > 0:
+            # about 10 batches per second
+            batch = max(1, min(batch, int(rate / 10)))
+        self.__batch = batch
+        self.__send = send
+
+    def get_batch_size(self):
+        return self.__batch
+
+    def run(self):
+        """
+        :return: dict of entries "sent", "added", "lost", "unsent" after
+            SEL is full, "sel_full", "elapsed" seconds and achieved "rate"
+        """
+        sent = 0
+        added = 0
+        sel_full = False
+        start = time.time()
+        for first in range(0, len(self.__commands), self.__batch):
+            if self.__rate > 0:
+                delay = start + float(first) / self.__rate - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+
+            batch = self.__commands[first:first + self.__batch]
+            results = self.__send(batch)
+            sent += len(batch)
+            for result in results:
+                error = get_sel_add_error(result)
+                if error == 0:
+                    added += 1
+                elif error in SEL_FULL_ERRORS:
+                    sel_full = True
+            if sel_full:
+                break
+
+        elapsed = time.time() - start
+        result = {
+            "sent": sent,
+            "added": added,
+            "lost": sent - added,
+            "unsent": len(self.__commands) - sent,
+            "sel_full": sel_full,
+            "elapsed": elapsed,
+            "rate": added / elapsed if elapsed > 0 else 0.0
+        }
+        logger.info("SEL burst: {added}/{sent} added in {elapsed:.3f}s, "
+                    "{rate:.1f} entries/s, lost {lost}, SEL full {sel_full}".format(**result))
+        return result
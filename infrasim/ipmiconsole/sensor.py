@@ -79,11 +79,13 @@ class Sensor:
         self.name = name
         self.ID = ID
         self.tp = tp
+        self.lun = 0
         self.lock = threading.Lock()
         self.lock_sensor_write = threading.Lock()
-        self.condition = threading.Condition()
-        self.time_cond = threading.Condition()
         self.mode = "user"
+        # seconds between two updates in auto mode
+        self.interval = 5
+        self.scheduler = None
         self.value = value
         self.quit = False
         self.lnr = 0
@@ -110,13 +112,27 @@ class Sensor:
         return self.lun
 
     def set_lun(self, lun):
-        self.lun = lun
+        # owner LUN byte of SDR may carry channel number in bits 7:4
+        self.lun = lun & 0x03
 
     def get_mode(self):
         return self.mode
 
     def set_mode(self, mode):
         self.mode = mode
+        if self.scheduler:
+            self.scheduler.wakeup(self)
+
+    def get_interval(self):
+        return self.interval
+
+    def set_interval(self, interval):
+        self.interval = interval
+        if self.scheduler:
+            self.scheduler.wakeup(self, interval)
+
+    def set_scheduler(self, scheduler):
+        self.scheduler = scheduler
 
     def get_name(self):
         return self.name
@@ -158,18 +174,28 @@ class Sensor:
 
         self.sel.get_event()
 
-    def set_sel(self, event_id, event_dir):
+    def build_sel(self, event_id, event_dir):
+        """
+        Fill the SEL record of this sensor with an event
+        :return: SEL record, None if the event is illegal for this sensor
+        """
         if self.sel.check_event_type() is False:
-            return False
+            return None
 
         if self.sel.check_sensor_type() is False:
-            return False
+            return None
 
         if self.sel.set_event_data(event_id) is False:
-            return False
+            return None
 
         self.sel.set_event_dir(event_dir)
-        self.sel.send_event()
+        return self.sel
+
+    def set_sel(self, event_id, event_dir):
+        record = self.build_sel(event_id, event_dir)
+        if record is None:
+            return False
+        record.send_event()
 
     @with_type('threshold')
     def set_threshold_value(self, value):
@@ -593,35 +619,23 @@ class Sensor:
                 s_value = random.randint(self.unr, MAX)
         return s_value
 
-    def execute(self):
-        while not self.quit:
-            self.condition.acquire()
-            try:
-                if self.mode == "user":  # user mode
-                    self.condition.wait()
-                    if self.quit is True:
-                        return
-                else:
-                    if self.mode == "auto":  # auto mode
-                        s_value = self.get_random_value()
-                    else:  # fault mode
-                        s_value = self.get_fault_value()
-                        self.mode = "user"
-
-                    if s_value is None:
-                        continue
-
-                    self.value = s_value
-
-                    command = "sensor_set_value " + hex(self.mc) + " " \
-                        + hex(self.lun) + " " + hex(self.ID) + " " + hex(s_value) + " 0x01\n"
-                    send_ipmi_sim_command(command)
-
-                    if self.mode == "auto":  # auto mode
-                        self.condition.wait(5)
-                        if self.quit is True:
-                            return
-            # we release the lock so that master thread could join us
-            # and release the thread resource
-            finally:
-                self.condition.release()
+    def update(self):
+        """
+        Move to the next value in auto or fault mode, a fault is injected
+        once and the sensor goes back to user mode.
+        :return: the vBMC command to write the value, or None
+        """
+        if self.mode == "auto":
+            s_value = self.get_random_value()
+        elif self.mode == "fault":
+            s_value = self.get_fault_value()
+            self.mode = "user"
+        else:
+            return None
+
+        if s_value is None:
+            return None
+
+        self.value = s_value
+        return "sensor_set_value " + hex(self.mc) + " " \
+            + hex(self.lun) + " " + hex(self.ID) + " " + hex(s_value) + " 0x01\n"
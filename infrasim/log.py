@@ -1,6 +1,10 @@
+import atexit
+import collections
 import logging
 import logging.handlers
 import os
+import threading
+import time
 from enum import Enum
 import gzip
 import shutil
@@ -9,8 +13,72 @@ from infrasim import config
 infrasim_logdir = config.infrasim_log_dir
 EXCEPT_LEVEL_NUM = 35
 
+# seconds log writer waits after woken up, records in it are written
+# in one batch
+WRITER_DELAY = 0.02
+
+# seconds flush waits for queued records to be written at most
+FLUSH_TIMEOUT = 5
+
+LOG_FORMAT = '%(asctime)s - %(log_type)s - %(filename)s:' \
+    '%(lineno)s - %(levelname)s - %(message)s'
+
+
+def get_log_level():
+    level = logging.getLevelName(str(config.infrasim_log_level).upper())
+    if not isinstance(level, int):
+        return logging.INFO
+    return level
+
+
+def compress_file(src, dst):
+    tmp = "{}.tmp".format(dst)
+    with open(src, 'rb') as f_in, gzip.open(tmp, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.rename(tmp, dst)
+    os.remove(src)
+
 
 class CompressedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    Rotated log file is gzipped by a background thread, so that logging
+    isn't held while a full log file is compressed.
+
+    Log writer flushes the file once per batch of records, and the file
+    size is counted instead of seeking the file for every record.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.__size = 0
+        self.__compressor = None
+        logging.handlers.RotatingFileHandler.__init__(self, *args, **kwargs)
+
+    def _open(self):
+        stream = logging.handlers.RotatingFileHandler._open(self)
+        self.__size = os.path.getsize(self.baseFilename)
+        return stream
+
+    def wait_compress(self):
+        if self.__compressor is not None:
+            self.__compressor.join()
+            self.__compressor = None
+
+    def emit(self, record):
+        try:
+            msg = self.format(record)
+            if isinstance(msg, unicode):
+                msg = msg.encode("utf-8")
+            msg += "\n"
+            if self.stream is None:
+                self.stream = self._open()
+            if self.maxBytes > 0 and self.__size + len(msg) >= self.maxBytes:
+                self.doRollover()
+            self.stream.write(msg)
+            self.__size += len(msg)
+        except (KeyboardInterrupt, SystemExit):
+            raise
+        except Exception:
+            self.handleError(record)
 
     def doRollover(self):
         """
@@ -18,29 +86,196 @@ class CompressedRotatingFileHandler(logging.handlers.RotatingFileHandler):
         """
         if self.stream:
             self.stream.close()
+            self.stream = None
         if self.backupCount > 0:
+            # previous rotated file must be in place before shifting
+            self.wait_compress()
             for i in range(self.backupCount - 1, 0, -1):
                 sfn = "%s.%d.gz" % (self.baseFilename, i)
                 dfn = "%s.%d.gz" % (self.baseFilename, i + 1)
                 if os.path.exists(sfn):
-                    # print "%s -> %s" % (sfn, dfn)
                     if os.path.exists(dfn):
                         os.remove(dfn)
                     os.rename(sfn, dfn)
             dfn = self.baseFilename + ".1.gz"
             if os.path.exists(dfn):
                 os.remove(dfn)
-            # These two lines below are the only new lines.
-            #  I commented out the os.rename(self.baseFilename, dfn) and
-            #  replaced it with these two lines.
-            with open(self.baseFilename, 'rb') as f_in, \
-                    gzip.open(dfn, 'wb') as f_out:
-                shutil.copyfileobj(f_in, f_out)
-            # os.rename(self.baseFilename, dfn)
-            # print "%s -> %s" % (self.baseFilename, dfn)
+            sfn = self.baseFilename + ".1"
+            os.rename(self.baseFilename, sfn)
+            self.__compressor = threading.Thread(target=compress_file,
+                                                 args=(sfn, dfn),
+                                                 name="log-compress")
+            self.__compressor.start()
         self.mode = 'w'
         self.stream = self._open()
 
+    def close(self):
+        self.wait_compress()
+        logging.handlers.RotatingFileHandler.close(self)
+
+
+class QueueHandler(logging.Handler):
+    """
+    Pass records of a logger to log writer, tagged with the logger type
+    shown in log lines. Message is rendered in caller's thread, since
+    its args may change after the call.
+    """
+
+    def __init__(self, handler, log_type):
+        logging.Handler.__init__(self)
+        self.__handler = handler
+        self.__log_type = log_type
+
+    def emit(self, record):
+        try:
+            record.msg = record.getMessage()
+            record.args = None
+            if record.exc_info:
+                record.exc_text = self.__handler.formatter.formatException(record.exc_info)
+                record.exc_info = None
+            record.log_type = self.__log_type
+            log_writer.put(self.__handler, record)
+        except Exception:
+            self.handleError(record)
+
+
+class LogWriter(object):
+    """
+    One thread writing records of all infrasim loggers in this process,
+    with one handler per log file shared by all loggers writing to it.
+
+    Callers only append records to a deque. The writer drains it, writes
+    the records and flushes each file once per batch, rotation is done
+    in the writer too.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__handlers = {}
+        self.__records = None
+        self.__wakeup = None
+        self.__pid = None
+        self.__forked = None
+
+    def get_handler(self, path, rotate=False):
+        with self.__lock:
+            handler = self.__handlers.get(path)
+            if handler is None:
+                if rotate:
+                    handler = CompressedRotatingFileHandler(
+                        path, maxBytes=4 * 1024 * 1024, backupCount=100)
+                else:
+                    handler = CompressedRotatingFileHandler(path)
+                handler.setFormatter(logging.Formatter(LOG_FORMAT))
+                self.__handlers[path] = handler
+            return handler
+
+    def put(self, handler, record):
+        """
+        :param handler: handler to write record, None if record is an
+            Event to set once all records before it are written
+        """
+        if self.__pid != os.getpid():
+            self.__start()
+        self.__records.append((handler, record))
+        if not self.__wakeup.is_set():
+            self.__wakeup.set()
+
+    def __start(self):
+        pid = os.getpid()
+        if self.__pid is not None and self.__pid != pid and self.__forked != pid:
+            self.__after_fork(pid)
+        with self.__lock:
+            if self.__pid == pid:
+                return
+            # writer thread of parent process doesn't exist after fork,
+            # records queued by parent are left to parent
+            self.__records = collections.deque()
+            self.__wakeup = threading.Event()
+            writer = threading.Thread(target=self.__run,
+                                      args=(self.__records, self.__wakeup),
+                                      name="log-writer")
+            writer.daemon = True
+            writer.start()
+            self.__pid = pid
+
+    def __after_fork(self, pid):
+        # locks are copied in the state they were at fork, one held by a
+        # thread of parent, e.g. the writer in the middle of a record, is
+        # never released in this process
+        self.__forked = pid
+        self.__lock = threading.Lock()
+        for handler in self.__handlers.values():
+            handler.createLock()
+
+    @staticmethod
+    def __run(records, wakeup):
+        while True:
+            wakeup.wait()
+            # let a burst of records end instead of competing with it
+            time.sleep(WRITER_DELAY)
+            # clear before draining, a record appended after the last
+            # pop sets it again
+            wakeup.clear()
+            handlers = set()
+            done = []
+            while records:
+                handler, record = records.popleft()
+                if handler is None:
+                    done.append(record)
+                    continue
+                handler.handle(record)
+                handlers.add(handler)
+            for handler in handlers:
+                handler.flush()
+            for event in done:
+                event.set()
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        """
+        Wait until all queued records are written, at most timeout seconds.
+        :return: True if all records are written
+        """
+        if self.__pid != os.getpid():
+            return True
+        done = threading.Event()
+        self.put(None, done)
+        done.wait(timeout)
+        return done.is_set()
+
+    def close_handler(self, path):
+        self.flush()
+        with self.__lock:
+            handler = self.__handlers.pop(path, None)
+        if handler is not None:
+            handler.close()
+
+
+log_writer = LogWriter()
+atexit.register(log_writer.flush)
+
+
+def fork():
+    """
+    os.fork() leaving no lock of logging held in child by a thread which
+    doesn't exist there, as Python 3 does at fork.
+    """
+    logging._acquireLock()
+    try:
+        pid = os.fork()
+    except Exception:
+        logging._releaseLock()
+        raise
+    if pid == 0:
+        logging._lock = threading.RLock()
+        for ref in logging._handlerList:
+            handler = ref()
+            if handler is not None:
+                handler.createLock()
+    else:
+        logging._releaseLock()
+    return pid
+
 
 def EXCEPTION(self, message, *args, **kws):
     # Yes, logger takes its '*args' as 'args'.
@@ -70,23 +305,17 @@ class LoggerList(object):
     # set "infrasim.log" as all default logger files
     def __init__(self, node_id):
         self.__logger_list = {}
+        self.__log_files = set()
         self.__node_name = None
         self.__node_id = node_id
         if not os.path.exists(infrasim_logdir):
             os.mkdir(infrasim_logdir)
+        handler = log_writer.get_handler(os.path.join(infrasim_logdir, "infrasim.log"))
         for logger_name in LoggerType:
             logger = logging.getLogger("{}{}".format(
                 self.__node_id, logger_name.value))
-            infrasim_log_file = os.path.join(
-                infrasim_logdir, "infrasim.log")
-            self.__handler = logging.FileHandler(infrasim_log_file)
-            formatter = logging.Formatter(
-                '%(asctime)s - {} - %(filename)s:'
-                '%(lineno)s - %(levelname)s - %(message)s'.
-                    format(logger_name.value))
-            self.__handler.setFormatter(formatter)
-            logger.addHandler(self.__handler)
-            logger.setLevel(logging.DEBUG)
+            logger.handlers = [QueueHandler(handler, logger_name.value)]
+            logger.setLevel(get_log_level())
             self.__logger_list[logger_name.value] = logger
 
     # if logger_name is not given, raise Exception
@@ -132,15 +361,9 @@ class LoggerList(object):
                                         self.__node_name,
                                         'runtime.log')
             logger = self.__logger_list[logger_name.value]
-            handler = CompressedRotatingFileHandler(
-                log_file, maxBytes=4 * 1024 * 1024, backupCount=100)
-            formatter = logging.Formatter(
-                '%(asctime)s - {} - %(filename)s:'
-                '%(lineno)s - %(levelname)s - %(message)s'
-                    .format(logger_name.value))
-            handler.setFormatter(formatter)
-            logger.handlers = []
-            logger.addHandler(handler)
+            handler = log_writer.get_handler(log_file, rotate=True)
+            self.__log_files.add(log_file)
+            logger.handlers = [QueueHandler(handler, logger_name.value)]
             self.__logger_list[logger_name.value] = logger
 
     def get_node_id(self):
@@ -156,6 +379,9 @@ class LoggerList(object):
     def del_logger_list(self):
         for logger in self.__logger_list.values():
             logger.handlers = []
+        for log_file in self.__log_files:
+            log_writer.close_handler(log_file)
+        self.__log_files.clear()
 
 
 class ChassisLogger(object):
@@ -170,14 +396,9 @@ class ChassisLogger(object):
         logger = logging.getLogger(chassis_name)
         log_file = os.path.join(
                 infrasim_logdir, chassis_name, "chassis.log")
-        self.__handler = logging.FileHandler(log_file)
-        formatter = logging.Formatter(
-            '%(asctime)s - {} - %(filename)s:'
-            '%(lineno)s - %(levelname)s - %(message)s'.
-                format(chassis_name))
-        self.__handler.setFormatter(formatter)
-        logger.addHandler(self.__handler)
-        logger.setLevel(logging.DEBUG)
+        handler = log_writer.get_handler(log_file)
+        logger.handlers = [QueueHandler(handler, chassis_name)]
+        logger.setLevel(get_log_level())
         self.__logger = logger
 
     def get_logger(self):
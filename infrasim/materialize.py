@@ -0,0 +1,157 @@
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+# -*- coding: utf-8 -*-
+
+import errno
+import hashlib
+import os
+import shutil
+import stat
+import threading
+import jinja2
+from infrasim import config
+
+# templates under infrasim_template, compiled once per process and kept
+# compiled on disk for other processes
+_template_env = None
+_template_env_lock = threading.Lock()
+
+# path -> ((mtime, size), sha1 digest)
+_digest_cache = {}
+
+# files materialized in this process
+_stats = {"written": 0, "linked": 0, "skipped": 0}
+_stats_lock = threading.Lock()
+
+
+def get_template_env():
+    global _template_env
+    with _template_env_lock:
+        if _template_env is None:
+            _template_env = jinja2.Environment(
+                loader=jinja2.FileSystemLoader(config.infrasim_template, followlinks=True),
+                bytecode_cache=jinja2.FileSystemBytecodeCache(),
+                auto_reload=True)
+        return _template_env
+
+
+def render_template(name, **kwargs):
+    """
+    :param name: template path relative to infrasim_template
+    """
+    return get_template_env().get_template(name).render(**kwargs)
+
+
+def get_stats():
+    """
+    :return: number of files "written", "linked" and "skipped" as their
+        content is not changed
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def get_digest(path):
+    """
+    sha1 of file content, cached until the file is changed
+    """
+    st = os.stat(path)
+    signature = (st.st_mtime, st.st_size)
+    entry = _digest_cache.get(path)
+    if entry is not None and entry[0] == signature:
+        return entry[1]
+
+    sha = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    _digest_cache[path] = (signature, sha.digest())
+    return sha.digest()
+
+
+def replace_file(dst, content, mode=None):
+    """
+    Write content to a temporary file and rename it to dst, so that dst
+    is never seen partly written and a hard link of dst is not changed.
+    """
+    tmp = "{}.tmp".format(dst)
+    with open(tmp, "wb") as f:
+        f.write(content)
+    if mode is not None:
+        os.chmod(tmp, mode)
+    os.rename(tmp, dst)
+
+
+def _same_content(dst, content):
+    try:
+        if os.path.getsize(dst) != len(content):
+            return False
+        with open(dst, "rb") as f:
+            return f.read() == content
+    except (IOError, OSError):
+        return False
+
+
+def _set_mode(dst, mode):
+    if mode is not None and stat.S_IMODE(os.stat(dst).st_mode) != mode:
+        os.chmod(dst, mode)
+
+
+def write_file(dst, content, mode=None):
+    """
+    Write content to dst unless dst has the same content already
+    :param mode: permission bits of dst
+    :return: True if dst is written
+    """
+    if isinstance(content, unicode):
+        content = content.encode("utf-8")
+    if _same_content(dst, content):
+        _set_mode(dst, mode)
+        _count("skipped")
+        return False
+
+    replace_file(dst, content, mode)
+    _count("written")
+    return True
+
+
+def copy_file(src, dst, link=False):
+    """
+    Make dst a copy of src unless dst has the same content already
+    :param link: src is never changed in place, so dst can be a hard link
+        of it; files of a workspace are replaced instead of changed in place
+    :return: True if dst is written
+    """
+    if os.path.isfile(dst):
+        if os.path.samefile(src, dst) or \
+                (os.path.getsize(src) == os.path.getsize(dst) and
+                 get_digest(src) == get_digest(dst)):
+            _count("skipped")
+            return False
+
+    tmp = "{}.tmp".format(dst)
+    if link:
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+        try:
+            os.link(src, tmp)
+            os.rename(tmp, dst)
+            _count("linked")
+            return True
+        except OSError as e:
+            # on another file system, or link is not permitted
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                raise
+
+    shutil.copy(src, tmp)
+    os.rename(tmp, dst)
+    _count("written")
+    return True
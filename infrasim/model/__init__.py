@@ -10,6 +10,7 @@ Copyright @ 2015 EMC Corporation All Rights Reserved
 from infrasim.model.core.element import CElement
 from infrasim.model.core.task import Task
 from infrasim.model.core.node import CNode
+from infrasim.model.core.runtime import NodeRuntime
 from infrasim.model.core.chassis import CChassis
 
 from infrasim.model.elements.chardev import CCharDev
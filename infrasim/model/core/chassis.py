@@ -12,6 +12,7 @@ from infrasim import InfraSimError, ArgsNotCorrect
 from infrasim.chassis.dataset import DataSet
 from infrasim.helper import NumaCtl
 from infrasim.log import infrasim_log
+from infrasim.materialize import copy_file
 from infrasim.model import CNode
 from infrasim.model.tasks.chassis_daemon import CChassisDaemon
 from infrasim.workspace import ChassisWorkspace
@@ -151,6 +152,8 @@ class CChassis(object):
         buf["nodes_power"] = '\0' * node_nr
         # heart_beat: 1 byte per node.
         buf["heart_beat"] = '\0' * node_nr
+        # counter of power status changes, uint32.
+        buf["power_changes"] = '\0' * 4
 
         # setup led seciton.
         buf["led"] = ' ' * data.get("led", 20)
@@ -305,7 +308,7 @@ class CChassis(object):
             for node in self.__chassis.get("nodes"):
                 dst = os.path.join(config.infrasim_home, node["name"], "data")
                 if os.path.exists(dst):
-                    shutil.copy(oem_data_file, dst)
+                    copy_file(oem_data_file, os.path.join(dst, "oem_data.json"))
             # load and parse oem data
             with codecs.open(oem_data_file, 'r', 'utf-8') as f:
                 oem_data = json.load(f)
@@ -29,7 +29,10 @@ For each element class, they need to implement methods:
 
 class CElement(object):
     def __init__(self):
+        # options in order, with a set to tell duplicated option at once
         self.__option_list = []
+        self.__option_set = set()
+        self.__option = None
         self.__owner = None
         self.__logger = infrasim_log.get_logger(LoggerType.model.value)
 
@@ -65,8 +68,8 @@ class CElement(object):
         if option is None:
             return
 
-        if option in self.__option_list:
-            self.__logger.warning('option {} already added'.format(option))
+        if option in self.__option_set:
+            self.__logger.warning('option %s already added', option)
             print "Warning: option {} already added.".format(option)
             return
 
@@ -74,10 +77,19 @@ class CElement(object):
             self.__option_list.insert(0, option)
         else:
             self.__option_list.append(option)
+        self.__option_set.add(option)
+        self.__option = None
+
+    def clear_option(self):
+        self.__option_list = []
+        self.__option_set = set()
+        self.__option = None
 
     def get_option(self):
         if len(self.__option_list) == 0:
             self.__logger.exception("No option in the list")
             raise Exception("No option in the list")
 
-        return " ".join(self.__option_list)
+        if self.__option is None:
+            self.__option = " ".join(self.__option_list)
+        return self.__option
@@ -16,6 +16,9 @@ from infrasim import ArgsNotCorrect
 from infrasim import config, helper
 from infrasim.helper import run_in_namespace
 from infrasim.log import infrasim_log, LoggerType
+from infrasim.materialize import get_stats
+from infrasim.model.core.runtime import NodeRuntime
+from infrasim.model.core.scheduler import TaskScheduler
 from infrasim.model.tasks.bmc import CBMC
 from infrasim.model.tasks.compute import CCompute
 from infrasim.model.tasks.monitor import CMonitor
@@ -37,6 +40,7 @@ class CNode(object):
         self.__netns = None
         self.__logger = infrasim_log.get_logger(LoggerType.model.value)
         self.__shm_key = None
+        self.__startup_time = 0
 
     @property
     def netns(self):
@@ -170,6 +174,12 @@ class CNode(object):
             bmc_obj.set_type(self.__node['type'])
             compute_obj.set_type(self.__node['type'])
 
+        # QEMU connects to serial socket of socat and chardev of ipmi_sim
+        # while starting, so both shall be ready before it.
+        if self.__sol_enabled:
+            compute_obj.add_dependency(socat_obj)
+        compute_obj.add_dependency(bmc_obj)
+
         if self.__sol_enabled:
             if "sol_device" in self.__node:
                 socat_obj.set_sol_device(self.__node["sol_device"])
@@ -216,6 +226,7 @@ class CNode(object):
             monitor_obj.set_node_name(self.__node_name)
             monitor_obj.set_task_name("{}-monitor".format(self.__node_name))
             monitor_obj.set_log_path(os.path.join(config.infrasim_log_dir, self.__node_name, "monitor.log"))
+            monitor_obj.add_dependency(compute_obj)
             self.__tasks_list.append(monitor_obj)
 
         self.workspace = Workspace(self.__node)
@@ -223,6 +234,7 @@ class CNode(object):
         for task in self.__tasks_list:
             task.set_workspace(self.workspace.get_workspace())
 
+        materialized = get_stats()
         if not self.__is_running():
             self.workspace.init()
 
@@ -233,13 +245,30 @@ class CNode(object):
         for task in self.__tasks_list:
             task.init()
 
-    # Run tasks list as the priority
+        stats = get_stats()
+        self.__logger.info("[Node] Workspace files: {} written, {} linked, {} unchanged".format(
+            *[stats[key] - materialized[key] for key in ("written", "linked", "skipped")]))
+
+    # Run tasks list as the dependency graph, independent tasks start together
     def start(self):
         # sort the tasks as the priority
         self.__tasks_list.sort(key=lambda x: x.get_priority(), reverse=False)
 
-        for task in self.__tasks_list:
-            task.run()
+        # status and stop of a started node read tasks from the manifest
+        NodeRuntime.save(self.__node, self.workspace.get_workspace(), self.__tasks_list)
+
+        scheduler = TaskScheduler(self.__tasks_list, self.__logger)
+        elapsed = scheduler.run()
+        self.__startup_time = scheduler.get_total()
+        self.__logger.info("[Node] Node {} started in {:.3f}s".
+                           format(self.__node_name, self.__startup_time))
+        return elapsed
+
+    def get_startup_time(self):
+        """
+        Wall time in second of the last start
+        """
+        return self.__startup_time
 
     def stop(self):
         # sort the tasks as the priority in reversed sequence
@@ -0,0 +1,136 @@
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+# -*- coding: utf-8 -*-
+
+import json
+import os
+from infrasim import config
+from infrasim.cpu_ledger import CPULedger
+from infrasim.log import infrasim_log, LoggerType
+from infrasim.model.core.task import Task
+from infrasim.model.elements.qemu_monitor import CQemuMonitor
+from infrasim.model.tasks.compute import powerdown
+
+logger = infrasim_log.get_logger(LoggerType.model.value)
+
+
+class RuntimeTask(Task):
+    """
+    A started task known only by its runtime information, it checks and
+    stops the process through pid file as the task model does.
+    """
+
+    def __init__(self, workspace, info):
+        super(RuntimeTask, self).__init__()
+        self.__info = info
+        self.set_task_name(info["name"])
+        self.set_priority(info["priority"])
+        self.set_workspace(workspace)
+
+    def terminate(self):
+        if self.__info.get("monitor") and not self.__info.get("force_shutdown"):
+            monitor = CQemuMonitor({
+                'mode': 'control',
+                'chardev': {
+                    'backend': 'socket',
+                    'path': self.__info["monitor"],
+                    'server': True,
+                    'wait': False
+                }
+            })
+            monitor.logger = self.logger
+            monitor.init()
+            powerdown(self, monitor)
+        else:
+            super(RuntimeTask, self).terminate()
+
+        if self.__info.get("cpu_ledger"):
+            CPULedger().release(self.get_task_name())
+
+        serial_socket = self.__info.get("serial_socket")
+        if serial_socket and os.path.exists(serial_socket):
+            os.remove(serial_socket)
+
+
+class NodeRuntime(object):
+    """
+    Runtime manifest of a started node: its tasks with pid files, ports and
+    network namespace. Node status and stop read it instead of initializing
+    the whole node model again.
+    """
+
+    VERSION = 1
+    MANIFEST = "etc/runtime.json"
+
+    def __init__(self, node_name, workspace, runtime):
+        self.__node_name = node_name
+        self.__workspace = workspace
+        self.__runtime = runtime
+        self.__tasks_list = [RuntimeTask(workspace, info) for info in runtime["tasks"]]
+
+    @staticmethod
+    def get_manifest_path(workspace):
+        return os.path.join(workspace, NodeRuntime.MANIFEST)
+
+    @staticmethod
+    def save(node_info, workspace, tasks_list):
+        runtime = {
+            "version": NodeRuntime.VERSION,
+            "name": node_info["name"],
+            "netns": node_info.get("namespace"),
+            "ports": {
+                "ipmi_console_port": node_info.get("ipmi_console_port"),
+                "bmc_connection_port": node_info.get("bmc_connection_port"),
+                "vnc_display": node_info.get("compute", {}).get("vnc_display", 1)
+            },
+            "tasks": [task.get_runtime_info() for task in tasks_list]
+        }
+        path = NodeRuntime.get_manifest_path(workspace)
+        tmp = "{}.tmp".format(path)
+        with open(tmp, "w") as f:
+            json.dump(runtime, f, indent=4)
+        os.rename(tmp, path)
+
+    @staticmethod
+    def load(node_name):
+        """
+        :return: NodeRuntime of node, None if node is not started with a
+            manifest of this version
+        """
+        workspace = os.path.join(config.infrasim_home, node_name)
+        try:
+            with open(NodeRuntime.get_manifest_path(workspace), "r") as f:
+                runtime = json.load(f)
+        except (IOError, ValueError):
+            return None
+
+        if not isinstance(runtime, dict) or runtime.get("version") != NodeRuntime.VERSION:
+            logger.info("[NodeRuntime] Ignore runtime manifest of node {} in other version".
+                        format(node_name))
+            return None
+        return NodeRuntime(node_name, workspace, runtime)
+
+    def get_node_name(self):
+        return self.__node_name
+
+    @property
+    def netns(self):
+        return self.__runtime.get("netns")
+
+    def get_ports(self):
+        return self.__runtime.get("ports", {})
+
+    def get_task_list(self):
+        return self.__tasks_list
+
+    def stop(self):
+        # sort the tasks as the priority in reversed sequence
+        for task in sorted(self.__tasks_list, key=lambda x: x.get_priority(), reverse=True):
+            task.terminate()
+
+    def status(self):
+        for task in self.__tasks_list:
+            task.status()
@@ -0,0 +1,127 @@
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+from infrasim import ArgsNotCorrect
+from infrasim.log import infrasim_log, LoggerType
+
+
+class TaskScheduler(object):
+    """
+    Start a group of tasks as a dependency graph.
+
+    Every task is started in its own thread as soon as all tasks it
+    depends on are started and report ready (see Task.is_ready()), so
+    independent tasks, e.g. socat, ipmi_sim and racadmsim, no longer wait
+    for each other.
+    """
+
+    def __init__(self, tasks, logger=None, timeout=30):
+        self.__tasks = list(tasks)
+        self.__timeout = timeout
+        self.__logger = logger or infrasim_log.get_logger(LoggerType.model.value)
+        self.__done = {}
+        self.__failed = set()
+        self.__errors = []
+        self.__elapsed = {}
+        self.__total = 0
+        self.__lock = threading.Lock()
+
+    def get_dependencies(self, task):
+        # ignore dependencies on tasks which are not scheduled, e.g.
+        # socat is not created when SOL is disabled
+        return [dep for dep in task.get_dependencies() if dep in self.__tasks]
+
+    def sort(self):
+        """
+        Return tasks in a topological order, tasks in the same level are
+        ordered by priority. Raise ArgsNotCorrect on a dependency loop.
+        """
+        ordered = []
+        pending = sorted(self.__tasks, key=lambda x: x.get_priority())
+        while pending:
+            ready = [task for task in pending
+                     if all(dep in ordered for dep in self.get_dependencies(task))]
+            if not ready:
+                raise ArgsNotCorrect("[Scheduler] Dependency loop among tasks: {}".
+                                     format(", ".join(t.get_task_name() for t in pending)))
+            ordered.extend(ready)
+            pending = [task for task in pending if task not in ready]
+        return ordered
+
+    def get_elapsed(self):
+        return self.__elapsed
+
+    def get_total(self):
+        return self.__total
+
+    def __start_task(self, task):
+        deps = self.get_dependencies(task)
+        for dep in deps:
+            self.__done[dep].wait()
+
+        name = task.get_task_name()
+        if any(dep in self.__failed for dep in deps):
+            self.__logger.warning("[Scheduler] {} is skipped since its dependency failed".format(name))
+            with self.__lock:
+                self.__failed.add(task)
+            self.__done[task].set()
+            return
+
+        start = time.time()
+        try:
+            # a task already running is not launched again, nor waited for
+            if task.run() is not False and not task.wait_ready(self.__timeout):
+                self.__logger.warning("[Scheduler] {} is not ready in {}s".format(name, self.__timeout))
+        except Exception as e:
+            with self.__lock:
+                self.__failed.add(task)
+                self.__errors.append(e)
+        finally:
+            self.__elapsed[name] = time.time() - start
+            self.__logger.info("[Scheduler] {} took {:.3f}s to start".format(name, self.__elapsed[name]))
+            self.__done[task].set()
+
+    def run(self):
+        """
+        Start all tasks and block until every one is ready or failed.
+        The first exception raised by a task is re-raised here.
+        :return: dict of task name to start up wall time in second
+        """
+        ordered = self.sort()
+        self.__done = dict((task, threading.Event()) for task in ordered)
+        self.__failed = set()
+        self.__errors = []
+        self.__elapsed = {}
+
+        start = time.time()
+        threads = []
+        for task in ordered:
+            t = threading.Thread(target=self.__start_task, args=(task,),
+                                 name=task.get_task_name())
+            t.daemon = True
+            t.start()
+            threads.append(t)
+
+        # join with timeout so that the main thread is still able to
+        # handle signals such as Ctrl+C
+        for t in threads:
+            while t.is_alive():
+                t.join(0.1)
+
+        self.__total = time.time() - start
+        self.__logger.info("[Scheduler] {} task(s) started in {:.3f}s ({})".
+                           format(len(ordered), self.__total,
+                                  ", ".join("{}: {:.3f}s".format(t.get_task_name(),
+                                                                 self.__elapsed.get(t.get_task_name(), 0))
+                                            for t in ordered)))
+
+        if self.__errors:
+            raise self.__errors[0]
+
+        return self.__elapsed
@@ -12,12 +12,18 @@ import signal
 import shlex
 import subprocess
 import fcntl
+import select
+import threading
 from infrasim import CommandRunFailed
+from infrasim import helper
 from infrasim.log import infrasim_log, LoggerType
 from infrasim.helper import run_in_namespace, double_fork
 from infrasim.filelock import FileLock
 from infrasim.colors import icolors
 
+# tasks of one node may start in parallel, keep their status lines apart
+_print_lock = threading.Lock()
+
 
 class Task(object):
     def __init__(self):
@@ -38,6 +44,7 @@ class Task(object):
         # no actual run shall be taken
         self.__asyncronous = False
         self.__netns = None
+        self.__dependencies = []
         self.checking_time = 1
 
     @property
@@ -60,6 +67,16 @@ class Task(object):
     def get_task_name(self):
         return self.__task_name
 
+    def add_dependency(self, task):
+        """
+        This task shall only be started after the given task is ready.
+        """
+        if task is not None and task is not self and task not in self.__dependencies:
+            self.__dependencies.append(task)
+
+    def get_dependencies(self):
+        return self.__dependencies
+
     def get_commandline(self):
         self.__logger.exception("get_commandline not implemented")
         raise NotImplementedError("get_commandline not implemented")
@@ -87,6 +104,13 @@ class Task(object):
     def get_pid_file(self):
         return "{}/.{}.pid".format(self.__workspace, self.__task_name)
 
+    def get_runtime_info(self):
+        """
+        What it takes to check or stop the task without its model, saved
+        in runtime manifest of node.
+        """
+        return {"name": self.__task_name, "priority": self.__task_priority}
+
     def get_task_pid(self):
         pid = "-1"
         try:
@@ -105,19 +129,66 @@ class Task(object):
         pid = self.get_task_pid() if pid < 0 else pid
         return self.__task_is_running(pid)
 
-    def __wait_task_completed(self, lock, pid=-1, timeout=15):
-        timeout = timeout - self.checking_time + 1
+    def probe_ready(self):
+        """
+        Check whether the service provided by the task is usable, e.g. a
+        listening socket. It's evaluated right after the process is
+        launched, before its pid file exists, so it shall not rely on it.
+        Return None if the task has nothing to probe, then the task is
+        considered started once it survives checking_time.
+        """
+        return None
+
+    def is_ready(self):
+        """
+        Readiness checked before any dependent task is started.
+        """
+        return self.task_is_running() and self.probe_ready() is not False
 
+    @run_in_namespace
+    def wait_ready(self, timeout=15):
+        pid = self.get_task_pid()
+        if not self.__task_is_running(pid):
+            return False
+
+        # pidfd becomes readable when process exits, so a dead task is
+        # detected at once, only the probe itself is retried with backoff
+        pidfd = helper.pidfd_open(pid)
+        interval = 0.01
         start = time.time()
-        while True:
-            if time.time() - start > timeout:
-                break
+        try:
+            while True:
+                if self.probe_ready() is not False:
+                    return True
+                remaining = timeout - (time.time() - start)
+                if remaining <= 0:
+                    return False
+                if pidfd is not None:
+                    r, _, _ = select.select([pidfd], [], [], min(interval, remaining))
+                    if r:
+                        return False
+                else:
+                    time.sleep(min(interval, remaining))
+                    if not self.__task_is_running(pid):
+                        return False
+                interval = min(interval * 2, 0.2)
+        finally:
+            if pidfd is not None:
+                os.close(pidfd)
 
-            if self.task_is_running(pid):
-                break
+    def __wait_task_completed(self, lock, pid=-1, timeout=15):
+        if pid > 0:
+            # process is launched by us, execute_command() has already
+            # waited for it
+            return self.task_is_running(pid)
 
-            lock.release()
-            time.sleep(0.5)
+        # pid file is written by someone else, e.g. QEMU is launched by
+        # ipmi_sim, release the lock for it and watch the pid file.
+        timeout = timeout - self.checking_time + 1
+        lock.release()
+        try:
+            helper.wait_file_event(self.get_pid_file(), self.task_is_running, timeout)
+        finally:
             lock.acquire()
 
         # in case the process created, but exit accidently, so
@@ -125,13 +196,18 @@ class Task(object):
         return self.task_is_running(pid)
 
     def __print_task(self, pid, name, state, color=icolors.GREEN):
-        print("{}{}{}".format(icolors.WHITE, "[", icolors.NORMAL), end='')
-        print(" {}{:<6}{} ".format(color, pid, icolors.NORMAL), end='')
-        print("{}{}{}".format(icolors.WHITE, "]", icolors.NORMAL), end='')
-        print(" {} is {}.".format(name, state))
+        with _print_lock:
+            print("{}{}{}".format(icolors.WHITE, "[", icolors.NORMAL), end='')
+            print(" {}{:<6}{} ".format(color, pid, icolors.NORMAL), end='')
+            print("{}{}{}".format(icolors.WHITE, "]", icolors.NORMAL), end='')
+            print(" {} is {}.".format(name, state))
 
     @run_in_namespace
     def run(self):
+        """
+        :return: False if the task is already running and nothing is
+            launched
+        """
         pid_file = self.get_pid_file()
         lock = FileLock("{}.lck".format(pid_file))
         if self.__asyncronous:
@@ -155,13 +231,14 @@ class Task(object):
                 self.__print_task(self.get_task_pid(), self.__task_name, "running")
                 self.__logger.info("[ {:<6} ] {} is already running".format(self.get_task_pid(),
                                                                             self.__task_name))
-                return
+                return False
             elif os.path.exists(pid_file):
                 # If the qemu quits exceptionally when starts, pid file is also
                 # created, but actually the qemu died.
                 os.remove(pid_file)
 
-            pid = self.execute_command(cmdline, self.__logger, log_path=self.__log_path, duration=self.checking_time)
+            pid = self.execute_command(cmdline, self.__logger, log_path=self.__log_path,
+                                       duration=self.checking_time, probe=self.probe_ready)
 
             if self.__wait_task_completed(lock, pid):
                 self.__print_task(pid, self.__task_name, "running")
@@ -179,8 +256,7 @@ class Task(object):
             try:
                 if self.__task_is_running(task_pid):
                     os.kill(task_pid, signal.SIGTERM)
-                    time.sleep(1)
-                    if self.__task_is_running(task_pid):
+                    if not helper.wait_pid_exit(task_pid, 1):
                         os.kill(task_pid, signal.SIGKILL)
                     self.__print_task(task_pid, self.__task_name, "stopped", icolors.RED)
                     self.__logger.info("[ {:<6} ] {} stop".format(task_pid, self.__task_name))
@@ -215,30 +291,64 @@ class Task(object):
 
     @staticmethod
     @double_fork
-    def execute_command(command, logger, log_path="", duration=1):
+    def execute_command(command, logger, log_path="", duration=1, probe=None):
+        """
+        Launch command and wait at most duration seconds, it returns as
+        soon as probe() is True, or raises CommandRunFailed as soon as the
+        process exits.
+        """
         args = shlex.split(command)
         proc = subprocess.Popen(args, stdin=subprocess.PIPE,
                                 stdout=subprocess.PIPE,
                                 stderr=subprocess.PIPE,
                                 shell=False)
 
-        flags = fcntl.fcntl(proc.stderr, fcntl.F_GETFL)
-        fcntl.fcntl(proc.stderr, fcntl.F_SETFL, flags | os.O_NONBLOCK)
-        time.sleep(duration)
+        fd = proc.stderr.fileno()
+        flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+        fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+        # stderr gets EOF once process exits, and this is the parent of
+        # process, so waitpid() via poll() tells the exit at once
+        errout = ""
+        watch = [fd]
+        interval = 0.01
+        start = time.time()
+        while proc.poll() is None:
+            remaining = duration - (time.time() - start)
+            if remaining <= 0:
+                break
+            if watch:
+                r, _, _ = select.select(watch, [], [], min(interval, remaining))
+                if r:
+                    try:
+                        snip = os.read(fd, 4096)
+                    except OSError:
+                        snip = None
+                    if snip == "":
+                        watch = []
+                    elif snip:
+                        errout += snip
+            else:
+                time.sleep(min(interval, remaining))
+            try:
+                if probe and probe() is True:
+                    break
+            except Exception:
+                pass
+            interval = min(interval * 2, 0.2)
 
-        errout = None
         try:
-            errout = proc.stderr.read()
-        except IOError:
+            errout += os.read(fd, 65536)
+        except OSError:
             pass
-        if errout is not None:
+        if errout:
             if log_path:
                 with open(log_path, 'w') as fp:
                     fp.write(errout)
             else:
                 logger.error(errout)
 
-        if not os.path.isdir("/proc/{}".format(proc.pid)):
+        if proc.poll() is not None:
             logger.exception("command {} run failed".format(command))
             raise CommandRunFailed(command, errout)
 
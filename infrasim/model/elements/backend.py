@@ -16,7 +16,7 @@ from infrasim.model.elements.storage_pmc import PMCSASController
 from infrasim.model.elements.drive_nvme import NVMeController
 from infrasim.model.elements.storage_ahci import AHCIController
 from infrasim.model.elements.chassisslot import CChassisSlot
-from infrasim.model.elements.storage_diskarray import DiskArrayController
+from infrasim.model.elements.storage_diskarray import DiskArrayController, TopoCache
 
 
 class CBackendNetwork(CElement):
@@ -97,14 +97,35 @@ class CBackendStorage(CElement):
     def __init_diskarray(self):
         ws = os.path.join(helper.get_ws_folder(self), "data")
         diskarray = DiskArrayController(ws)
-        diskarray.add_storage_backend(self.__backend_storage_info)
-        dae_topo = diskarray.get_topo()
-        if dae_topo is not None:
-            filename = os.path.join(ws, "sas_topo.bin")
-            with open(filename, "w") as f:
-                f.write(dae_topo)
-            diskarray.set_topo_file(self.__backend_storage_info, filename)
-            diskarray.export_drv_data()
+        filename = os.path.join(ws, "sas_topo.bin")
+
+        # disk array handled by chassis is not cached here
+        cache = TopoCache(ws)
+        digest = None
+        if filter(lambda x: x["type"] == "disk_array" and not x.get("sas_drives"),
+                  self.__backend_storage_info):
+            digest = TopoCache.digest(self.__backend_storage_info)
+        cached_files = cache.lookup(digest) if digest else None
+
+        if cached_files is not None:
+            diskarray.reuse_topo(self.__backend_storage_info, filename)
+            for controller in self.__backend_storage_info:
+                if controller.get("sas_topo"):
+                    controller["topo_cache"] = cached_files
+        else:
+            diskarray.add_storage_backend(self.__backend_storage_info)
+            dae_topo = diskarray.get_topo()
+            if dae_topo is not None:
+                with open(filename, "w") as f:
+                    f.write(dae_topo)
+                diskarray.set_topo_file(self.__backend_storage_info, filename)
+                diskarray.export_drv_data()
+                if digest:
+                    cache.store(digest, [os.path.basename(filename), "sas_all_drives.json"])
+
+        if digest:
+            self.logger.info("[BackendStorage] Disk array topology cache {}, hits: {}, misses: {}".format(
+                "hit" if cached_files is not None else "miss", TopoCache.hits, TopoCache.misses))
 
         diskarray.merge_drv_data(self.__backend_storage_info)
         self.__backend_storage_info = filter(lambda x: x["type"] != "disk_array", self.__backend_storage_info)
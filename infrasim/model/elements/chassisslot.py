@@ -9,6 +9,7 @@ import os
 import codecs
 import json
 from infrasim import ArgsNotCorrect
+from infrasim.materialize import write_file
 from infrasim.model.core.element import CElement
 
 
@@ -62,6 +63,5 @@ class CChassisSlot(CElement):
             else:
                 nvme_dict[slot_id] = self.__nvme_map_dict[slot_id]
         oem_dict['nvme'] = nvme_dict
-        with open(filename, 'w') as f:
-            json.dump(oem_dict, f, indent=4)
+        write_file(filename, json.dumps(oem_dict, indent=4))
         self.logger.info("Fill OEM json file: Done!")
@@ -8,9 +8,74 @@ Copyright @ 2015 EMC Corporation All Rights Reserved
 import re
 import copy
 import multiprocessing
-from infrasim import run_command, has_option
+from infrasim import helper, has_option
+from infrasim.cpu_topology import get_host_topology, parse_cpu_list
 from infrasim.model.core.element import CElement
 
+# N threads share one physical cpu
+SHARE_POLICY = re.compile(r"share-(\d+)$")
+
+
+def get_spread_order(cores, topology=None):
+    """
+    Order cores so that neighbours are on different sockets, then on
+    different physical cores, hyper-thread siblings come last
+    """
+    if topology is None:
+        return list(cores)
+
+    sibling_index = {}
+    core_index = {}
+    siblings = {}
+    physical_cores = {}
+    for cpu in cores:
+        socket, core = topology.get_core(cpu)
+        sibling_index[cpu] = siblings.get((socket, core), 0)
+        siblings[(socket, core)] = sibling_index[cpu] + 1
+        physical = physical_cores.setdefault(socket, [])
+        if core not in physical:
+            physical.append(core)
+        core_index[cpu] = physical.index(core)
+    return sorted(cores, key=lambda cpu: (sibling_index[cpu], core_index[cpu], topology.get_socket(cpu)))
+
+
+def plan_affinity(policy, threads, cores, topology=None):
+    """
+    Plan cpus of each thread for a binding policy:
+    - mono: thread i on core i
+    - spread: threads round robin over sockets and physical cores
+    - numa-local: every thread floats on cores in the NUMA node which has
+      most of the cores
+    - share-N: N threads on each core
+    :return: list of (thread, cpus)
+    """
+    if not cores:
+        return []
+
+    if policy == "mono":
+        return [(thread, [core]) for thread, core in zip(threads, cores)]
+
+    if policy == "spread":
+        order = get_spread_order(cores, topology)
+        return [(thread, [order[i % len(order)]]) for i, thread in enumerate(threads)]
+
+    if policy == "numa-local":
+        local = list(cores)
+        if topology is not None:
+            nodes = {}
+            for cpu in cores:
+                nodes.setdefault(topology.get_node(cpu), []).append(cpu)
+            local = max(sorted(nodes.items()), key=lambda item: len(item[1]))[1]
+        return [(thread, local) for thread in threads]
+
+    m = SHARE_POLICY.match(str(policy))
+    if m and int(m.group(1)) > 0:
+        share = int(m.group(1))
+        return [(thread, [cores[i // share]]) for i, thread in enumerate(threads)
+                if i // share < len(cores)]
+
+    return []
+
 
 class CCPUBinding(CElement):
     """
@@ -57,11 +122,9 @@ class CCPUBinding(CElement):
                                 format(self.__bind_cpus, multiprocessing.cpu_count()))
             self.__bind_cpus = []
 
+        topology = get_host_topology()
         # check physical cpus are isolated
-        fd = open("/sys/devices/system/cpu/isolated", "r")
-        rst = fd.read().strip(" \n")
-        fd.close()
-        cpu_list = self.get_cores(rst)
+        cpu_list = topology.isolated
         result = all(elem in cpu_list for elem in self.__bind_cpus)
         if not result:
             print("\033[93mWarning:\033[0m some cpus in bind_cpus are not isolated,"
@@ -72,32 +135,13 @@ class CCPUBinding(CElement):
                                 " please check your configuration")
             self.__bind_cpus = []
 
-        # check binding cpus are in the same socket
-        fd = open("/proc/cpuinfo", "r")
-        lines = fd.readlines()
-        fd.close()
-        phy_id = 0
-        processor = 0
-        found = False
-        sockets = {}
-        for line in lines:
-            if line.strip():
-                name, value = line.split(":", 1)
-                name = name.strip()
-                value = value.strip()
-                if name == "physical id":
-                    phy_id = value
-                if name == "processor":
-                    processor = value
-            else:
-                if phy_id not in sockets:
-                    sockets[phy_id] = []
-                sockets[phy_id].append(int(processor))
-        for value in sockets.itervalues():
-            if all(elem in value for elem in self.__bind_cpus):
-                found = True
-                break
-        if not found:
+        # check binding cpus are in the same socket, unless threads are
+        # spread over sockets on purpose
+        if any(value.get("policy") == "spread" for value in self.__cpu_binding_info.values()):
+            return
+        sockets = set([topology.get_socket(cpu) for cpu in self.__bind_cpus
+                       if cpu in topology.get_cpus()])
+        if len(sockets) > 1 or any(cpu not in topology.get_cpus() for cpu in self.__bind_cpus):
             print("\033[93mWarning:\033[0m bind_cpus are not in the same socket, not binding...")
             self.logger.warning("[CCPUBinding] bind_cpus are not in the same socket, not binding...")
             self.__bind_cpus = []
@@ -121,6 +165,17 @@ class CCPUBinding(CElement):
                                     " not align to the policy {}, not binding...".format(dup, key, policy))
                 del self.__cpu_binding_info[key]
 
+        elif policy in ["spread", "numa-local"] or SHARE_POLICY.match(str(policy)):
+            m = SHARE_POLICY.match(str(policy))
+            if not cores or (m and len(cores) * int(m.group(1)) < len(threads)):
+                print("\033[93mWarning:\033[0m Not enough binding cpus for {} threads with policy {},"
+                      " not binding {}...".format(len(threads), policy, key))
+                self.logger.warning("[CCPUBinding] Not enough binding cpus for {} threads with policy {},"
+                                    " not binding {}...".format(len(threads), policy, key))
+                del self.__cpu_binding_info[key]
+                return
+            self.__bind_cpus.extend([core for core in cores if core not in self.__bind_cpus])
+
         else:
             print("\033[93mWarning:\033[0m Binding policy {} is not supported yet, not binding {}...".format(
                 policy, key))
@@ -150,54 +205,35 @@ class CCPUBinding(CElement):
         self.__vcpu_quantities = vcpu_quantities
 
     def get_cores(self, bind_cpus):
-        cores = []
         if not bind_cpus:
-            return cores
-        cpu_lists = str(bind_cpus).split(",")
-        for cpu_list in cpu_lists:
-            if cpu_list.find('-') >= 0:
-                cpu_range = cpu_list.split('-')
-                cores.extend(list(range(int(cpu_range[0]), int(cpu_range[1]) + 1)))
-            else:
-                cores.append(int(cpu_list))
-        return cores
+            return []
+        return parse_cpu_list(bind_cpus)
 
     def get_thread_id(self):
-        # get vcpu process id
-        vcpu_thread_ids = []
-        payload = {
-            "execute": "human-monitor-command",
-            "arguments": {
-                "command-line": "info cpus"
-            }
-        }
+        # get vcpu thread ids, query-cpus-fast doesn't interrupt vcpus,
+        # QEMU before 2.12 only has query-cpus
+        res = {}
         self.__monitor.open()
-        self.__monitor.send(payload)
-        res = self.__monitor.recv().get("return")
-        self.__monitor.close()
-        for s in res.split('\n'):
-            vcpu_thread_id = re.search(r"thread_id=(\d+)", s)
-            if vcpu_thread_id:
-                vcpu_thread_ids.append(vcpu_thread_id.group(1))
-        return vcpu_thread_ids
+        try:
+            for command in ["query-cpus-fast", "query-cpus"]:
+                self.__monitor.send({"execute": command})
+                res = self.__monitor.recv() or {}
+                if "return" in res:
+                    break
+        finally:
+            self.__monitor.close()
 
-    def bind_cpus_with_policy(self, threads, cores, policy):
-        if policy == "mono":
-            self.bind_cpus_mono(cores, threads)
-        else:
-            # TODO: call other binding methods
-            pass
+        cpus = sorted(res.get("return", []), key=lambda cpu: cpu.get("cpu-index", cpu.get("CPU", 0)))
+        return [str(cpu.get("thread-id", cpu.get("thread_id"))) for cpu in cpus]
 
-    def bind_cpus_mono(self, cores, threads):
-        try:
-            i = 0
-            for core in cores:
-                if i < len(cores):
-                    cmd = "taskset -pc {} {}".format(core, threads[i])
-                    run_command(cmd)
-                i = i + 1
-        except Exception as e:
-            self.logger.warning('[CCPUBinding] {}'.format(str(e)))
+    def bind_cpus_with_policy(self, threads, cores, policy):
+        for thread, cpus in plan_affinity(policy, threads, cores, get_host_topology()):
+            if int(thread) < 0:
+                continue
+            try:
+                helper.sched_setaffinity(thread, cpus)
+            except OSError as e:
+                self.logger.warning('[CCPUBinding] {}'.format(str(e)))
 
     def run_vm(self):
         payload = {
@@ -7,11 +7,10 @@ Copyright @ 2015 EMC Corporation All Rights Reserved
 
 
 import os
-import json
 import math
 from infrasim import ArgsNotCorrect
-from infrasim import run_command
 from infrasim import config
+from infrasim import image
 from infrasim.model.core.element import CElement
 
 
@@ -82,9 +81,8 @@ class CBaseDrive(CElement):
                                  .format(self.__sector_size))
 
         if os.path.exists(self._drive_info.get("file", "")) and self._drive_info.get("size"):
-            cmd = "qemu-img info {} --output json".format(self._drive_info.get("file"))
-            img_size = json.loads(run_command(cmd)[1])["virtual-size"]
-            if img_size != math.ceil(self._drive_info.get("size") * 1024 * 1024 * 1024 / 512) * 512:
+            img_size = image.get_image_info(self._drive_info.get("file"), self.__format)["virtual-size"]
+            if img_size != image.get_image_bytes(self._drive_info.get("size")):
                 print "\033[93mWarning: Existing drive image size {}GB is " \
                       "different from the size {}GB defined in yaml.\033[0m" \
                       .format((img_size >> 30), self._drive_info.get("size"))
@@ -163,18 +161,9 @@ class CBaseDrive(CElement):
 
         if not os.path.exists(self.__drive_file):
             self.logger.info("[BaseDrive] Creating drive: {}".format(self.__drive_file))
-            create_option_list = []
-            if self.__cluster_size:
-                create_option_list.append("=".join(["cluster_size", self.__cluster_size]))
-
-            if self.__preallocation_mode:
-                create_option_list.append("=".join(["preallocation", self.__preallocation_mode]))
-
-            command = "qemu-img create -f {0} {1} {2}G".format(self.__format, self.__drive_file, self.__size)
-            if len(create_option_list) > 0:
-                command = "{} -o {}".format(command, ",".join(create_option_list))
-
-            run_command(command)
+            image.create_drive_image(self.__drive_file, self.__format, self.__size,
+                                     cluster_size=self.__cluster_size,
+                                     preallocation=self.__preallocation_mode)
 
     def build_host_option(self, *args, **kwargs):
         host_opt_list = []
@@ -10,11 +10,16 @@ import os
 import socket
 import json
 from telnetlib import Telnet
-from infrasim import ArgsNotCorrect
+from infrasim import ArgsNotCorrect, InfraSimError
 from infrasim import config
+from infrasim import helper
 from infrasim.model.core.element import CElement
 from infrasim.model.elements.chardev import CCharDev
 
+# seconds to wait for QEMU monitor, it serves one client at a time and
+# infrasim-monitor may hold it for a while
+MONITOR_TIMEOUT = 10
+
 
 class CQemuMonitor(CElement):
     def __init__(self, monitor_info):
@@ -24,6 +29,7 @@ class CQemuMonitor(CElement):
         self.__mode = "readline"
         self.__workspace = ""
         self.__monitor_handle = None
+        self.__stream = None
 
     def get_workspace(self):
         return self.__workspace
@@ -98,27 +104,38 @@ class CQemuMonitor(CElement):
     def get_mode(self):
         return self.__mode
 
-    def open(self):
-        if self.__mode == "readline":
-            self.__monitor_handle = Telnet(self.__chardev.host, self.__chardev.port)
-        elif self.__mode == "control":
-            self.__monitor_handle = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-            self.__monitor_handle.connect(self.__chardev.get_path())
-
-            self.recv()
-            # enable qmp capabilities
-            qmp_payload = {
-                "execute": "qmp_capabilities"
-            }
-            self.send(qmp_payload)
-            self.recv()
-        else:
-            raise ArgsNotCorrect("[Monitor] Monitor mode {} is unknown.".format(self.__mode))
+    def open(self, timeout=MONITOR_TIMEOUT):
+        """
+        Connect the monitor, timeout applies to connect and every receive.
+        """
+        try:
+            if self.__mode == "readline":
+                self.__monitor_handle = Telnet(self.__chardev.host, self.__chardev.port, timeout)
+            elif self.__mode == "control":
+                self.__monitor_handle = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self.__monitor_handle.settimeout(timeout)
+                self.__monitor_handle.connect(self.__chardev.get_path())
+                self.__stream = helper.JSONStream(self.__monitor_handle)
+
+                # greeting, QEMU sends it once the client before has left
+                if self.__stream.read_message() is None:
+                    raise socket.error("connection closed")
+                # enable qmp capabilities
+                qmp_payload = {
+                    "execute": "qmp_capabilities"
+                }
+                self.send(qmp_payload)
+                self.recv()
+            else:
+                raise ArgsNotCorrect("[Monitor] Monitor mode {} is unknown.".format(self.__mode))
+        except (socket.error, EOFError) as e:
+            self.close()
+            raise InfraSimError("[Monitor] Fail to open monitor: {}".format(e))
         self.logger.info("[Monitor] monitor opened({}).".format(self.__monitor_handle))
 
     def send(self, command):
         if self.__monitor_handle:
-            self.logger.info("[Monitor] send command {}".format(command))
+            self.logger.debug("[Monitor] send command %s", command)
             if self.__mode == "readline":
                 self.__monitor_handle.write(command)
             else:
@@ -126,17 +143,15 @@ class CQemuMonitor(CElement):
 
     def recv(self):
         if self.__mode == "control":
-            rsp = ""
-            while 1:
-                snip = self.__monitor_handle.recv(1024)
-                rsp += snip
-                if len(snip) < 1024:
-                    break
-            return json.loads(rsp)
+            try:
+                return self.__stream.read_reply()
+            except socket.error as e:
+                raise InfraSimError("[Monitor] Fail to receive from monitor: {}".format(e))
         else:
             return self.__monitor_handle.read_eager()
 
     def close(self):
         if self.__monitor_handle:
             self.__monitor_handle.close()
+            self.__monitor_handle = None
             self.logger.info("[Monitor] monitor closed.")
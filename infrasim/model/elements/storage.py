@@ -7,7 +7,7 @@ Copyright @ 2015 EMC Corporation All Rights Reserved
 import os
 from infrasim import helper
 from infrasim.model.core.element import CElement
-from infrasim.model.elements.storage_diskarray import DiskArrayController
+from infrasim.model.elements.storage_diskarray import DiskArrayController, TopoCache
 
 
 class CBaseStorageController(CElement):
@@ -90,15 +90,19 @@ class CBaseStorageController(CElement):
     def _handle_diskarray(self):
         sas_topo = self._controller_info.get("sas_topo")
         if sas_topo:
-            drv_args = []
-            for drive_obj in self._drive_list:
-                drive_obj.handle_parms()
-                # export drv args to txt file
-                drv_args.append(drive_obj.get_option())
+            ws = os.path.join(helper.get_ws_folder(self), "data")
+            drv_args_name = "drv_args_{}.txt".format(self.controller_index)
+            drv_args_file = os.path.join(ws, drv_args_name)
+            # drv args are built from the same topology before
+            if drv_args_name not in self._controller_info.get("topo_cache", []):
+                drv_args = []
+                for drive_obj in self._drive_list:
+                    drive_obj.handle_parms()
+                    # export drv args to txt file
+                    drv_args.append(drive_obj.get_option())
+                DiskArrayController.export_drv_args(drv_args_file, drv_args)
+                TopoCache(ws).add_file(drv_args_name)
 
             self._drive_list = []
-            drv_args_file = os.path.join(helper.get_ws_folder(self), "data",
-                                         "drv_args_{}.txt".format(self.controller_index))
-            DiskArrayController.export_drv_args(drv_args_file, drv_args)
             self._attributes["drv_args"] = drv_args_file
             self._attributes["sas_topo"] = sas_topo
@@ -5,11 +5,12 @@ Copyright @ 2018 EMC Corporation All Rights Reserved
 '''
 import json
 import copy
+import hashlib
 import re
 import struct
 import os
 from infrasim.model.core.element import CElement
-from infrasim import ArgsNotCorrect
+from infrasim import ArgsNotCorrect, config
 
 
 class _Const:
@@ -46,6 +47,12 @@ class DiskArrayController(CElement):
         self._connections = []
         self._ports = []
         self._controllers = []
+        # wwn -> index of expander, name -> index of expander
+        self._exp_by_wwn = {}
+        self._exp_by_name = {}
+        self._exp_graph = []
+        # wwn of expander -> index of expanders reachable from it
+        self._reachable = {}
         self._sas_all_drv = os.path.join(ws, "sas_all_drives.json")
 
     def add_storage_chassis_backend(self, backend_info):
@@ -64,7 +71,7 @@ class DiskArrayController(CElement):
         for item in diskarray["disk_array"]:
             encl = item.get("enclosure", {})
             for exp in encl.get("expanders", []):
-                if len(filter(lambda x: x["wwn"] == exp["wwn"], self._expanders)) != 0:
+                if exp["wwn"] in self._exp_by_wwn:
                     return True
         return False
 
@@ -79,6 +86,8 @@ class DiskArrayController(CElement):
         if diskarray_controller.get("sas_drives", None):
             # if it is handled by chassis already, clear and quit.
             self._expanders = []
+            self._exp_by_wwn = {}
+            self._exp_by_name = {}
             return
 
         if self.__check_duplicated_diskarray(diskarray_controller) is False:
@@ -105,11 +114,11 @@ class DiskArrayController(CElement):
                 # set peer index
                 peer_exp_index = len(self._expanders)
                 if len(exps) == 2:
-                    for expander in exps:
-                        expander["peer_index"] = peer_exp_index + 1 - exps.index(expander)
+                    for index, expander in enumerate(exps):
+                        expander["peer_index"] = peer_exp_index + 1 - index
                 else:
-                    for expander in exps:
-                        index = expander.get("peer_index", exps.index(expander))
+                    for index, expander in enumerate(exps):
+                        index = expander.get("peer_index", index)
                         expander["peer_index"] = peer_exp_index + index
 
                 for expander in exps:
@@ -135,6 +144,10 @@ class DiskArrayController(CElement):
         1. Traversal connection net,
         2. Copy devices to controller.
         """
+        # links between expanders are all known, ports attached to the
+        # same expander share one traversal.
+        self._exp_graph = self.__build_exp_graph()
+        self._reachable = {}
         for controller in self._controllers:
             self.__add_connection_of_hba(controller)
             self.__traversal_expanders(controller)
@@ -182,8 +195,15 @@ class DiskArrayController(CElement):
             self.logger.warning("[Warning] Using default slot-phy-map for expander {0}".format(expander["wwn"]))
             result = range(_Const.DEFAULT_EXP_START_PHY, expander["phy_count"])
         expander["phy_map"] = result
+        # the first expander wins on duplicated wwn or name
+        self._exp_by_wwn.setdefault(expander["wwn"], len(self._expanders))
+        self._exp_by_name.setdefault(expander["name"], len(self._expanders))
         self._expanders.append(expander)
 
+    def __find_expander(self, name):
+        index = self._exp_by_name.get(name)
+        return None if index is None else self._expanders[index]
+
     def __update_link(self, exp, phy, num, atta_phy, atta_type, atta_wwn, atta_name=0, atta_slot_id=0):
         if atta_name == 0:
             atta_name = atta_wwn
@@ -206,8 +226,7 @@ class DiskArrayController(CElement):
             if peer.get("disk_array"):
                 name = "{}_".format(peer["disk_array"])
             name = "{}{}".format(name, peer["exp"])
-            exp = find(lambda exp: exp["name"] == name, self._expanders)
-            return exp
+            return self.__find_expander(name)
 
         for link in self._connections:
             peer_a = link["link"][0]
@@ -232,9 +251,12 @@ class DiskArrayController(CElement):
 
                 ses["side"] = expander["side"]
                 ses["port_wwn"] = ses["wwn"]
+                ports = {}
+                for port in expander["ports"]:
+                    ports.setdefault(port["id"], port)
 
                 def get_port_atta_wwn(name):
-                    port = find(lambda p: p["id"] == name, expander["ports"])
+                    port = ports.get(name)
                     if port is None:
                         return 0
                     link = expander["links"][port["phy"]]
@@ -285,8 +307,17 @@ class DiskArrayController(CElement):
             # generate drv node according template.
             for drv_template in drv_templates:
                 num_of_drv = drv_template.get("repeat", 1)
+                # a flat template is copied much faster than deepcopy
+                nested = any(isinstance(v, (dict, list)) for v in drv_template.values())
                 for index in range(num_of_drv):
-                    drv = copy.deepcopy(drv_template)
+                    if nested:
+                        drv = copy.deepcopy(drv_template)
+                    else:
+                        # insert one by one as deepcopy does, so key order
+                        # of exported drives stays the same
+                        drv = {}
+                        for key, value in drv_template.iteritems():
+                            drv[key] = value
                     drv["slot_number"] = drv["slot_number"] + index
                     if drv["slot_number"] < 0 or len(slot_to_phy) < drv["slot_number"]:
                         raise ArgsNotCorrect("slot_number exceeds phy_map in expander {}".format(exp["wwn"]))
@@ -305,6 +336,40 @@ class DiskArrayController(CElement):
                     self.__update_link(exp, phy, 1, atta_type=_Const.END_DEVICE, atta_phy=side,
                                        atta_wwn=drv["port_wwn"], atta_name=drv["wwn"], atta_slot_id=drv["slot_number"])
 
+    def __build_exp_graph(self):
+        """
+        wwn of expanders attached to each expander, in phy order.
+        """
+        graph = []
+        for exp in self._expanders:
+            graph.append([link["atta_wwn"] for link in exp["links"]
+                          if link is not None and link["atta_type"] == _Const.EXP_DEVICE])
+        return graph
+
+    def __reach_expanders(self, wwn):
+        """
+        index of expanders reachable from expander wwn, in depth first order.
+        """
+        if wwn in self._reachable:
+            return self._reachable[wwn]
+        exps = []
+        visited = set()
+        # same order as recursive traversal since visit is checked on pop
+        stack = [wwn]
+        while stack:
+            atta_wwn = stack.pop()
+            index = self._exp_by_wwn.get(atta_wwn)
+            if index is None:
+                self.logger.warning("[Warning] Empty port {0}".format(atta_wwn))
+                continue
+            if index in visited:
+                continue
+            visited.add(index)
+            exps.append(index)
+            stack.extend(reversed(self._exp_graph[index]))
+        self._reachable[wwn] = exps
+        return exps
+
     def __traversal_expanders(self, controller):
         """
         traversal expander by link. Copy expander and drive.
@@ -313,26 +378,8 @@ class DiskArrayController(CElement):
         ports = controller.get("connectors", [])
         hba = []
 
-        def traversal(exps, wwn):
-            exp = find(lambda exp: exp["wwn"] == wwn, self._expanders)
-            if exp is None:
-                self.logger.warning("[Warning] Empty port {0}".format(wwn))
-                return
-            if exp["visit"] is True:
-                return
-            exp["visit"] = True
-            exps.append(self._expanders.index(exp))
-            links = filter((lambda x: x is not None and x["atta_type"] == _Const.EXP_DEVICE), exp["links"])
-            for link in links:
-                traversal(exps, link["atta_wwn"])
-
         for port in ports:
-            exps = []
-            # first reset flag for all expanders in case not enter dead loop.
-            for exp in self._expanders:
-                exp["visit"] = False
-            traversal(exps, port["atta_wwn"])
-            # print(exps)
+            exps = list(self.__reach_expanders(port["atta_wwn"]))
             hba_port = {
                 "expanders": exps,
                 "phy": port["phy"],
@@ -359,10 +406,13 @@ class DiskArrayController(CElement):
         start_scsi_id = 32
         for exp in self._expanders:
             exp["start_scsi_id"] = start_scsi_id
+            drv_by_port = {}
+            for drv in exp["drives"]:
+                drv_by_port.setdefault(drv["port_wwn"], drv)
             for link in filter((lambda x: x is not None), exp["links"]):
                 link["atta_scsi_id"] = start_scsi_id + link["phy"]
                 if link["atta_type"] == _Const.END_DEVICE:
-                    drv = find(lambda d: d["port_wwn"] == link["atta_wwn"], exp["drives"])
+                    drv = drv_by_port.get(link["atta_wwn"])
                     drv["scsi-id"] = link["atta_scsi_id"]
                 if link["atta_type"] == _Const.SES_DEVICE:
                     ses = exp["ses"]
@@ -434,7 +484,7 @@ class DiskArrayController(CElement):
                 full_name = "{}_".format(port["atta_enclosure"])
             full_name = "{}{}".format(full_name, port["atta_exp"])
             # find the expander
-            exp = find(lambda exp: exp["name"] == full_name, self._expanders)
+            exp = self.__find_expander(full_name)
             if exp is None:
                 raise ArgsNotCorrect("No expander named {}".format(full_name))
             # find the specified port
@@ -458,6 +508,14 @@ class DiskArrayController(CElement):
             for port in controller.get("external_connectors", []):
                 add_connector(port)
 
+    def reuse_topo(self, storage_backend_info, filename):
+        """
+        Point storage backend to topology and drives built before.
+        """
+        for diskarray_controller in filter(lambda x: x["type"] == "disk_array", storage_backend_info):
+            diskarray_controller["sas_drives"] = self._sas_all_drv
+        self.set_topo_file(storage_backend_info, filename)
+
     def set_topo_file(self, storage_backend_info, filename):
         for x in storage_backend_info:
             if x.get("connectors"):
@@ -466,7 +524,7 @@ class DiskArrayController(CElement):
     def export_drv_data(self):
         output = {}
         for controller in self._controllers:
-            exp_ids = []
+            exp_ids = set()
             drv_list = []
             for port in controller["hba_ports"]:
                 for exp_id in port["expanders"]:
@@ -474,7 +532,7 @@ class DiskArrayController(CElement):
                         continue
                     expander = self._expanders[exp_id]
                     drv_list.extend(expander["drives"])
-                    exp_ids.append(exp_id)
+                    exp_ids.add(exp_id)
             output[controller["sas_address"]] = {"drives": drv_list, "seses": controller["seses"]}
 
         with open(self._sas_all_drv, "w") as f:
@@ -508,6 +566,76 @@ class DiskArrayController(CElement):
                 f.write("\n{}\n{}\n".format(m.group("drv"), m.group("dev")))
 
 
+class TopoCache(object):
+    """
+    Disk array outputs in workspace data folder, i.e. sas_topo.bin,
+    sas_all_drives.json and drv_args_N.txt. They are reused as long as
+    the storage backend which they are built from is the same.
+    """
+    VERSION = 1
+    MANIFEST = "topo_cache.json"
+
+    # counters of this process
+    hits = 0
+    misses = 0
+
+    def __init__(self, ws):
+        self.__ws = ws
+        self.__manifest = os.path.join(ws, TopoCache.MANIFEST)
+
+    @staticmethod
+    def digest(storage_backend_info):
+        content = json.dumps([TopoCache.VERSION, storage_backend_info],
+                             sort_keys=True, separators=(",", ":"))
+        return hashlib.sha1(content).hexdigest()
+
+    def __load(self):
+        try:
+            with open(self.__manifest, "r") as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    def __save(self, manifest):
+        tmp = "{}.tmp".format(self.__manifest)
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+        os.rename(tmp, self.__manifest)
+
+    def lookup(self, digest):
+        """
+        :return: list of cached file names, None if cache misses
+        """
+        manifest = self.__load()
+        files = manifest.get("files", [])
+        if manifest.get("digest") != digest or \
+                not all(os.path.exists(os.path.join(self.__ws, name)) for name in files):
+            TopoCache.misses += 1
+            return None
+        TopoCache.hits += 1
+        return files
+
+    def store(self, digest, files):
+        self.__save({"digest": digest, "files": list(files)})
+
+    def add_file(self, name):
+        manifest = self.__load()
+        if manifest and name not in manifest["files"]:
+            manifest["files"].append(name)
+            self.__save(manifest)
+
+    def clear(self):
+        if os.path.exists(self.__manifest):
+            os.remove(self.__manifest)
+
+    @staticmethod
+    def clear_node(node_name):
+        """
+        Force disk array outputs of node to be built again on next start.
+        """
+        TopoCache(os.path.join(config.infrasim_home, node_name, "data")).clear()
+
+
 class TopoBin():
     """
     typedef struct _Header
@@ -7,7 +7,6 @@ Copyright @ 2015 EMC Corporation All Rights Reserved
 
 
 import os
-import jinja2
 import stat
 import shutil
 import socket
@@ -18,6 +17,7 @@ from infrasim.helper import run_in_namespace
 from infrasim.model.core.task import Task
 from infrasim.log import infrasim_logdir
 from infrasim.chassis.emu_data import FruFile
+from infrasim.materialize import copy_file, render_template, write_file
 
 
 class CBMC(Task):
@@ -218,18 +218,13 @@ class CBMC(Task):
     def __render_template(self):
         for target in ["startcmd", "setbootcmd", "stopcmd", "resetcmd"]:
             if not has_option(self.__bmc, target):
-                src = os.path.join(config.infrasim_template, target)
                 dst = os.path.join(self.get_workspace(), "scripts", target)
-                with open(src, "r")as f:
-                    src_text = f.read()
-                template = jinja2.Template(src_text)
-                dst_text = template.render(
+                dst_text = render_template(
+                    target,
                     yml_file=os.path.join(self.get_workspace(),
                                           "etc/infrasim.yml")
                 )
-                with open(dst, "w") as f:
-                    f.write(dst_text)
-                os.chmod(dst, stat.S_IRUSR | stat.S_IWUSR | stat.S_IXUSR)
+                write_file(dst, dst_text, stat.S_IRUSR | stat.S_IWUSR | stat.S_IXUSR)
 
         if not has_option(self.__bmc, "startcmd"):
             self.__startcmd_script = os.path.join(self.get_workspace(),
@@ -247,28 +242,23 @@ class CBMC(Task):
             path_bootdev = os.path.join(self.get_workspace(), "bootdev")
             path_qemu_pid = os.path.join(self.get_workspace(),
                                          ".{}-node.pid".format(self.__node_name))
-            src = os.path.join(config.infrasim_template, "chassiscontrol")
             dst = os.path.join(self.get_workspace(),
                                "scripts/chassiscontrol")
-            with open(src, "r") as f:
-                src_text = f.read()
-            template = jinja2.Template(src_text)
-            dst_text = template.render(startcmd=path_startcmd,
+            dst_text = render_template("chassiscontrol",
+                                       startcmd=path_startcmd,
                                        stopcmd=path_stopcmd,
                                        resetcmd=path_resetcmd,
                                        setbootcmd=path_setbootcmd,
                                        qemu_pid_file=path_qemu_pid,
                                        bootdev=path_bootdev)
-            with open(dst, "w") as f:
-                f.write(dst_text)
-            os.chmod(dst, stat.S_IRUSR | stat.S_IWUSR | stat.S_IXUSR)
+            write_file(dst, dst_text, stat.S_IRUSR | stat.S_IWUSR | stat.S_IXUSR)
 
             self.__chassiscontrol_script = dst
 
         if not has_option(self.__bmc, "lancontrol"):
-            shutil.copy(os.path.join(config.infrasim_template, "lancontrol"),
-                        os.path.join(self.get_workspace(),
-                                     "scripts", "lancontrol"))
+            copy_file(os.path.join(config.infrasim_template, "lancontrol"),
+                      os.path.join(self.get_workspace(),
+                                   "scripts", "lancontrol"))
 
             self.__lancontrol_script = os.path.join(self.get_workspace(),
                                                     "scripts", "lancontrol")
@@ -280,11 +270,8 @@ class CBMC(Task):
             self.__config_file = dst
 
         # Render vbmc.conf
-        bmc_conf = ""
-        with open(self.__class__.VBMC_TEMP_CONF, "r") as f:
-            bmc_conf = f.read()
-        template = jinja2.Template(bmc_conf)
-        bmc_conf = template.render(startcmd_script=self.__startcmd_script,
+        bmc_conf = render_template(os.path.basename(self.__class__.VBMC_TEMP_CONF),
+                                   startcmd_script=self.__startcmd_script,
                                    vbmc_name=self.__name,
                                    lan_channels=self.__channels,
                                    main_channel=self.__main_channel,
@@ -311,8 +298,7 @@ class CBMC(Task):
                                    vbmc_addr=self.__address,
                                    peers=self.__peer_bmc_info_list)
 
-        with open(dst, "w") as f:
-            f.write(bmc_conf)
+        write_file(dst, bmc_conf)
 
     @run_in_namespace
     def init(self):
@@ -426,6 +412,10 @@ class CBMC(Task):
         if 'shm_key' in self.__bmc:
             self.__shm_key = self.__bmc['shm_key']
 
+    def probe_ready(self):
+        # QEMU connects this port for its IPMI chardev
+        return helper.check_if_port_listening(self.__port_qemu_ipmi)
+
     def get_commandline(self):
         path = os.path.join(self.get_workspace(), "data")
         ipmi_cmd_str = "{0} -c {1} -f {2} -n -s {3} -l {4}" .\
@@ -5,13 +5,16 @@ Copyright @ 2015 EMC Corporation All Rights Reserved
 '''
 # -*- coding: utf-8 -*-
 
+import hashlib
+import json
 import os
 import time
 
-from infrasim import CommandRunFailed, ArgsNotCorrect, CommandNotFound
+from infrasim import CommandRunFailed, ArgsNotCorrect, CommandNotFound, InfraSimError
 from infrasim import helper, config
 from infrasim import run_command, has_option, set_option
 from infrasim.helper import run_in_namespace, NumaCtl
+from infrasim.cpu_ledger import CPULedger
 from infrasim.model.core.element import CElement
 from infrasim.model.core.task import Task
 from infrasim.model.elements.backend import CBackendNetwork
@@ -38,6 +41,35 @@ from infrasim.model.elements.cpu_binding import CCPUBinding
 from infrasim.chassis.smbios import SMBios
 
 
+def powerdown(task, monitor):
+    """
+    Ask QEMU of task to power down through monitor, kill it if monitor
+    can't be opened or it doesn't exit in 2 minutes.
+    """
+    if task.task_is_running():
+        try:
+            monitor.open()
+        except InfraSimError:
+            # monitor is not available to power down, kill QEMU
+            Task.terminate(task)
+            return
+        if monitor.get_mode() == "readline":
+            monitor.send("system_powerdown\n")
+        elif monitor.get_mode() == "control":
+            monitor.send({"execute": "system_powerdown"})
+        monitor.close()
+
+    start = time.time()
+    while time.time() - start < 2 * 60:
+        if not task.task_is_running():
+            if os.path.exists(task.get_pid_file()):
+                os.remove(task.get_pid_file())
+            break
+        time.sleep(1)
+    else:
+        Task.terminate(task)
+
+
 class CCompute(Task, CElement):
 
     numactl = None
@@ -82,6 +114,10 @@ class CCompute(Task, CElement):
 
         self.__cpu_binding_obj = None
 
+        # qemu args rendered and digest of information they come from
+        self.__qemu_args = None
+        self.__render_digest = None
+
     def enable_sol(self, enabled):
         self.__sol_enabled = enabled
 
@@ -168,6 +204,7 @@ class CCompute(Task, CElement):
 
     @run_in_namespace
     def init(self):
+        self.__element_list = []
         if not helper.check_kvm_existence():
             self.__enable_kvm = False
         else:
@@ -366,12 +403,33 @@ class CCompute(Task, CElement):
         for element in self.__element_list:
             element.init()
 
-    def get_commandline(self):
-        # handle params
-        self.handle_parms()
+    def __get_render_digest(self):
+        """
+        Digest of compute information and boot device chosen at runtime,
+        which decide qemu args.
+        """
+        digest = hashlib.sha1(json.dumps(self.__compute, sort_keys=True, default=str))
+        bootdev_path = os.path.join(self.get_workspace() or "", "bootdev")
+        if os.path.exists(bootdev_path):
+            with open(bootdev_path, "r") as f:
+                digest.update(f.read())
+        return digest.hexdigest()
 
-        qemu_args = " ".join([obj.get_option() for obj in self.__element_list])
-        qemu_args = " ".join([self.get_option(), qemu_args, self.__extra_device])
+    def get_commandline(self):
+        # qemu args are rendered again only if information changes
+        if self.__qemu_args is None or self.__get_render_digest() != self.__render_digest:
+            if self.__qemu_args is not None:
+                # elements keep what they are initialized with
+                self.logger.info("[Compute] Compute information changes, render qemu args again")
+                self.clear_option()
+                self.init()
+            # handle params
+            self.handle_parms()
+
+            qemu_args = " ".join([obj.get_option() for obj in self.__element_list])
+            self.__qemu_args = " ".join([self.get_option(), qemu_args, self.__extra_device])
+            self.__render_digest = self.__get_render_digest()
+        qemu_args = self.__qemu_args
 
         arg_path = os.path.join(self.get_workspace(), "data")
         if os.path.isdir(arg_path):
@@ -392,7 +450,14 @@ class CCompute(Task, CElement):
         if self.__numactl_mode == "auto":
             cpu_number = self.__cpu_obj.get_cpu_quantities()
             try:
-                bind_cpu_list = [str(x) for x in self.__class__.numactl.get_cpu_list(cpu_number)]
+                if self.task_is_running():
+                    # nothing is launched, QEMU running keeps its cpus
+                    cpus = CPULedger().get_cpus(self.get_task_name())
+                else:
+                    # cpus held by other nodes on this host are recorded in ledger
+                    cpus = CPULedger().allocate(self.get_task_name(), self.get_pid_file(),
+                                                cpu_number, self.__class__.numactl)
+                bind_cpu_list = [str(x) for x in cpus]
             except Exception as e:
                 bind_cpu_list = []
                 self.logger.warning('[Compute] {}'.format(str(e)))
@@ -491,29 +556,30 @@ class CCompute(Task, CElement):
         for element_obj in self.__element_list:
             element_obj.handle_parms()
 
+    def probe_ready(self):
+        if not self.__enable_monitor:
+            return None
+        # QMP serves one client at a time, a session opened to read the
+        # greeting would be refused while another client is attached
+        return helper.check_if_unix_socket_listening(os.path.join(self.get_workspace(), ".monitor"))
+
+    def get_runtime_info(self):
+        info = super(CCompute, self).get_runtime_info()
+        info["force_shutdown"] = bool(self.__force_shutdown)
+        info["cpu_ledger"] = self.__numactl_mode == "auto"
+        if self.__enable_monitor:
+            info["monitor"] = os.path.join(self.get_workspace(), ".monitor")
+        return info
+
     # override Task.terminate, use monitor to shutdown qemu
     def terminate(self):
         if self.__force_shutdown:
             super(CCompute, self).terminate()
-            return
-
-        if self.task_is_running():
-            self.__monitor.open()
-            if self.__monitor.get_mode() == "readline":
-                self.__monitor.send("system_powerdown\n")
-            elif self.__monitor.get_mode() == "control":
-                self.__monitor.send({"execute": "system_powerdown"})
-            self.__monitor.close()
-
-        start = time.time()
-        while time.time() - start < 2 * 60:
-            if not self.task_is_running():
-                if os.path.exists(self.get_pid_file()):
-                    os.remove(self.get_pid_file())
-                break
-            time.sleep(1)
         else:
-            super(CCompute, self).terminate()
+            powerdown(self, self.__monitor)
+
+        if self.__numactl_mode == "auto":
+            CPULedger().release(self.get_task_name())
 
     def post_run(self):
         if self.__cpu_binding_obj:
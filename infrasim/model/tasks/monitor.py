@@ -52,6 +52,9 @@ class CMonitor(Task):
     def set_node_name(self, name):
         self.__node_name = name
 
+    def probe_ready(self):
+        return helper.check_if_port_listening(self.__port)
+
     def get_commandline(self):
         monitor_str = "{} {} {} {}".\
             format(self.__bin,
@@ -53,6 +53,9 @@ class CRacadm(Task):
     def set_node_name(self, name):
         self.__node_name = name
 
+    def probe_ready(self):
+        return helper.check_if_port_listening(self.__port_idrac)
+
     def get_commandline(self):
         racadmsim_str = "{} {} {} {} {} {} {}".\
             format(self.__bin,
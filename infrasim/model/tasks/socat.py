@@ -8,7 +8,7 @@ Copyright @ 2015 EMC Corporation All Rights Reserved
 
 import os
 from infrasim import CommandNotFound, ArgsNotCorrect, CommandRunFailed
-from infrasim import config
+from infrasim import config, helper
 from infrasim import run_command
 from infrasim.model.core.task import Task
 
@@ -64,6 +64,14 @@ class CSocat(Task):
         else:
             self.__socket_serial = os.path.join(config.infrasim_etc, "serial")
 
+    def probe_ready(self):
+        return helper.check_if_unix_socket_listening(self.__socket_serial)
+
+    def get_runtime_info(self):
+        info = super(CSocat, self).get_runtime_info()
+        info["serial_socket"] = self.__socket_serial
+        return info
+
     def terminate(self):
         super(CSocat, self).terminate()
         if os.path.exists(self.__socket_serial):
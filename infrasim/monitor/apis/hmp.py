@@ -1,6 +1,7 @@
+import json
 from flask_restplus import Resource, fields
 from infrasim.monitor.apis import api
-from infrasim.monitor.qemu_api import QemuMonitor
+from infrasim.monitor.qemu_api import get_qemu_monitor, QMPError
 
 
 ns = api.namespace("hmp", "HMP operation")
@@ -22,10 +23,14 @@ class root(Resource):
 
     @api.expect(hmp_cmd)
     def post(self, nodename):
-        qm = QemuMonitor(nodename)
-        qm.connect()
-        cmd = api.payload
-        qm.send(cmd)
-        recv = qm.recv().decode('string_escape')
-
-        return recv, 200
+        qm = get_qemu_monitor(nodename)
+        if qm is None:
+            return "Fail to connect QEMU monitor of node {}".format(nodename), 503
+        try:
+            recv = qm.execute(api.payload)
+        except QMPError as e:
+            return str(e), 503
+
+        # response text as QEMU sends it, with escapes such as the line
+        # breaks of HMP output decoded to be readable
+        return json.dumps(recv).decode('string_escape'), 200
@@ -1,6 +1,7 @@
+import json
 from flask_restplus import Resource, fields
 from infrasim.monitor.apis import api
-from infrasim.monitor.qemu_api import QemuMonitor
+from infrasim.monitor.qemu_api import get_qemu_monitor, QMPError
 
 ns = api.namespace("qmp", "QMP operation")
 
@@ -21,10 +22,27 @@ class root(Resource):
 
     @api.expect(qmp_cmd)
     def post(self, nodename):
-        qm = QemuMonitor(nodename)
-        qm.connect()
-        cmd = api.payload
-        qm.send(cmd)
-        recv = qm.recv().decode('string_escape')
+        qm = get_qemu_monitor(nodename)
+        if qm is None:
+            return "Fail to connect QEMU monitor of node {}".format(nodename), 503
+        try:
+            recv = qm.execute(api.payload)
+        except QMPError as e:
+            return str(e), 503
 
-        return recv, 200
+        return json.dumps(recv).decode('string_escape'), 200
+
+
+@ns.route('/<string:nodename>/events')
+class events(Resource):
+    def get(self, nodename):
+        """
+        Take asynchronous QMP events of node received since last call.
+        Events are only buffered while QMP requests of node are active, the
+        session is closed after QMP is idle for a while and events QEMU
+        sends then are missed.
+        """
+        qm = get_qemu_monitor(nodename)
+        if qm is None:
+            return "Fail to connect QEMU monitor of node {}".format(nodename), 503
+        return qm.get_events(), 200
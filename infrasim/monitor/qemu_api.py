@@ -2,82 +2,253 @@
 Provide QEMU monitor access interface.
 """
 
+import collections
+import itertools
 import json
 import socket
 import os
 import threading
 from infrasim import config
+from infrasim.helper import JSONStream
 
+# node name -> connected QemuMonitor, shared by all REST requests
 qm_map = {}
+qm_map_lock = threading.Lock()
+
+# asynchronous events kept per node, only those QEMU sends while the
+# session is open, i.e. during requests and IDLE_TIMEOUT after them
+EVENT_BUFFER_SIZE = 1024
+
+# seconds a session is kept open without requests, QEMU serves one QMP
+# client at a time and infrasim commands on the node need it as well
+IDLE_TIMEOUT = 2
+
+
+class QMPError(IOError):
+    pass
 
 
 def get_qemu_monitor(node_name):
-    if node_name in qm_map:
-        return qm_map[node_name]
-    else:
-        qm_map[node_name] = QemuMonitor(node_name)
-        # qm_map[node_name].acquire()
+    """
+    Get the QMP session of node, connect and negotiate it on first use.
+    The session is closed when it's idle and opened again by the next
+    request.
+    :return: None if QEMU monitor of node can't be connected
+    """
+    with qm_map_lock:
+        qm = qm_map.get(node_name)
+        if qm is not None:
+            return qm
+
+        qm = QemuMonitor(node_name)
         try:
-            qm_map[node_name].connect()
-        except IOError:
-            del qm_map[node_name]
+            qm.connect()
+        except (IOError, socket.error):
+            qm.close()
             return None
-        qm_map[node_name].release()
+        qm_map[node_name] = qm
+        return qm
 
-        return qm_map[node_name]
 
+def close_all():
+    with qm_map_lock:
+        for qm in qm_map.values():
+            qm.close()
+        qm_map.clear()
 
-class QemuMonitor(object):
 
-    def __init__(self, node_name):
+class QemuMonitor(object):
+    """
+    A QMP session to QEMU of a node, shared by requests from many threads:
+    each request is tagged with a QMP "id" and a reader thread hands
+    responses back by id, while asynchronous events are kept in a buffer.
+
+    The session is closed once no request is sent for idle_timeout seconds,
+    so that other QMP clients of the node get their turn, and connected
+    again by execute(). Events are only received while it's open, the
+    buffer is not a full event feed: events QEMU sends while no request
+    is active are missed.
+    """
+
+    def __init__(self, node_name, path=None, idle_timeout=None):
         self.s = None
         self.node_name = node_name
+        self.path = path or os.path.join(config.infrasim_home, node_name, ".monitor")
+        self.greeting = None
+        self.idle_timeout = IDLE_TIMEOUT if idle_timeout is None else idle_timeout
 
         self.lock_socket = threading.Lock()
-
-        # could be:
-        # - hmp, hmp-command
-        # - qmp, qmp-command
-        self.cmd_mode = None
-
-    def connect(self):
-        path = os.path.join(config.infrasim_home, self.node_name, ".monitor")
-        # connect socket
+        self.__lock_pending = threading.Lock()
+        # id -> [threading.Event, response], in order of sending
+        self.__pending = collections.OrderedDict()
+        self.__events = collections.deque(maxlen=EVENT_BUFFER_SIZE)
+        self.__ids = itertools.count(1)
+        self.__reader = None
+        self.__connected = False
+        # connect and close of session, with requests in progress
+        self.__lock_session = threading.Lock()
+        self.__busy = 0
+        self.__idle_timer = None
+
+    def is_connected(self):
+        return self.__connected
+
+    def connect(self, timeout=5):
         self.s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-        self.s.connect(path)
-        # data = ""
-        # data = self.recv()
-
-        payload_enable_qmp = {
-            "execute": "qmp_capabilities"
-        }
-        self.send(payload_enable_qmp)
-        # data = self.recv()
+        self.s.settimeout(timeout)
+        self.s.connect(self.path)
+        self.s.settimeout(None)
+        self.__connected = True
+
+        self.__reader = threading.Thread(target=self.__read_loop, args=(self.s,),
+                                         name="qmp-{}".format(self.node_name))
+        self.__reader.daemon = True
+        self.__reader.start()
+
+        response = self.__request({"execute": "qmp_capabilities"}, timeout)
+        if "error" in response:
+            raise QMPError("QMP capabilities negotiation of node {} fails: {}".
+                           format(self.node_name, response["error"]))
+        self.__start_idle_timer()
 
     def close(self):
+        self.__connected = False
+        if self.__idle_timer:
+            self.__idle_timer.cancel()
+            self.__idle_timer = None
         if self.s:
+            try:
+                self.s.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
             self.s.close()
             self.s = None
-
-    def send(self, req):
-        self.s.send(json.dumps(req))
-
-    def recv(self):
-        data = ""
-        while 1:
-            snip = self.s.recv(1024)
-            data += snip
-            if len(snip) == 1024:
-                continue
+        self.__fail_pending()
+
+    def __fail_pending(self):
+        with self.__lock_pending:
+            for waiter in self.__pending.values():
+                waiter[0].set()
+            self.__pending.clear()
+
+    def __start_idle_timer(self):
+        if self.__idle_timer:
+            self.__idle_timer.cancel()
+        self.__idle_timer = threading.Timer(self.idle_timeout, self.__close_idle)
+        self.__idle_timer.daemon = True
+        self.__idle_timer.start()
+
+    def __close_idle(self):
+        with self.__lock_session:
+            if self.__busy == 0 and self.__connected:
+                self.close()
+
+    def __read_loop(self, sock):
+        stream = JSONStream(sock)
+        try:
+            while True:
+                msg = stream.read_message()
+                if msg is None:
+                    break
+                self.__dispatch(msg)
+        except (socket.error, ValueError):
+            pass
+        finally:
+            # the session may be connected again since
+            if self.s is sock:
+                self.__connected = False
+                self.__fail_pending()
+
+    def __dispatch(self, msg):
+        if not isinstance(msg, dict):
+            return
+        if "QMP" in msg:
+            self.greeting = msg
+            return
+        if "event" in msg:
+            self.__events.append(msg)
+            return
+
+        with self.__lock_pending:
+            if msg.get("id") in self.__pending:
+                waiter = self.__pending.pop(msg["id"])
+            elif self.__pending:
+                # QEMU can't tell the id of a request it can't parse,
+                # requests are answered in order so it's for the oldest
+                waiter = self.__pending.popitem(last=False)[1]
             else:
-                break
-        return data
-
-    def acquire(self, blocking=True):
-        return self.lock_socket.acquire(blocking)
-
-    def locked(self):
-        return self.lock_socket.locked()
+                return
+        waiter[1] = msg
+        waiter[0].set()
+
+    def execute(self, cmd, timeout=10):
+        """
+        Send a QMP command and wait for its response, connect the session
+        if it's closed.
+        :param cmd: QMP command, e.g. {"execute": "query-status"}, "id" of
+            caller is kept in response
+        :return: QMP response with "return" or "error"
+        """
+        with self.__lock_session:
+            if not self.__connected:
+                self.close()
+                try:
+                    self.connect()
+                except (IOError, socket.error) as e:
+                    self.close()
+                    raise QMPError("Fail to connect QMP session of node {}: {}".
+                                   format(self.node_name, e))
+            self.__busy += 1
+        try:
+            return self.__request(cmd, timeout)
+        finally:
+            with self.__lock_session:
+                self.__busy -= 1
+                if self.__busy == 0 and self.__connected:
+                    self.__start_idle_timer()
+
+    def __request(self, cmd, timeout):
+        if not self.__connected:
+            raise QMPError("QMP session of node {} is closed".format(self.node_name))
+
+        request = dict(cmd)
+        caller_id = request.pop("id", None)
+        qmp_id = "infrasim-{}".format(next(self.__ids))
+        request["id"] = qmp_id
+        waiter = [threading.Event(), None]
+        with self.__lock_pending:
+            self.__pending[qmp_id] = waiter
 
-    def release(self):
-        return self.lock_socket.release()
+        try:
+            with self.lock_socket:
+                self.s.sendall(json.dumps(request))
+        except (socket.error, AttributeError):
+            with self.__lock_pending:
+                self.__pending.pop(qmp_id, None)
+            self.close()
+            raise QMPError("QMP session of node {} is lost".format(self.node_name))
+
+        if not waiter[0].wait(timeout):
+            with self.__lock_pending:
+                self.__pending.pop(qmp_id, None)
+            raise QMPError("QMP command {} of node {} timeout".
+                           format(cmd.get("execute"), self.node_name))
+        if waiter[1] is None:
+            raise QMPError("QMP session of node {} is lost".format(self.node_name))
+
+        response = waiter[1]
+        response.pop("id", None)
+        if caller_id is not None:
+            response["id"] = caller_id
+        return response
+
+    def get_events(self, clear=True):
+        """
+        :return: events received while the session was open, see class
+            docstring
+        """
+        events = list(self.__events)
+        if clear:
+            for _ in events:
+                self.__events.popleft()
+        return events
@@ -16,7 +16,7 @@ import signal
 from os import linesep
 from infrasim import sshim
 from . import env
-from .api import iDRACConsole
+from .api import iDRACConsole, preload
 from infrasim.log import LoggerType, infrasim_log
 import sys
 from infrasim.helper import literal_string
@@ -92,8 +92,11 @@ class iDRACServer(threading.Thread):
         return cmd
 
     def repl_output(self, msg):
-        for line in msg.splitlines():
-            self.script.writeline(line)
+        # one write for all lines, the channel is not buffered and every
+        # write is sent in its own packet
+        lines = msg.splitlines()
+        if lines:
+            self.script.write(u"\r\n".join(lines) + u"\r\n")
 
     def run(self):
         idrac = iDRACConsole()
@@ -121,6 +124,7 @@ def start(instance="default",
     env.logger_r.info('racadmsim command rev: {}'.format(cmd_rev))
     if os.path.exists(data_src):
         env.racadm_data = data_src
+    preload()
     env.local_env.server = sshim.Server(iDRACServer,
                           logger=env.logger_r,
                           address=ipaddr,
@@ -9,6 +9,7 @@ Copyright @ 2015 EMC Corporation All Rights Reserved
 
 import jinja2
 import os
+import threading
 from os import linesep
 from infrasim import config
 from infrasim.repl import REPL, register, parse, QuitREPL
@@ -26,16 +27,130 @@ j2_env = jinja2.Environment(
             )
 
 
+class FakeData(object):
+    """
+    Responses under racadm data folder, indexed when the folder is loaded
+    and kept until a file is changed, removed or added.
+    """
+
+    def __init__(self):
+        self.__root = None
+        # name -> (signature, response, compiled template of response)
+        self.__entries = {}
+        self.__lock = threading.Lock()
+
+    def load(self, root):
+        """
+        Index every response under root
+        """
+        with self.__lock:
+            self.__root = root
+            self.__entries = {}
+        for name in os.listdir(root):
+            self.__read(os.path.join(root, name), name)
+
+    def __read(self, path, name):
+        try:
+            with open(path) as fp:
+                st = os.fstat(fp.fileno())
+                rsp = linesep.join(fp.read().splitlines())
+        except IOError:
+            return None
+        entry = ((st.st_mtime, st.st_size), rsp, None)
+        with self.__lock:
+            self.__entries[name] = entry
+        return entry
+
+    def __get_entry(self, name):
+        root = env.racadm_data
+        if not root:
+            return None
+        if root != self.__root:
+            self.load(root)
+
+        path = os.path.join(root, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        with self.__lock:
+            entry = self.__entries.get(name)
+        if entry is not None and entry[0] == (st.st_mtime, st.st_size):
+            return entry
+        return self.__read(path, name)
+
+    def get(self, name):
+        """
+        :return: response in file name of racadm data, None if there is
+            no such file
+        """
+        entry = self.__get_entry(name)
+        return entry[1] if entry else None
+
+    def get_signature(self, name):
+        entry = self.__get_entry(name)
+        return entry[0] if entry else None
+
+    def get_template(self, name):
+        """
+        :return: response in file name compiled as a template, it's compiled
+            once until the file is changed
+        """
+        entry = self.__get_entry(name)
+        if entry is None:
+            return None
+        if entry[2] is None:
+            entry = (entry[0], entry[1], j2_env.from_string(entry[1]))
+            with self.__lock:
+                if self.__entries.get(name, (None,))[0] == entry[0]:
+                    self.__entries[name] = entry
+        return entry[2]
+
+
+fake_data_set = FakeData()
+
+# rendered responses, command -> (signature of inputs, response)
+_responses = {}
+_responses_lock = threading.Lock()
+
+
 def fake_data(name):
-    if not env.racadm_data:
-        return None
-    data_path = os.path.join(env.racadm_data, name)
-    if os.path.exists(data_path):
-        with open(data_path) as fp:
-            rsp = linesep.join(fp.read().splitlines())
-        return rsp
-    else:
-        return None
+    return fake_data_set.get(name)
+
+
+def render_cached(cmd, inputs, render):
+    """
+    :param cmd: command of the response
+    :param inputs: signature of everything the response is rendered from
+    :param render: function to render the response if cached one is not
+        rendered from the same inputs
+    """
+    key = tuple(cmd)
+    with _responses_lock:
+        entry = _responses.get(key)
+    if entry is not None and entry[0] == inputs:
+        return entry[1]
+
+    rsp = render()
+    with _responses_lock:
+        _responses[key] = (inputs, rsp)
+    return rsp
+
+
+def preload():
+    """
+    Index racadm data and compile templates before any command comes
+    """
+    if env.racadm_data:
+        fake_data_set.load(env.racadm_data)
+    for name in j2_env.list_templates(extensions=["j2"]):
+        j2_env.get_template(name)
+
+
+def render_storage(tmpl_name):
+    topo_embedded, topo_backplane = model.get_drive_topology()
+    return j2_env.get_template(tmpl_name).render(satadom=topo_embedded[0],
+                                                 mapping=topo_backplane)
 
 
 class RacadmConsole(REPL):
@@ -76,10 +191,8 @@ class RacadmConsole(REPL):
         [RACADM] get storage information
         """
         if args == ["storage", "get", "pdisks", "-o"]:
-            j2_tmpl = j2_env.get_template("storage.j2")
-            topo_embedded, topo_backplane = model.get_drive_topology()
-            t = j2_tmpl.render(satadom=topo_embedded[0], mapping=topo_backplane)
-            return t
+            return render_cached(args, model.get_node_info_signature(),
+                                 lambda: render_storage("storage.j2"))
         else:
             return None
 
@@ -107,14 +220,14 @@ class RacadmConsole(REPL):
         [RACADM] hwinventory
         """
         if args == ["hwinventory"]:
-            j2_tmpl = j2_env.get_template("hwinventory_storage.j2")
-            topo_embedded, topo_backplane = model.get_drive_topology()
-            t_storage = j2_tmpl.render(satadom=topo_embedded[0], mapping=topo_backplane)
-
-            j2_hwinventory_tmpl = j2_env.from_string(fake_data("hwinventory"))
-            t_hwinventory = j2_hwinventory_tmpl.render(storage=t_storage)
+            def render():
+                t_storage = render_storage("hwinventory_storage.j2")
+                return fake_data_set.get_template("hwinventory").render(storage=t_storage)
 
-            return t_hwinventory
+            return render_cached(args,
+                                 (model.get_node_info_signature(),
+                                  fake_data_set.get_signature("hwinventory")),
+                                 render)
 
         elif args == ["hwinventory", "nic"]:
             return fake_data("hwinventory_nic")
@@ -10,19 +10,27 @@ Copyright @ 2015 EMC Corporation All Rights Reserved
 import os
 from . import env
 from infrasim import config
-from infrasim.yaml_loader import YAMLLoader
+from infrasim.yaml_loader import load_yaml, get_dependencies
+
+
+def get_runtime_yml_path():
+    return os.path.join(config.infrasim_home,
+                        env.node_name, "etc", "infrasim.yml")
 
 
 def get_node_info():
     """
     Get runtime node information
     """
-    runtime_yml_path = os.path.join(config.infrasim_home,
-                                    env.node_name, "etc", "infrasim.yml")
-    with open(runtime_yml_path, 'r') as fp:
-        node_info = YAMLLoader(fp).get_data()
+    return load_yaml(get_runtime_yml_path())
+
 
-    return node_info
+def get_node_info_signature():
+    """
+    Signature of runtime node information, it's changed once the runtime
+    config or any file it includes is changed
+    """
+    return tuple(get_dependencies(get_runtime_yml_path()))
 
 
 def get_drive_topology():
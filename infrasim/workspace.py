@@ -1,9 +1,9 @@
 import os
 import yaml
-import shutil
 from infrasim import config
 import subprocess
-from yaml_loader import YAMLLoader
+from yaml_loader import load_yaml
+from materialize import copy_file, write_file
 from . import has_option, InfraSimError, set_option
 
 
@@ -25,8 +25,7 @@ class Workspace(object):
                                      "etc/infrasim.yml")
         node_info = None
         try:
-            with open(node_yml_path, 'r') as fp:
-                node_info = YAMLLoader(fp).get_data()
+            node_info = load_yaml(node_yml_path)
         except Exception:
             raise InfraSimError("Fail to read node {} information from runtime workspace".
                                 format(node_name))
@@ -48,6 +47,14 @@ class Workspace(object):
     def get_workspace(self):
         return self._workspace
 
+    @staticmethod
+    def is_system_data(path):
+        """
+        Data files of infrasim package are never changed, workspace links
+        them instead of copying
+        """
+        return os.path.realpath(path).startswith(os.path.join(os.path.realpath(config.infrasim_data), ""))
+
     def init(self):
         """
         Create workspace: <HOME>/.infrasim/<node_name>
@@ -116,7 +123,7 @@ class Workspace(object):
             src = os.path.join(config.infrasim_data, "{0}/{0}.emu".format(node_type))
 
         if os.path.dirname(src) != path_data_dst:
-            shutil.copy(src, dst)
+            copy_file(src, dst, link=self.is_system_data(src))
 
         set_option(self._info, "bmc", "emu_file", dst)
 
@@ -131,7 +138,7 @@ class Workspace(object):
             src = os.path.join(config.infrasim_data, "{0}/{0}_smbios.bin".format(node_type))
 
         if os.path.dirname(src) != path_data_dst:
-            shutil.copy(src, dst)
+            copy_file(src, dst, link=self.is_system_data(src))
 
         set_option(self._info["compute"], "smbios", "file", dst)
 
@@ -139,14 +146,13 @@ class Workspace(object):
         path_oem_file_src = os.path.join(config.infrasim_data, "oem_data.json")
         path_oem_script_src = os.path.join(config.infrasim_scripts, "ipmi_exec.py")
         if os.path.exists(path_oem_file_src):
-            shutil.copy(path_oem_file_src, os.path.join(path_data_dst, "oem_data.json"))
+            copy_file(path_oem_file_src, os.path.join(path_data_dst, "oem_data.json"), link=True)
         if os.path.exists(path_oem_script_src):
-            shutil.copy(path_oem_script_src, os.path.join(script_path, "ipmi_exec.py"))
+            copy_file(path_oem_script_src, os.path.join(script_path, "ipmi_exec.py"))
 
         # VII. Save infrasim.yml
         yml_file = os.path.join(self._workspace, "etc/infrasim.yml")
-        with open(yml_file, 'w') as fp:
-            yaml.dump(self._info, fp, default_flow_style=False)
+        write_file(yml_file, yaml.safe_dump(self._info, default_flow_style=False))
 
     def terminate(self):
         """
@@ -167,8 +173,7 @@ class ChassisWorkspace(Workspace):
                                         "etc/chassis.yml")
         chassis_info = None
         try:
-            with open(chassis_yml_path, 'r') as fp:
-                chassis_info = YAMLLoader(fp).get_data()
+            chassis_info = load_yaml(chassis_yml_path)
         except Exception:
             raise InfraSimError("Fail to read node {} information from runtime workspace".
                                 format(chassis_name))
@@ -220,14 +225,13 @@ class ChassisWorkspace(Workspace):
 
         # IV. Save chassis.yml
         yml_file = os.path.join(self._workspace, "etc/chassis.yml")
-        with open(yml_file, 'w') as fp:
-            yaml.dump(self._info, fp, default_flow_style=False)
+        write_file(yml_file, yaml.safe_dump(self._info, default_flow_style=False))
 
         # V. Move emulation data from system folder
         path_oem_file_src = os.path.join(config.infrasim_data, "oem_data.json")
         path_oem_file_dst = os.path.join(data_path, "oem_data.json")
         if os.path.exists(path_oem_file_src) and (os.path.exists(path_oem_file_dst) is False):
-            shutil.copy(path_oem_file_src, path_oem_file_dst)
+            copy_file(path_oem_file_src, path_oem_file_dst, link=True)
 
         # VI. Create soft link to sub nodes.
         for node in self._info.get("nodes", []):
@@ -1,5 +1,13 @@
-import yaml
+import cPickle
 import os
+import threading
+import yaml
+
+try:
+    from yaml import CSafeLoader as BaseLoader
+except ImportError:
+    # libyaml is not installed
+    from yaml import SafeLoader as BaseLoader
 
 
 def longhex_presenter(dumper, data):
@@ -10,17 +18,112 @@ def longhex_presenter(dumper, data):
 
 yaml.add_representer(long, longhex_presenter)
 yaml.add_representer(int, longhex_presenter)
+yaml.add_representer(long, longhex_presenter, Dumper=yaml.SafeDumper)
+yaml.add_representer(int, longhex_presenter, Dumper=yaml.SafeDumper)
 
+# path -> (signatures of the file and files it includes, pickled content)
+_yaml_cache = {}
+_yaml_cache_lock = threading.Lock()
+
+
+class YAMLLoader(BaseLoader):
+    """
+    YAML loader of libyaml if it's available, "!include <file>" is loaded
+    as content of the file, relative to the including file. Files read
+    through "!include" are kept in includes with their signatures.
+    """
 
-class YAMLLoader(yaml.Loader):
     def __init__(self, stream):
-        super(YAMLLoader, self).__init__(stream)
+        BaseLoader.__init__(self, stream)
         self._root = os.path.split(stream.name)[0]
-        self.add_constructor('!include', self._include)
-
-    def _include(self, *args):
-        loader = args[0]
-        node = args[1]
-        filename = os.path.join(self._root, loader.construct_scalar(node))
-        with open(filename, 'r') as f:
-            return yaml.load(f, YAMLLoader)
+        self.includes = []
+
+    def _include(self, node):
+        filename = os.path.join(self._root, self.construct_scalar(node))
+        data, includes = _load(filename)
+        self.includes.extend(includes)
+        return data
+
+    def _python_str(self, node):
+        return self.construct_scalar(node)
+
+    def _python_tuple(self, node):
+        return tuple(self.construct_sequence(node, deep=True))
+
+
+YAMLLoader.add_constructor('!include', YAMLLoader._include)
+# tags of yaml.dump, which wrote workspaces before yaml.safe_dump
+YAMLLoader.add_constructor(u'tag:yaml.org,2002:python/str', YAMLLoader._python_str)
+YAMLLoader.add_constructor(u'tag:yaml.org,2002:python/unicode', YAMLLoader._python_str)
+YAMLLoader.add_constructor(u'tag:yaml.org,2002:python/tuple', YAMLLoader._python_tuple)
+
+
+def get_signature(path):
+    st = os.stat(path)
+    return (st.st_mtime, st.st_size)
+
+
+def _lookup(path):
+    """
+    :return: cache entry of path if none of its files is changed
+    """
+    with _yaml_cache_lock:
+        entry = _yaml_cache.get(path)
+    if entry is not None:
+        try:
+            if all(get_signature(dep) == signature for dep, signature in entry[0]):
+                return entry
+        except OSError:
+            # an included file is removed
+            pass
+    return None
+
+
+def _load(path):
+    """
+    :return: content of path, and (path, signature) of path and every
+        file it includes
+    """
+    path = os.path.abspath(path)
+    entry = _lookup(path)
+    if entry is not None:
+        return cPickle.loads(entry[1]), entry[0]
+
+    with open(path, 'r') as fp:
+        st = os.fstat(fp.fileno())
+        deps = [(path, (st.st_mtime, st.st_size))]
+        loader = YAMLLoader(fp)
+        try:
+            data = loader.get_single_data()
+        finally:
+            loader.dispose()
+    for dep in loader.includes:
+        if dep not in deps:
+            deps.append(dep)
+
+    # content is kept pickled, so that every caller gets its own copy
+    with _yaml_cache_lock:
+        _yaml_cache[path] = (deps, cPickle.dumps(data, cPickle.HIGHEST_PROTOCOL))
+    return data, deps
+
+
+def load_yaml(path):
+    """
+    Load a YAML file with "!include". Parsed content is cached in this
+    process until the file or any file it includes is changed.
+    :return: content of the file, a copy the caller can change
+    """
+    return _load(path)[0]
+
+
+def get_dependencies(path):
+    """
+    :return: (path, signature) of a YAML file and every file it includes,
+        the file is loaded if it's not in cache; the result changes once
+        content of load_yaml(path) may change
+    """
+    path = os.path.abspath(path)
+    entry = _lookup(path)
+    if entry is not None:
+        return entry[0]
+    return _load(path)[1]
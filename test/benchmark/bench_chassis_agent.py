@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+'''
+*********************************************************
+Copyright @ 2018 Dell EMC Corporation All Rights Reserved
+*********************************************************
+'''
+# -*- coding: utf-8 -*-
+# Compare lookups/s of chassis share memory sections on a 24 slot chassis
+# data set: walking headers from offset 0 on every lookup (the former
+# Agent.__get_section) against the section index of Agent.
+#
+#     python -m test.benchmark.bench_chassis_agent [-n lookups] [-s slots]
+
+import argparse
+import os
+import tempfile
+import time
+from infrasim.chassis.agent import Agent
+from infrasim.chassis.dataset import DataSet
+from infrasim.chassis.share_memory import CShareMemory
+from test import fixtures
+
+
+def legacy_get(fi, title):
+    fi.seek(0, os.SEEK_SET)
+    ds = DataSet()
+    for sub_title in title.split('/'):
+        ret = ds.find_section(fi, sub_title)
+        if ret is None:
+            return None
+        fi.seek(ret[0], os.SEEK_CUR)
+    if len(ds.get_header_list(fi)) == 0:
+        return fi.read(ret[1] - 4)
+    return None
+
+
+def measure(name, count, func):
+    start = time.time()
+    func()
+    elapsed = time.time() - start
+    print "{:<30}{:>8} lookups in {:7.3f}s, {:10.0f} lookups/s".format(
+        name, count, elapsed, count / elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--count", type=int, default=20000)
+    parser.add_argument("-s", "--slots", type=int, default=24)
+    args = parser.parse_args()
+
+    data_file = tempfile.mktemp()
+    fixtures.build_chassis_dataset(args.slots).save(data_file)
+    with open(data_file, "rb") as f:
+        buf = f.read()
+    os.remove(data_file)
+
+    name = "bench_{}".format(os.getpid())
+    memory = CShareMemory()
+    memory.create("/share_mem_{}".format(name), len(buf))
+    memory.write(0, buf)
+
+    titles = ["chassis/nodes_power"] + \
+        ["slot_{}/{}".format(i, s) for i in range(args.slots) for s in ("status_error", "log_page")]
+    titles = [titles[i % len(titles)] for i in range(args.count)]
+
+    measure("walk headers per lookup", args.count,
+            lambda: [legacy_get(memory.handle_file, t) for t in titles])
+
+    agent = Agent()
+    start = time.time()
+    agent.open(name)
+    print "index built in {:.6f}s".format(time.time() - start)
+    measure("indexed agent", args.count, lambda: [agent.get(t) for t in titles])
+    agent.close()
+    memory.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+'''
+*********************************************************
+Copyright @ 2018 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+# -*- coding: utf-8 -*-
+# Measure how SAS disk array topology build scales with the number of
+# daisy chained enclosures: time per drive shall stay flat.
+#
+#     python -m test.benchmark.bench_disk_array [-d drives per enclosure]
+#         [-e enclosures ...]
+
+import argparse
+import shutil
+import tempfile
+import time
+from infrasim.model.elements.storage_diskarray import DiskArrayController
+from test import fixtures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--drives", type=int, default=50)
+    parser.add_argument("-e", "--enclosures", type=int, nargs="*", default=[5, 10, 20, 40, 80, 160])
+    args = parser.parse_args()
+
+    print "{:>10}{:>10}{:>10}{:>12}{:>12}{:>14}".format(
+        "enclosure", "expander", "drive", "build(s)", "export(s)", "us per drive")
+    for enclosures in args.enclosures:
+        ws = tempfile.mkdtemp()
+        backend = fixtures.build_disk_array_backend(enclosures, args.drives)
+        controller = DiskArrayController(ws)
+        start = time.time()
+        controller.add_storage_backend(backend)
+        controller.get_topo()
+        build = time.time() - start
+        start = time.time()
+        controller.export_drv_data()
+        export = time.time() - start
+        shutil.rmtree(ws)
+
+        drives = enclosures * args.drives
+        print "{:>10}{:>10}{:>10}{:>12.3f}{:>12.3f}{:>14.1f}".format(
+            enclosures, enclosures * 2, drives, build, export, build * 1e6 / drives)
+
+
+if __name__ == "__main__":
+    main()
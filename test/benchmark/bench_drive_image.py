@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+# -*- coding: utf-8 -*-
+# Compare time and disk footprint to provision drive images of nodes:
+# "qemu-img create" per drive (the former CBaseDrive.init) against copies
+# of the cached base image. The former way is measured only when qemu-img
+# is installed.
+#
+#     python -m test.benchmark.bench_drive_image [-n nodes] [-d drives]
+#         [-f format] [-s size] [-p preallocation]
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from distutils.spawn import find_executable
+from infrasim import config, image
+
+
+def footprint(folder):
+    total = 0
+    for root, _, files in os.walk(folder):
+        for name in files:
+            total += os.stat(os.path.join(root, name)).st_blocks * 512
+    return total
+
+
+def provision(name, args, create):
+    config.infrasim_home = tempfile.mkdtemp(dir=args.dir)
+    try:
+        start = time.time()
+        for node in range(args.nodes):
+            workspace = os.path.join(config.infrasim_home, "node{}".format(node))
+            os.mkdir(workspace)
+            for drive in range(args.drives):
+                create(os.path.join(workspace, "disk-sd{}.img".format(drive)))
+        elapsed = time.time() - start
+        print "{:<22}{:>4} node(s) x {:>3} drive(s) in {:8.3f}s, {:8.3f}s per node, " \
+              "footprint {:10.1f}MB".format(name, args.nodes, args.drives, elapsed,
+                                            elapsed / args.nodes, footprint(config.infrasim_home) / 1048576.0)
+    finally:
+        shutil.rmtree(config.infrasim_home)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--nodes", type=int, default=4)
+    parser.add_argument("-d", "--drives", type=int, default=24)
+    parser.add_argument("-f", "--format", default="raw")
+    parser.add_argument("-s", "--size", type=int, default=8)
+    parser.add_argument("-p", "--preallocation", default=None)
+    parser.add_argument("--dir", default=None, help="folder on the file system to measure")
+    args = parser.parse_args()
+
+    if find_executable("qemu-img"):
+        options = " -o preallocation={}".format(args.preallocation) if args.preallocation else ""
+        provision("qemu-img per drive", args, lambda path: image.run_command(
+            "qemu-img create -f {} {} {}G{}".format(args.format, path, args.size, options)))
+    else:
+        print "qemu-img is not installed, skip qemu-img per drive"
+
+    provision("cached base image", args, lambda path: image.create_drive_image(
+        path, args.format, args.size, preallocation=args.preallocation))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+# -*- coding: utf-8 -*-
+# Compare time to collect ports of node tasks: two "lsof" per pid (the
+# former NodeStatus.get_port_status) against one pass over /proc. The
+# former way is measured only when lsof is installed.
+#
+#     python -m test.benchmark.bench_global_status [-p processes]
+
+import argparse
+import re
+import subprocess
+import sys
+import time
+from distutils.spawn import find_executable
+from infrasim import run_command
+from infrasim.global_status import PortCollector
+
+LISTENER = """
+import socket, sys
+tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+tcp.bind(("127.0.0.1", 0))
+tcp.listen(1)
+udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+udp.bind(("127.0.0.1", 0))
+sys.stdout.write("ready\\n")
+sys.stdout.flush()
+sys.stdin.read()
+"""
+
+
+def lsof_ports(pid):
+    ports = []
+    for protocol in ["UDP", "TCP"]:
+        cmd = "lsof -Pan -p {} -i{}".format(pid, protocol)
+        if protocol == "TCP":
+            cmd = " ".join([cmd, "-sTCP:LISTEN"])
+        try:
+            ports.extend(set(re.findall(r":(\d.+?) ", run_command(cmd)[1])))
+        except Exception:
+            pass
+    return ports
+
+
+def measure(name, pids, get_ports):
+    start = time.time()
+    found = sum(len(get_ports(pid)) for pid in pids)
+    elapsed = time.time() - start
+    print "{:<12}{:>5} pid(s), {:>5} port(s) in {:8.3f}s".format(name, len(pids), found, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-p", "--processes", type=int, default=100)
+    args = parser.parse_args()
+
+    procs = []
+    try:
+        for _ in range(args.processes):
+            procs.append(subprocess.Popen([sys.executable, "-c", LISTENER],
+                                          stdin=subprocess.PIPE, stdout=subprocess.PIPE))
+        for proc in procs:
+            proc.stdout.readline()
+        pids = [proc.pid for proc in procs]
+
+        if find_executable("lsof"):
+            measure("lsof", pids, lsof_ports)
+        else:
+            print "lsof is not installed, skip lsof"
+        collector = PortCollector()
+        measure("/proc", pids, collector.get_ports)
+    finally:
+        for proc in procs:
+            proc.stdin.close()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+# -*- coding: utf-8 -*-
+# Measure the cost of a log statement on the caller's thread in a sensor
+# loop: every tick logs one line per sensor, then the loop sleeps until
+# the next tick. Compared are the former synchronous file handler, the
+# queue to the log writer thread, and a guarded debug statement filtered
+# by level.
+#
+#     python -m test.benchmark.bench_log [-t ticks] [-s sensors]
+
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+from infrasim import log
+
+
+def measure(name, ticks, sensors, func):
+    elapsed = 0
+    for _ in xrange(ticks):
+        start = time.time()
+        for i in xrange(sensors):
+            func(i)
+        elapsed += time.time() - start
+        time.sleep(0.002)
+    count = ticks * sensors
+    print "{:<36}{:>8} calls in {:7.3f}s, {:8.2f} us/call".format(
+        name, count, elapsed, elapsed * 1e6 / count)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-t", "--ticks", type=int, default=500)
+    parser.add_argument("-s", "--sensors", type=int, default=40)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    command = "sensor_set_value 0x20 0x0 0x40 0x50 0x01"
+
+    sync_logger = logging.getLogger("bench-sync")
+    sync_logger.propagate = False
+    handler = logging.FileHandler(os.path.join(folder, "sync.log"))
+    handler.setFormatter(logging.Formatter('%(asctime)s - Ipmi-console - %(filename)s:'
+                                           '%(lineno)s - %(levelname)s - %(message)s'))
+    sync_logger.addHandler(handler)
+    sync_logger.setLevel(logging.DEBUG)
+    measure("synchronous file handler", args.ticks, args.sensors,
+            lambda i: sync_logger.info("send IPMI SIM command: " + command))
+
+    queue_logger = logging.getLogger("bench-queue")
+    queue_logger.propagate = False
+    path = os.path.join(folder, "queue.log")
+    queue_logger.addHandler(log.QueueHandler(log.log_writer.get_handler(path), "Ipmi-console"))
+    queue_logger.setLevel(logging.INFO)
+    measure("queue to log writer", args.ticks, args.sensors,
+            lambda i: queue_logger.info("send IPMI SIM command: %s", command))
+    log.log_writer.flush()
+
+    def guarded(i):
+        if queue_logger.isEnabledFor(logging.DEBUG):
+            queue_logger.debug("send IPMI SIM command: %s", command)
+    measure("guarded debug, filtered", args.ticks, args.sensors, guarded)
+
+    handler.close()
+    log.log_writer.close_handler(path)
+    shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
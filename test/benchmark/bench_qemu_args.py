@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+# -*- coding: utf-8 -*-
+# Measure qemu args rendering of a node with many SAS drives: element
+# init, first CCompute.get_commandline() and later calls which reuse the
+# rendered args while compute information is not changed.
+#
+#     python -m test.benchmark.bench_qemu_args [-d drives] [-n calls]
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from infrasim import model
+from test import fixtures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--drives", type=int, default=200)
+    parser.add_argument("-n", "--count", type=int, default=100)
+    args = parser.parse_args()
+
+    ws = tempfile.mkdtemp()
+    os.mkdir(os.path.join(ws, "data"))
+    compute_info = fixtures.FakeConfig().get_node_info()["compute"]
+    compute_info["storage_backend"] = [{
+        "type": "megasas",
+        "max_drive_per_controller": args.drives,
+        "drives": [{"size": 1, "format": "raw", "file": os.path.join(ws, "sd{}.img".format(i))}
+                   for i in range(args.drives)]
+    }]
+    compute = model.CCompute(compute_info)
+    compute.set_type("dell_r730")
+    compute.set_workspace(ws)
+    compute.set_task_name("bench-node")
+
+    try:
+        start = time.time()
+        compute.init()
+        print "{:<28}{:10.3f}ms".format("init", (time.time() - start) * 1000)
+
+        start = time.time()
+        compute.get_commandline()
+        print "{:<28}{:10.3f}ms".format("first get_commandline", (time.time() - start) * 1000)
+
+        start = time.time()
+        for _ in range(args.count):
+            compute.get_commandline()
+        print "{:<28}{:10.3f}ms".format("unchanged get_commandline", (time.time() - start) * 1000 / args.count)
+
+        with open(os.path.join(ws, "data", "qemu_args.txt")) as f:
+            print "{} drives, qemu_args.txt {} lines".format(args.drives, len(f.read().splitlines()))
+    finally:
+        shutil.rmtree(ws)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+# -*- coding: utf-8 -*-
+# Load test of QMP access in infrasim-monitor: concurrent clients send
+# QMP commands to a fake QEMU monitor, either on a new connection with
+# capabilities negotiation per request (the former REST resources) or on
+# the pooled session of node.
+#
+#     python -m test.benchmark.bench_qmp_pool [-c clients] [-r requests]
+
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+from infrasim import config
+from infrasim.monitor import qemu_api
+from test import fixtures
+
+
+def per_request(node_name, cmd):
+    qm = qemu_api.QemuMonitor(node_name)
+    try:
+        qm.connect()
+        return qm.execute(cmd)
+    finally:
+        qm.close()
+
+
+def pooled(node_name, cmd):
+    return qemu_api.get_qemu_monitor(node_name).execute(cmd)
+
+
+def measure(name, args, request):
+    errors = []
+
+    def client(index):
+        for n in range(args.requests):
+            try:
+                request("bench", {"execute": "query-status", "arguments": {"n": n}})
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - start
+    total = args.clients * args.requests
+    print "{:<14}{:>4} client(s), {:>6} request(s) in {:8.3f}s, {:10.1f} req/s, {} error(s)".format(
+        name, args.clients, total, elapsed, total / elapsed, len(errors))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-c", "--clients", type=int, default=50)
+    parser.add_argument("-r", "--requests", type=int, default=100)
+    args = parser.parse_args()
+
+    home = config.infrasim_home
+    config.infrasim_home = tempfile.mkdtemp()
+    os.mkdir(os.path.join(config.infrasim_home, "bench"))
+    server = fixtures.FakeQMPServer(os.path.join(config.infrasim_home, "bench", ".monitor"))
+    try:
+        measure("per request", args, per_request)
+        measure("pooled", args, pooled)
+    finally:
+        qemu_api.close_all()
+        server.close()
+        shutil.rmtree(config.infrasim_home)
+        config.infrasim_home = home
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+# -*- coding: utf-8 -*-
+# Measure racadm commands/s over SSH against racadmsim serving a node of
+# many drives, as automation polling a rack does. Compared are responses
+# rendered for every command, as racadmsim did before, with fake data and
+# runtime config read again, and responses from the cache of racadmsim.
+#
+#     python -m test.benchmark.bench_racadmsim [-d drives] [-n count]
+
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+import paramiko
+import yaml
+from infrasim import config, sshim, yaml_loader
+from infrasim import racadmsim
+from infrasim.racadmsim import api, env
+from test import fixtures
+
+COMMANDS = ["racadm getsysinfo",
+            "racadm storage get pdisks -o",
+            "racadm hwinventory"]
+
+
+def build_node_info(drives):
+    node_info = fixtures.FakeConfig().get_node_info()
+    node_info["compute"]["storage_backend"] = [
+        {
+            "type": "ahci",
+            "drives": [{"size": 40, "model": "SATADOM", "serial": "20160518AA851134100"}]
+        },
+        {
+            "type": "megasas",
+            "drives": [{
+                "size": 8,
+                "vendor": "SEAGATE",
+                "product": "ST4000NM0005",
+                "serial": "01234567{}".format(i),
+                "wwn": 0x5000c500852e2971 + i,
+                "rotation": 1,
+                "slot_number": i
+            } for i in range(drives)]
+        }
+    ]
+    return node_info
+
+
+def drop_caches():
+    with api._responses_lock:
+        api._responses.clear()
+    api.fake_data_set = api.FakeData()
+    with yaml_loader._yaml_cache_lock:
+        yaml_loader._yaml_cache.clear()
+
+
+def read_until_prompt(channel):
+    output = ""
+    while not output.endswith(racadmsim.iDRACServer.PROMPT):
+        output += channel.recv(65536)
+    return output
+
+
+def measure(name, channel, count, before=None):
+    start = time.time()
+    size = 0
+    for _ in range(count):
+        for cmd in COMMANDS:
+            if before:
+                before()
+            channel.sendall(cmd + "\n")
+            size += len(read_until_prompt(channel))
+    elapsed = time.time() - start
+    total = count * len(COMMANDS)
+    print "{:<36}{:>6} commands in {:7.3f}s, {:8.1f} commands/s, {:6d} KB".format(
+        name, total, elapsed, total / elapsed, size / 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--drives", type=int, default=200)
+    parser.add_argument("-n", "--count", type=int, default=20)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    old_home = config.infrasim_home
+    config.infrasim_home = os.path.join(folder, "home")
+    os.makedirs(os.path.join(config.infrasim_home, "bench", "etc"))
+    with open(os.path.join(config.infrasim_home, "bench", "etc", "infrasim.yml"), "w") as fp:
+        yaml.dump(build_node_info(args.drives), fp, default_flow_style=False)
+    data = os.path.join(folder, "data")
+    os.makedirs(data)
+    with open(os.path.join(data, "getsysinfo"), "w") as fp:
+        fp.write("\n".join("Attribute{:03d} = value".format(i) for i in range(100)))
+    with open(os.path.join(data, "hwinventory"), "w") as fp:
+        fp.write("[InstanceID: System.Embedded.1]\n{{ storage }}\n")
+
+    env.logger_r = logging.getLogger("bench_racadmsim")
+    env.auth_map["admin"] = "admin"
+    env.node_name = "bench"
+    env.racadm_data = data
+    api.preload()
+    server = sshim.Server(racadmsim.iDRACServer, logger=env.logger_r,
+                          address="127.0.0.1", port=0, handler=racadmsim.iDRACHandler)
+    server.start()
+
+    client = paramiko.SSHClient()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    client.connect("127.0.0.1", port=server.port, username="admin", password="admin",
+                   allow_agent=False, look_for_keys=False)
+    # commands run in the iDRAC shell, one session for all of them
+    channel = client.invoke_shell()
+    read_until_prompt(channel)
+    try:
+        measure("rendered for every command", channel, args.count, drop_caches)
+        api.preload()
+        measure("cached responses", channel, args.count)
+    finally:
+        channel.close()
+        client.close()
+        server.stop()
+        config.infrasim_home = old_home
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
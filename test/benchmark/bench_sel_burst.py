@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+# -*- coding: utf-8 -*-
+# Compare SEL entries/s injected one sel_add per round trip (as "sel set"
+# does) and by SELBurst in pipelined batches, with and without a target
+# rate.
+#
+#     python -m test.benchmark.bench_sel_burst [-n count] [-r rate] [-p lanserv_console_port]
+#
+# Without -p a fake lanserv console is started on a local port.
+
+import argparse
+import time
+from infrasim.ipmiconsole import common
+from infrasim.ipmiconsole import sel
+from test import fixtures
+
+
+def measure(name, count, func):
+    start = time.time()
+    func()
+    elapsed = time.time() - start
+    print "{:<36}{:>8} entries in {:7.3f}s, {:10.1f} entries/s".format(
+        name, count, elapsed, count / elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--count", type=int, default=2000)
+    parser.add_argument("-r", "--rate", type=float, default=1000)
+    parser.add_argument("-p", "--port", type=int, default=None)
+    args = parser.parse_args()
+
+    console = None
+    port = args.port
+    if port is None:
+        console = fixtures.FakeLanservConsole()
+        port = console.port
+
+    record = sel.OEM_SEL_E0_FF()
+    record.set_record_type(0xe0)
+    record.set_oem_defined_bytes(range(13))
+    channel = common.VbmcChannel(port=port)
+
+    measure("one sel_add per round trip", args.count,
+            lambda: [channel.execute([record.get_command()]) for _ in range(args.count)])
+    measure("burst, unlimited rate", args.count,
+            lambda: sel.SELBurst(record, args.count, send=channel.execute).run())
+    measure("burst, {:.0f} entries/s".format(args.rate), args.count,
+            lambda: sel.SELBurst(record, args.count, args.rate, send=channel.execute).run())
+
+    channel.close()
+    if console:
+        console.close()
+
+
+if __name__ == "__main__":
+    main()
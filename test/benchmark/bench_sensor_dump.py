@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+# -*- coding: utf-8 -*-
+# Measure latency of a full sensor dump: an ipmitool process per sensor
+# (the former read_sensor_raw_value), one LAN session with one request per
+# round trip, and one LAN session with pipelined requests.
+#
+#     python -m test.benchmark.bench_sensor_dump [-n sensors] [-H host -p port -P password]
+#
+# Without -H a fake LAN BMC is started on a local port. The ipmitool path
+# is measured only if ipmitool is installed.
+
+import argparse
+import subprocess
+import time
+from distutils.spawn import find_executable
+from infrasim.ipmiconsole.lan import IpmiLanSession
+from test import fixtures
+
+
+def ipmitool_per_sensor(host, port, password, sensors):
+    for num, _, _ in sensors:
+        subprocess.call(["ipmitool", "-I", "lan", "-H", host, "-p", str(port),
+                         "-U", "admin", "-P", password, "raw", "0x04", "0x2d", hex(num)],
+                        stdout=open("/dev/null", "w"), stderr=subprocess.STDOUT)
+
+
+def measure(name, count, func):
+    start = time.time()
+    func()
+    elapsed = time.time() - start
+    print "{:<36}{:>6} sensors in {:7.3f}s".format(name, count, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--count", type=int, default=150)
+    parser.add_argument("-H", "--host", default=None)
+    parser.add_argument("-p", "--port", type=int, default=623)
+    parser.add_argument("-P", "--password", default="admin")
+    args = parser.parse_args()
+
+    bmc = None
+    host, port = args.host, args.port
+    if host is None:
+        bmc = fixtures.FakeLanBmc(password=args.password,
+                                  readings=dict((i, "\x20\xc0\x00") for i in range(256)))
+        host, port = "127.0.0.1", bmc.port
+
+    sensors = [(i % 256, 0, "threshold") for i in range(args.count)]
+
+    if find_executable("ipmitool"):
+        measure("ipmitool process per sensor", args.count,
+                lambda: ipmitool_per_sensor(host, port, args.password, sensors))
+
+    session = IpmiLanSession(host, port, "admin", args.password)
+    session.open()
+    measure("one session, request per round trip", args.count,
+            lambda: [session.get_sensor_readings([s]) for s in sensors])
+    measure("one session, pipelined", args.count,
+            lambda: session.get_sensor_readings(sensors))
+    session.close()
+
+    if bmc:
+        bmc.close()
+
+
+if __name__ == "__main__":
+    main()
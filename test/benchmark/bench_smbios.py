@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+# -*- coding: utf-8 -*-
+# Time SMBIOS decode, modify and save over all bundled smbios.bin files,
+# as CCompute.init does on every node start. The second save of the same
+# modification finds identical content and skips the write.
+#
+#     python -m test.benchmark.bench_smbios [-r rounds]
+
+import argparse
+import glob
+import os
+import shutil
+import tempfile
+import time
+from infrasim import config
+from infrasim.chassis.smbios import SMBios
+
+MODIFICATION = {
+    "type1": {"sn": "BENCH-SN", "uuid": "12345678-1234-5678-1234-567812345678"},
+    "type2": {"sn": "BENCH-BOARD", "location": "slot 1"},
+    "type3": {"sn": "BENCH-CHASSIS"},
+    "type4": {"version": "Bench CPU", "cores": 8}
+}
+
+
+def measure(name, rounds, files, action):
+    start = time.time()
+    written = 0
+    for _ in range(rounds):
+        for path in files:
+            written += action(path) is True
+    elapsed = time.time() - start
+    count = rounds * len(files)
+    print "{:<18}{:>6} file(s) in {:8.3f}s, {:8.3f}ms per file, {:>6} written".format(
+        name, count, elapsed, elapsed * 1000 / count, written)
+
+
+def modify_and_save(path):
+    bios = SMBios(path)
+    bios.ModifyData(MODIFICATION)
+    return bios.save(path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-r", "--rounds", type=int, default=100)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    try:
+        files = []
+        for src in sorted(glob.glob(os.path.join(config.infrasim_data, "*", "*_smbios.bin"))):
+            files.append(os.path.join(folder, os.path.basename(src)))
+            shutil.copy(src, files[-1])
+
+        measure("decode", args.rounds, files, SMBios)
+        measure("modify and save", 1, files, modify_and_save)
+        measure("save unchanged", args.rounds, files, modify_and_save)
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+# -*- coding: utf-8 -*-
+# Compare vBMC console commands/s of a telnet connection per command (the
+# former send_ipmi_sim_command), the persistent channel and its batch API.
+#
+#     python -m test.benchmark.bench_vbmc_channel [-n count] [-p lanserv_console_port]
+#
+# Without -p a fake lanserv console is started on a local port.
+
+import argparse
+import telnetlib
+import threading
+import time
+from infrasim.ipmiconsole import common
+from test import fixtures
+
+
+def connect_per_command(port, command):
+    tn = telnetlib.Telnet()
+    tn.open("localhost", port)
+    tn.write(command)
+    time.sleep(0.1)
+    result = tn.read_some()
+    tn.close()
+    return result
+
+
+def measure(name, count, func):
+    start = time.time()
+    func()
+    elapsed = time.time() - start
+    print "{:<36}{:>8} commands in {:7.3f}s, {:10.1f} commands/s".format(
+        name, count, elapsed, count / elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--count", type=int, default=1000)
+    parser.add_argument("-p", "--port", type=int, default=None)
+    args = parser.parse_args()
+
+    console = None
+    port = args.port
+    if port is None:
+        console = fixtures.FakeLanservConsole()
+        port = console.port
+
+    cmds = ["sensor_set_value 0x20 0 0x{:x} 0x10 0x01\n".format(i % 256) for i in range(args.count)]
+    # the old path is ~10 commands/s, don't wait for all of them
+    old_count = min(args.count, 20)
+
+    measure("connection per command", old_count,
+            lambda: [connect_per_command(port, cmd) for cmd in cmds[:old_count]])
+
+    channel = common.VbmcChannel(port=port)
+    measure("persistent channel", args.count,
+            lambda: [channel.execute([cmd]) for cmd in cmds])
+
+    pool = common.VbmcChannelPool(size=2, port=port)
+
+    def threads():
+        workers = [threading.Thread(target=lambda part: [pool.execute([c]) for c in part],
+                                    args=(cmds[i::8],)) for i in range(8)]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+
+    measure("channel pool, 8 sensor threads", args.count, threads)
+    measure("batch of 50", args.count,
+            lambda: [channel.execute(cmds[i:i + 50]) for i in range(0, args.count, 50)])
+
+    channel.close()
+    pool.close()
+    if console:
+        console.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+# -*- coding: utf-8 -*-
+# Measure workspace materialization of a fleet restart: workspaces and
+# vBMC scripts are created once, then materialized again as on restart.
+# Template rendering is compared between compiling a jinja2.Template
+# for every file (the former way) and the shared environment.
+#
+#     python -m test.benchmark.bench_workspace [-n nodes]
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import jinja2
+from infrasim import config, materialize
+from infrasim.workspace import Workspace
+from test import fixtures
+
+SCRIPTS = ["startcmd", "setbootcmd", "stopcmd", "resetcmd", "chassiscontrol", "vbmc.conf"]
+
+
+def materialize_nodes(nodes):
+    for node_info in nodes:
+        Workspace(node_info).init()
+        scripts = os.path.join(config.infrasim_home, node_info["name"], "scripts")
+        for name in SCRIPTS:
+            materialize.write_file(os.path.join(scripts, name),
+                                   materialize.render_template(name, yml_file=scripts))
+
+
+def compile_every_time(count):
+    for _ in range(count):
+        for name in SCRIPTS:
+            with open(os.path.join(config.infrasim_template, name), "r") as f:
+                jinja2.Template(f.read()).render(yml_file="/tmp")
+
+
+def measure(name, count, func):
+    before = materialize.get_stats()
+    start = time.time()
+    func()
+    elapsed = time.time() - start
+    after = materialize.get_stats()
+    print "{:<32}{:>5} nodes in {:7.3f}s, {:5} written {:5} linked {:5} unchanged".format(
+        name, count, elapsed, *[after[key] - before[key] for key in ("written", "linked", "skipped")])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--nodes", type=int, default=50)
+    args = parser.parse_args()
+
+    home = config.infrasim_home
+    config.infrasim_home = tempfile.mkdtemp()
+    nodes = []
+    for i in range(args.nodes):
+        node_info = fixtures.FakeConfig().get_node_info()
+        node_info["name"] = "bench{}".format(i)
+        nodes.append(node_info)
+
+    measure("first start", args.nodes, lambda: materialize_nodes(nodes))
+    measure("restart", args.nodes, lambda: materialize_nodes(nodes))
+    measure("templates compiled per file", args.nodes, lambda: compile_every_time(args.nodes))
+
+    shutil.rmtree(config.infrasim_home)
+    config.infrasim_home = home
+
+
+if __name__ == "__main__":
+    main()
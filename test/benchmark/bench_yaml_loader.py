@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+# -*- coding: utf-8 -*-
+# Compare loading a node config of 500 drives with the pure Python YAML
+# loader, the libyaml based YAMLLoader, and the parsed-config cache of
+# load_yaml, as racadmsim does for every "storage get pdisks".
+#
+#     python -m test.benchmark.bench_yaml_loader [-d drives] [-n count]
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import yaml
+from infrasim.yaml_loader import YAMLLoader, load_yaml
+from test import fixtures
+
+
+def build_node_info(drives):
+    node_info = fixtures.FakeConfig().get_node_info()
+    node_info["compute"]["storage_backend"] = [{
+        "type": "megasas",
+        "max_cmds": 1024,
+        "max_sge": 128,
+        "drives": [{
+            "file": "/tmp/sda{}.img".format(i),
+            "format": "raw",
+            "size": 8,
+            "vendor": "SEAGATE",
+            "product": "ST4000NM0005",
+            "serial": "01234567{}".format(i),
+            "version": "B29C",
+            "wwn": 0x5000c500852e2971 + i,
+            "rotation": 1,
+            "slot_number": i,
+            "page_file": "/tmp/ST4000NM0005.bin"
+        } for i in range(drives)]
+    }]
+    return node_info
+
+
+def measure(name, count, func):
+    start = time.time()
+    for _ in range(count):
+        func()
+    elapsed = time.time() - start
+    print "{:<36}{:>6} loads in {:7.3f}s, {:9.2f} ms/load".format(
+        name, count, elapsed, elapsed * 1000 / count)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--drives", type=int, default=500)
+    parser.add_argument("-n", "--count", type=int, default=10)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, "infrasim.yml")
+    with open(path, "w") as fp:
+        yaml.dump(build_node_info(args.drives), fp, default_flow_style=False)
+
+    def pure_python():
+        with open(path, "r") as fp:
+            return yaml.load(fp, Loader=yaml.Loader)
+
+    def libyaml():
+        with open(path, "r") as fp:
+            return YAMLLoader(fp).get_data()
+
+    assert pure_python() == libyaml() == load_yaml(path)
+    measure("pure Python yaml.Loader", args.count, pure_python)
+    measure("libyaml YAMLLoader", args.count, libyaml)
+    measure("load_yaml, cached", args.count, lambda: load_yaml(path))
+
+    shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
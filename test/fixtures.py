@@ -1,5 +1,11 @@
+import json
 import os
+import socket
+import struct
+import threading
+import time
 from infrasim import helper
+from infrasim.chassis.dataset import DataSet
 from collections import OrderedDict
 image = os.environ.get("TEST_IMAGE_PATH") or "/home/infrasim/jenkins/data/ubuntu18.04.qcow2"
 a_boot_image = os.environ.get("TEST_IMAGE_PATH") or "/home/infrasim/jenkins/data/ubuntu18.04.qcow2"
@@ -403,3 +409,332 @@ class CloudNetworkConfig(object):
 
     def get_network_info(self):
         return self.__info
+
+
+class FakeLanservConsole(object):
+    """
+    Minimal lanserv console on a local TCP port: it prints "> ", echoes
+    every input line and answers with the line reversed, so that tests
+    can tell responses apart.
+    """
+
+    def __init__(self):
+        self.commands = []
+        self.connections = 0
+        # close a connection once it answers so many commands
+        self.drop_after = None
+        self.__sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.__sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.__sock.bind(("127.0.0.1", 0))
+        self.__sock.listen(16)
+        self.port = self.__sock.getsockname()[1]
+        t = threading.Thread(target=self.__serve)
+        t.daemon = True
+        t.start()
+
+    def __serve(self):
+        while True:
+            try:
+                conn, _ = self.__sock.accept()
+            except socket.error:
+                return
+            self.connections += 1
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            t = threading.Thread(target=self.__handle, args=(conn,))
+            t.daemon = True
+            t.start()
+
+    def __handle(self, conn):
+        conn.sendall("> ")
+        buf = ""
+        answered = 0
+        while True:
+            try:
+                data = conn.recv(4096)
+            except socket.error:
+                break
+            if not data:
+                break
+            buf += data
+            while "\n" in buf:
+                line, buf = buf.split("\n", 1)
+                self.commands.append(line)
+                try:
+                    conn.sendall("{0}\r\n{1}\r\n> ".format(line, line[::-1]))
+                except socket.error:
+                    break
+                answered += 1
+                if self.drop_after and answered >= self.drop_after:
+                    conn.close()
+                    return
+        conn.close()
+
+    def close(self):
+        try:
+            self.__sock.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        self.__sock.close()
+
+
+class FakeLanBmc(object):
+    """
+    Minimal IPMI v1.5 LAN BMC on a local UDP port, supports session
+    setup with straight password and Get Sensor Reading from "readings",
+    a dict of sensor number to response data. Packets of an unknown
+    session are dropped like lanserv does.
+    """
+
+    def __init__(self, username="admin", password="admin", readings=None):
+        self.username = username
+        self.password = password
+        self.readings = readings or {}
+        self.sessions = set()
+        self.opened = 0
+        self.requests = 0
+        # netFn/LUN byte of each Get Sensor Reading
+        self.reading_netfn_luns = []
+        self.__sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.__sock.bind(("127.0.0.1", 0))
+        self.port = self.__sock.getsockname()[1]
+        t = threading.Thread(target=self.__serve)
+        t.daemon = True
+        t.start()
+
+    def __reply(self, addr, msg, cc, data):
+        rsp_body = struct.pack("BBBB", 0x20, msg[4], msg[5], cc) + data
+        netfn = ((msg[1] >> 2) + 1) << 2
+        header = struct.pack("BBB", 0x81, netfn, -(0x81 + netfn) & 0xff)
+        rsp = header + rsp_body + chr(-sum(bytearray(rsp_body)) & 0xff)
+        packet = "\x06\x00\xff\x07" + struct.pack("<BII", 0, 0, 0) + chr(len(rsp)) + rsp
+        self.__sock.sendto(packet, addr)
+
+    def __serve(self):
+        while True:
+            try:
+                packet, addr = self.__sock.recvfrom(1024)
+            except socket.error:
+                return
+            auth_type, _, session_id = struct.unpack_from("<BII", packet, 4)
+            offset = 13
+            authcode = ""
+            if auth_type:
+                authcode = packet[offset:offset + 16].rstrip("\x00")
+                offset += 16
+            msg = bytearray(packet[offset + 1:offset + 1 + ord(packet[offset])])
+            cmd, data = msg[5], msg[6:-1]
+            self.requests += 1
+
+            if cmd == 0x38:
+                self.__reply(addr, msg, 0, "\x0e\x15\x04\x00\x00\x00\x00\x00")
+            elif cmd == 0x39:
+                if str(data[1:17]).rstrip("\x00") != self.username:
+                    self.__reply(addr, msg, 0x81, "")
+                else:
+                    self.__reply(addr, msg, 0, struct.pack("<I", 0x1234) + "c" * 16)
+            elif cmd == 0x3a:
+                if session_id != 0x1234 or authcode != self.password:
+                    continue
+                self.opened += 1
+                new_id = 0x5000 + self.opened
+                self.sessions.add(new_id)
+                self.__reply(addr, msg, 0, struct.pack("<BIIB", 4, new_id, 100, 4))
+            elif session_id not in self.sessions or authcode != self.password:
+                continue
+            elif cmd == 0x3b:
+                self.__reply(addr, msg, 0, "\x04")
+            elif cmd == 0x3c:
+                self.sessions.discard(session_id)
+                self.__reply(addr, msg, 0, "")
+            elif cmd == 0x2d:
+                self.reading_netfn_luns.append(msg[1])
+                if data[0] in self.readings:
+                    self.__reply(addr, msg, 0, self.readings[data[0]])
+                else:
+                    self.__reply(addr, msg, 0xcb, "")
+
+    def close(self):
+        self.__sock.close()
+
+
+class FakeQMPServer(object):
+    """
+    Minimal QMP server on a UNIX socket. A command is answered with its
+    "arguments" after arguments["delay"] seconds, so that responses can
+    come out of order; command "emit" sends an event before its response
+    and a request without "execute" is answered with an error without id.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connections = 0
+        # connections still open
+        self.clients = 0
+        self.commands = []
+        self.__sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.__sock.bind(path)
+        self.__sock.listen(64)
+        t = threading.Thread(target=self.__serve)
+        t.daemon = True
+        t.start()
+
+    def __serve(self):
+        while True:
+            try:
+                conn, _ = self.__sock.accept()
+            except socket.error:
+                return
+            self.connections += 1
+            t = threading.Thread(target=self.__handle, args=(conn,))
+            t.daemon = True
+            t.start()
+
+    def __send(self, conn, lock, msg):
+        with lock:
+            try:
+                conn.sendall(json.dumps(msg) + "\r\n")
+            except socket.error:
+                pass
+
+    def __answer(self, conn, lock, cmd):
+        self.commands.append(cmd)
+        if "execute" not in cmd:
+            self.__send(conn, lock, {"error": {"class": "GenericError",
+                                               "desc": "QMP input lacks member 'execute'"}})
+            return
+
+        arguments = cmd.get("arguments", {})
+        time.sleep(arguments.get("delay", 0))
+        if cmd["execute"] == "emit":
+            self.__send(conn, lock, {"event": "TEST", "data": arguments})
+        response = {"return": arguments}
+        if "id" in cmd:
+            response["id"] = cmd["id"]
+        self.__send(conn, lock, response)
+
+    def __handle(self, conn):
+        self.clients += 1
+        lock = threading.Lock()
+        self.__send(conn, lock, {"QMP": {"version": {}, "capabilities": []}})
+        decoder = json.JSONDecoder()
+        buf = ""
+        while True:
+            try:
+                data = conn.recv(4096)
+            except socket.error:
+                break
+            if not data:
+                break
+            buf += data
+            while buf.strip():
+                buf = buf.lstrip()
+                try:
+                    cmd, end = decoder.raw_decode(buf)
+                except ValueError:
+                    break
+                buf = buf[end:]
+                t = threading.Thread(target=self.__answer, args=(conn, lock, cmd))
+                t.daemon = True
+                t.start()
+        conn.close()
+        self.clients -= 1
+
+    def close(self):
+        try:
+            self.__sock.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        self.__sock.close()
+        os.remove(self.path)
+
+
+def build_chassis_dataset(slots=24, nodes=2):
+    """
+    A chassis data set like CChassis renders for a chassis of SAS drives.
+    """
+    dataset = DataSet()
+    dataset.append("chassis", {
+        "pn": "PN-TEST",
+        "sn": "SN-TEST",
+        "nodes_power": '\0' * nodes,
+        "heart_beat": '\0' * nodes,
+        "power_changes": '\0' * 4,
+        "led": ' ' * 20
+    })
+    for slot in range(slots):
+        dataset.append("slot_{}".format(slot), {
+            "serial": "ZABCD{:04d}".format(slot),
+            "log_page": '\0' * 2048,
+            "status_error": '\0' * (1 + 4 + 3 + 1024 * 8 * 2 + 8),
+            "mode_page": '\0' * 2048
+        })
+    return dataset
+
+
+def build_disk_array_backend(enclosures=40, drives=50):
+    """
+    Storage backend of a SAS HBA and a rack of daisy chained enclosures,
+    each enclosure has 2 expanders sharing its drives. The HBA connects
+    to both expanders of the first enclosure, port 1 of each expander
+    connects to port 0 of the same side in the next enclosure.
+    """
+    sas_address = 0x5000c29000000000
+    disk_array = []
+    for index in range(enclosures):
+        expanders = []
+        for side, name in enumerate(["lcc-a", "lcc-b"]):
+            expanders.append({
+                "phy_count": 8 + drives,
+                "wwn": 0x5000ccab00000000 + (index << 8) + (side << 4),
+                "phy_map": "8-{}".format(8 + drives - 1),
+                "ports": [
+                    {"phy": 0, "id": 0, "number": 4},
+                    {"phy": 4, "id": 1, "number": 4}
+                ],
+                "side": side,
+                "name": name,
+                "ses": {"buffer_data": ""}
+            })
+        disk_array.append({
+            "name": "enclosure_{}".format(index),
+            "enclosure": {
+                "type": 28,
+                "drives": [{
+                    "repeat": drives,
+                    "format": "raw",
+                    "version": "B29C",
+                    "file": "/tmp/topo/e{}d{{}}.img".format(index),
+                    "slot_number": 0,
+                    "serial": "E{}D{{}}".format(index),
+                    "wwn": 0x5000c50000000000 + (index << 16)
+                }],
+                "expanders": expanders
+            }
+        })
+
+    connections = []
+    for index in range(enclosures - 1):
+        for name in ["lcc-a", "lcc-b"]:
+            connections.append({"link": [
+                {"disk_array": "enclosure_{}".format(index), "exp": name, "number": 4, "phy": 4},
+                {"disk_array": "enclosure_{}".format(index + 1), "exp": name, "number": 4, "phy": 0}
+            ]})
+    disk_array.append({"connections": connections})
+
+    return [
+        {
+            "type": "lsisas3008",
+            "sas_address": sas_address,
+            "max_drive_per_controller": 32,
+            "connectors": [
+                {"phy": 0, "wwn": sas_address, "atta_enclosure": "enclosure_0",
+                 "atta_exp": "lcc-a", "atta_port": 0},
+                {"phy": 4, "wwn": sas_address + 1, "atta_enclosure": "enclosure_0",
+                 "atta_exp": "lcc-b", "atta_port": 0}
+            ]
+        },
+        {
+            "type": "disk_array",
+            "disk_array": disk_array
+        }
+    ]
@@ -0,0 +1,139 @@
+'''
+*********************************************************
+Copyright @ 2018 Dell EMC Corporation All Rights Reserved
+*********************************************************
+'''
+
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+import time
+import unittest
+from infrasim import config
+from infrasim.chassis.agent import Agent
+from infrasim.chassis.power import NodePowerMonitor
+from infrasim.chassis.share_memory import CShareMemory
+from test import fixtures
+
+DATA_FILE = "/tmp/test_shm_data.bin"
+NAME = "test_agent"
+
+
+class test_chassis_agent(unittest.TestCase):
+
+    def setUp(self):
+        if os.path.exists(DATA_FILE):
+            os.remove(DATA_FILE)
+        fixtures.build_chassis_dataset().save(DATA_FILE)
+        with open(DATA_FILE, "rb") as f:
+            self.buf = f.read()
+        self.memory = CShareMemory()
+        self.memory.create("/share_mem_{}".format(NAME), len(self.buf))
+        self.memory.write(0, self.buf)
+        self.agent = Agent()
+        self.agent.open(NAME)
+
+    def tearDown(self):
+        self.agent.close()
+        self.memory.close()
+        os.remove(DATA_FILE)
+
+    def test_get_and_set(self):
+        assert str(self.agent.get("slot_3/serial")).rstrip("\0") == "ZABCD0003"
+        assert len(self.agent.get("chassis/nodes_power")) == 4
+        assert self.agent.set("chassis/nodes_power", "\xff\x00")
+        assert self.agent.get("chassis/nodes_power")[:2] == "\xff\x00"
+        # written in share memory, visible to other peers
+        peer = Agent()
+        peer.open(NAME)
+        assert peer.get("chassis/nodes_power")[:2] == "\xff\x00"
+        peer.close()
+
+    def test_section_not_found(self):
+        assert self.agent.get("slot_24/serial") is None
+        assert self.agent.get("slot_3") is None
+        assert not self.agent.set("chassis/led", " " * 100)
+        assert not self.agent.set("chassis/unknown", "\0")
+
+    def test_all_sections(self):
+        sections = self.agent.get_all_sections()
+        assert sections["chassis"]["sn"] == (8, "SN-TEST")
+        assert sections["slot_23"]["log_page"] == (2048, "")
+        assert len([k for k in sections if k.startswith("slot_")]) == 24
+
+    def test_generation_changed(self):
+        assert self.agent.get_generation() == 1
+        # rewrite data set with another layout in place
+        dataset = fixtures.build_chassis_dataset(slots=2, nodes=8)
+        dataset.save(DATA_FILE)
+        with open(DATA_FILE, "rb") as f:
+            buf = f.read()
+        self.memory.write(0, buf)
+        assert len(self.agent.get("chassis/nodes_power")) == 8
+        assert self.agent.get_generation() == 2
+        assert self.agent.get("slot_3/serial") is None
+        assert struct.unpack("I", str(self.agent.get("generation")))[0] == 2
+
+
+class test_node_power_monitor(test_chassis_agent):
+
+    def setUp(self):
+        super(test_node_power_monitor, self).setUp()
+        self.home = config.infrasim_home
+        config.infrasim_home = tempfile.mkdtemp()
+        self.names = ["test_node_0", "test_node_1"]
+        for name in self.names:
+            os.mkdir(os.path.join(config.infrasim_home, name))
+        self.monitor = NodePowerMonitor(self.agent, self.names)
+        self.proc = None
+
+    def tearDown(self):
+        self.monitor.close()
+        if self.proc and self.proc.poll() is None:
+            self.proc.kill()
+            self.proc.wait()
+        shutil.rmtree(config.infrasim_home)
+        config.infrasim_home = self.home
+        super(test_node_power_monitor, self).tearDown()
+
+    def __pid_file(self, name):
+        return os.path.join(config.infrasim_home, name, ".{}-node.pid".format(name))
+
+    def __changes(self):
+        return struct.unpack("I", self.agent.get("chassis/power_changes")[:4])[0]
+
+    def test_power_on_and_off(self):
+        assert self.monitor.refresh() == [0, 1]
+        assert self.agent.get("chassis/nodes_power")[:2] == "\0\0"
+        assert self.__changes() == 1
+        assert self.monitor.poll(0) == []
+
+        self.proc = subprocess.Popen(["sleep", "30"])
+        with open(self.__pid_file("test_node_1"), "w") as f:
+            f.write("{}\n".format(self.proc.pid))
+        start = time.time()
+        assert self.monitor.poll(3) == [1]
+        assert time.time() - start < 1
+        assert self.agent.get("chassis/nodes_power")[:2] == "\0\xff"
+        assert self.__changes() == 2
+
+        # QEMU is gone while its pid file is left
+        self.proc.kill()
+        self.proc.wait()
+        start = time.time()
+        assert self.monitor.poll(3) == [1]
+        assert time.time() - start < 1
+        assert self.agent.get("chassis/nodes_power")[:2] == "\0\0"
+        assert self.__changes() == 3
+
+    def test_pid_file_removed(self):
+        with open(self.__pid_file("test_node_0"), "w") as f:
+            f.write("{}\n".format(os.getpid()))
+        self.monitor.refresh()
+        assert self.monitor.get_status() == ["\xff", "\0"]
+        os.remove(self.__pid_file("test_node_0"))
+        start = time.time()
+        assert self.monitor.poll(3) == [0]
+        assert time.time() - start < 1
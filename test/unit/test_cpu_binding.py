@@ -0,0 +1,96 @@
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from infrasim import helper
+from infrasim.cpu_topology import CPUTopology, parse_cpu_list, format_cpu_list
+from infrasim.model.elements.cpu_binding import plan_affinity
+
+
+def build_sys_cpu(root, sockets=2, cores=4, threads=2):
+    """
+    sysfs cpu folder of a host, cpu n and n + sockets * cores are
+    hyper-thread siblings, one NUMA node per socket
+    """
+    total = sockets * cores * threads
+    with open(os.path.join(root, "online"), "w") as f:
+        f.write("0-{}\n".format(total - 1))
+    with open(os.path.join(root, "isolated"), "w") as f:
+        f.write("2-3,10-11\n")
+    for cpu in range(total):
+        socket = cpu % (sockets * cores) // cores
+        topology = os.path.join(root, "cpu{}".format(cpu), "topology")
+        os.makedirs(topology)
+        os.mkdir(os.path.join(root, "cpu{}".format(cpu), "node{}".format(socket)))
+        with open(os.path.join(topology, "physical_package_id"), "w") as f:
+            f.write("{}\n".format(socket))
+        with open(os.path.join(topology, "core_id"), "w") as f:
+            f.write("{}\n".format(cpu % cores))
+
+
+class test_cpu_topology(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        build_sys_cpu(self.root)
+        self.topology = CPUTopology(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_cpu_list(self):
+        assert parse_cpu_list("0-2,8, 10-11\n") == [0, 1, 2, 8, 10, 11]
+        assert parse_cpu_list("") == []
+        assert format_cpu_list([1, 3]) == "1,3"
+
+    def test_topology(self):
+        assert self.topology.get_cpus() == range(16)
+        assert self.topology.isolated == [2, 3, 10, 11]
+        assert self.topology.get_sockets() == [0, 1]
+        assert self.topology.get_siblings(5) == [5, 13]
+        assert self.topology.get_node(13) == 1
+        assert self.topology.get_node_cpus(0) == [0, 1, 2, 3, 8, 9, 10, 11]
+
+    def test_mono(self):
+        assert plan_affinity("mono", [100, 101], [2, 3], self.topology) == [(100, [2]), (101, [3])]
+
+    def test_spread(self):
+        # physical cores of both sockets before hyper-thread siblings
+        plan = plan_affinity("spread", range(6), [0, 1, 8, 9, 4, 12], self.topology)
+        assert [cpus[0] for _, cpus in plan] == [0, 4, 1, 8, 12, 9]
+
+    def test_numa_local(self):
+        plan = plan_affinity("numa-local", [100, 101], [3, 4, 5, 13], self.topology)
+        assert plan == [(100, [4, 5, 13]), (101, [4, 5, 13])]
+
+    def test_share(self):
+        plan = plan_affinity("share-2", range(5), [2, 3], self.topology)
+        assert plan == [(0, [2]), (1, [2]), (2, [3]), (3, [3])]
+
+    def test_unknown_policy(self):
+        assert plan_affinity("share-0", [1], [2], self.topology) == []
+        assert plan_affinity("random", [1], [2], self.topology) == []
+
+
+class test_sched_affinity(unittest.TestCase):
+
+    def test_set_affinity_of_process(self):
+        cpu = helper.sched_getaffinity(os.getpid())[-1]
+        proc = subprocess.Popen(["sleep", "10"])
+        try:
+            helper.sched_setaffinity(proc.pid, [cpu])
+            assert helper.sched_getaffinity(proc.pid) == [cpu]
+        finally:
+            proc.kill()
+            proc.wait()
+
+    def test_invalid_cpu(self):
+        with self.assertRaises(OSError):
+            helper.sched_setaffinity(os.getpid(), [1000])
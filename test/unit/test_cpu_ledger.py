@@ -0,0 +1,104 @@
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from infrasim import config, cpu_ledger, helper
+from infrasim.cpu_ledger import CPULedger
+
+
+def build_numactl():
+    """
+    NumaCtl of a host with 2 sockets of 4 hyper-threaded cores, the first
+    2 cores of each socket are reserved for system
+    """
+    numactl = helper.NumaCtl.__new__(helper.NumaCtl)
+    numactl.__class__.HT_FACTOR = 2
+    numactl._socket_list = [0, 1]
+    numactl._core_list = [0, 1, 2, 3]
+    numactl._core_map = {}
+    numactl._core_map_avai = {}
+    for socket in [0, 1]:
+        for core in range(4):
+            cpu = socket * 4 + core
+            numactl._core_map[(socket, core)] = [cpu, cpu + 8]
+            numactl._core_map_avai[(socket, core)] = [core > 1, core > 1]
+    return numactl
+
+
+class test_cpu_ledger(unittest.TestCase):
+
+    def setUp(self):
+        self.home = config.infrasim_home
+        config.infrasim_home = tempfile.mkdtemp()
+        self.numactl = build_numactl()
+        self.procs = []
+
+    def tearDown(self):
+        for proc in self.procs:
+            proc.kill()
+            proc.wait()
+        shutil.rmtree(config.infrasim_home)
+        config.infrasim_home = self.home
+
+    def __pid_file(self, name, alive=True):
+        pid_file = os.path.join(config.infrasim_home, ".{}.pid".format(name))
+        if alive:
+            proc = subprocess.Popen(["sleep", "30"])
+            self.procs.append(proc)
+            pid = proc.pid
+        else:
+            proc = subprocess.Popen(["true"])
+            proc.wait()
+            pid = proc.pid
+        with open(pid_file, "w") as f:
+            f.write(str(pid))
+        return pid_file
+
+    def test_nodes_spread_over_sockets(self):
+        # each infrasim process has its own ledger object
+        a = CPULedger().allocate("a-node", self.__pid_file("a"), 2, self.numactl)
+        b = CPULedger().allocate("b-node", self.__pid_file("b"), 2, self.numactl)
+        c = CPULedger().allocate("c-node", self.__pid_file("c"), 2, self.numactl)
+        assert a == [2, 10]
+        assert b == [6, 14]
+        assert c == [3, 11]
+        assert sorted(CPULedger().get_allocations()) == ["a-node", "b-node", "c-node"]
+        # NumaCtl of process is not changed
+        assert self.numactl._core_map_avai[(0, 2)] == [True, True]
+
+    def test_release(self):
+        CPULedger().allocate("a-node", self.__pid_file("a"), 2, self.numactl)
+        CPULedger().release("a-node")
+        assert CPULedger().get_allocations() == {}
+        assert CPULedger().allocate("b-node", self.__pid_file("b"), 2, self.numactl) == [2, 10]
+
+    def test_reconcile_with_pid(self):
+        CPULedger().allocate("dead-node", self.__pid_file("dead", alive=False), 2, self.numactl)
+        # pid file is not written yet
+        CPULedger().allocate("new-node", os.path.join(config.infrasim_home, ".new.pid"), 2, self.numactl)
+        assert sorted(CPULedger().get_allocations()) == ["new-node"]
+
+        grace = cpu_ledger.STARTING_GRACE
+        cpu_ledger.STARTING_GRACE = 0
+        try:
+            assert CPULedger().get_allocations() == {}
+        finally:
+            cpu_ledger.STARTING_GRACE = grace
+
+    def test_allocate_again(self):
+        pid_file = self.__pid_file("a")
+        CPULedger().allocate("a-node", pid_file, 2, self.numactl)
+        assert CPULedger().allocate("a-node", pid_file, 4, self.numactl) == [2, 10, 3, 11]
+        assert CPULedger().get_allocations()["a-node"]["cpus"] == [2, 10, 3, 11]
+
+    def test_get_cpus(self):
+        CPULedger().allocate("a-node", self.__pid_file("a"), 2, self.numactl)
+        assert CPULedger().get_cpus("a-node") == [2, 10]
+        assert CPULedger().get_cpus("b-node") == []
@@ -0,0 +1,123 @@
+'''
+*********************************************************
+Copyright @ 2018 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from infrasim.model.elements.backend import CBackendStorage
+from infrasim.model.elements.storage_diskarray import DiskArrayController, TopoBin, TopoCache
+from test import fixtures
+
+
+class FakeCompute(object):
+
+    def __init__(self, ws):
+        self.ws = ws
+
+    def get_workspace(self):
+        return self.ws
+
+
+class test_diskarray_topology(unittest.TestCase):
+
+    def setUp(self):
+        self.ws = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.ws)
+
+    def __build(self, enclosures, drives):
+        backend = fixtures.build_disk_array_backend(enclosures, drives)
+        controller = DiskArrayController(self.ws)
+        controller.add_storage_backend(backend)
+        topo = TopoBin().unpack_topo(controller.get_topo())
+        controller.export_drv_data()
+        with open(os.path.join(self.ws, "sas_all_drives.json")) as f:
+            exported = json.load(f)
+        return backend, topo, exported
+
+    def test_daisy_chain(self):
+        backend, topo, exported = self.__build(3, 12)
+        ports = backend[0]["hba_ports"]
+        # port 0 goes down lcc-a of every enclosure, port 1 down lcc-b
+        assert ports[0]["expanders"] == [0, 2, 4]
+        assert ports[1]["expanders"] == [1, 3, 5]
+        assert [p["atta_expanders"]["ids"] for p in topo["ports"]] == [(0, 2, 4), (1, 3, 5)]
+        assert len(topo["expander"]) == 6
+
+        drives = exported[str(backend[0]["sas_address"])]["drives"]
+        assert len(drives) == 6 * 12
+        # each expander starts scsi id after phys of previous ones
+        assert drives[0]["scsi-id"] == 32 + 8
+        assert drives[12]["scsi-id"] == 32 + 2 * 21 + 8
+
+    def test_duplicated_diskarray_is_ignored(self):
+        backend = fixtures.build_disk_array_backend(2, 4)
+        controller = DiskArrayController(self.ws)
+        controller.add_storage_backend(backend)
+        again = fixtures.build_disk_array_backend(2, 4)
+        controller.add_storage_backend(again[1:])
+        controller.get_topo()
+        assert len(controller._expanders) == 4
+
+    def test_2000_drives(self):
+        backend, topo, exported = self.__build(40, 50)
+        assert len(topo["expander"]) == 80
+        assert len(exported[str(backend[0]["sas_address"])]["drives"]) == 80 * 50
+        assert backend[0]["hba_ports"][0]["expanders"] == range(0, 80, 2)
+
+
+class test_topology_cache(unittest.TestCase):
+
+    def setUp(self):
+        self.ws = tempfile.mkdtemp()
+        self.data = os.path.join(self.ws, "data")
+        os.mkdir(self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.ws)
+
+    def __init_diskarray(self, backend):
+        storage = CBackendStorage(backend)
+        storage.owner = FakeCompute(self.ws)
+        storage._CBackendStorage__init_diskarray()
+        return backend[0]
+
+    def test_hit_and_miss(self):
+        hits, misses = TopoCache.hits, TopoCache.misses
+        built = self.__init_diskarray(fixtures.build_disk_array_backend(2, 4))
+        topo_file = os.path.join(self.data, "sas_topo.bin")
+        mtime = os.stat(topo_file).st_mtime
+        assert TopoCache.misses == misses + 1
+        assert "topo_cache" not in built
+
+        TopoCache(self.data).add_file("drv_args_0.txt")
+        with open(os.path.join(self.data, "drv_args_0.txt"), "w") as f:
+            f.write("count=0")
+
+        reused = self.__init_diskarray(fixtures.build_disk_array_backend(2, 4))
+        assert TopoCache.hits == hits + 1
+        assert os.stat(topo_file).st_mtime == mtime
+        assert reused["sas_topo"] == topo_file
+        assert "drv_args_0.txt" in reused["topo_cache"]
+        assert reused["drives"] == built["drives"]
+        assert reused["seses"] == built["seses"]
+
+        # storage backend changes
+        backend = fixtures.build_disk_array_backend(2, 5)
+        self.__init_diskarray(backend)
+        assert TopoCache.misses == misses + 2
+        assert len(backend[0]["drives"]) == 4 * 5
+
+    def test_clear(self):
+        digest = TopoCache.digest(fixtures.build_disk_array_backend(1, 1))
+        cache = TopoCache(self.data)
+        cache.store(digest, [])
+        assert cache.lookup(digest) == []
+        cache.clear()
+        assert cache.lookup(digest) is None
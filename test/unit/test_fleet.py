@@ -0,0 +1,70 @@
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+
+import time
+import unittest
+from infrasim import InfraSimError
+from infrasim.cli import FleetCommands
+from infrasim.fleet import Fleet
+
+
+class FakeNode(object):
+
+    def __init__(self, name, fail=False):
+        self.name = name
+        self.fail = fail
+
+    def start(self):
+        time.sleep(0.2)
+        if self.fail:
+            raise InfraSimError("{} fails to start".format(self.name))
+
+    def stop(self):
+        pass
+
+
+class test_fleet(unittest.TestCase):
+
+    def setUp(self):
+        self.names = ["rack1-{}".format(i) for i in range(8)] + ["rack2-0", "default"]
+
+    def test_match_glob_and_list(self):
+        fleet = Fleet(["rack1-*", "default,rack2-0", "rack1-0"])
+        assert fleet.match(self.names) == ["rack1-{}".format(i) for i in range(8)] + ["default", "rack2-0"]
+
+    def test_match_nothing(self):
+        assert Fleet(["rack3-*"]).match(self.names) == []
+
+    def test_start_in_pool(self):
+        fleet = Fleet(["rack1-*"], concurrency=4)
+        fleet.get_workspace_names = lambda: self.names
+        fleet.get_config_names = lambda: []
+        fleet._Fleet__build_node = lambda name, ignore_check: \
+            FakeNode(name, fail=name.endswith("-3"))
+
+        start = time.time()
+        results = fleet.start()
+        elapsed = time.time() - start
+
+        assert len(results) == 8
+        failed = [r for r in results if not r[1]]
+        assert [r[0] for r in failed] == ["rack1-3"]
+        assert "fails to start" in failed[0][3]
+        # 8 nodes in 4 workers shall take about 2 rounds, not 8
+        assert elapsed < 8 * 0.2
+
+    def test_cli_exits_on_failed_node(self):
+        fleet = Fleet(["rack1-*"], concurrency=4)
+        fleet.get_workspace_names = lambda: self.names
+        fleet.get_config_names = lambda: []
+        fleet._Fleet__build_node = lambda name, ignore_check: \
+            FakeNode(name, fail=name.endswith("-3"))
+        fleet.start()
+
+        assert [r[0] for r in fleet.get_failed()] == ["rack1-3"]
+        with self.assertRaises(SystemExit) as cm:
+            FleetCommands._check_result(fleet, "start", ["rack1-*"])
+        assert cm.exception.code == 1
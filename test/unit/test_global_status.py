@@ -0,0 +1,47 @@
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+
+import subprocess
+import sys
+import unittest
+from infrasim.global_status import PortCollector
+
+LISTENER = """
+import socket, sys
+tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+tcp.bind(("127.0.0.1", 0))
+tcp.listen(1)
+udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+udp.bind(("127.0.0.1", 0))
+idle = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+idle.bind(("127.0.0.1", 0))
+sys.stdout.write("{} {} {}\\n".format(tcp.getsockname()[1], udp.getsockname()[1],
+                                      idle.getsockname()[1]))
+sys.stdout.flush()
+sys.stdin.read()
+"""
+
+
+class test_port_collector(unittest.TestCase):
+
+    def setUp(self):
+        self.proc = subprocess.Popen([sys.executable, "-c", LISTENER],
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.tcp, self.udp, self.idle = self.proc.stdout.readline().split()
+
+    def tearDown(self):
+        self.proc.stdin.close()
+        self.proc.wait()
+
+    def test_ports_of_pid(self):
+        ports = PortCollector().get_ports(self.proc.pid)
+        # UDP first, TCP only in LISTEN
+        assert ports == [self.udp, self.tcp]
+
+    def test_exited_pid(self):
+        proc = subprocess.Popen(["true"])
+        proc.wait()
+        assert PortCollector().get_ports(proc.pid) == []
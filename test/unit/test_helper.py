@@ -4,8 +4,19 @@ Copyright @ 2015 EMC Corporation All Rights Reserved
 *********************************************************
 '''
 
+import json
+import os
+import random
+import socket
+import subprocess
+import tempfile
+import threading
+import time
 import unittest
+from infrasim import helper
 from infrasim.helper import version_parser, version_match
+from infrasim.log import infrasim_log, LoggerType
+from test import fixtures
 
 
 class TestVersionMatch(unittest.TestCase):
@@ -147,3 +158,157 @@ class TestVersionParser(unittest.TestCase):
         p, v = version_parser(e)
         assert p is None
         assert v is None
+
+
+class TestDoubleFork(unittest.TestCase):
+
+    def test_log_while_handler_held_at_fork(self):
+        logger = infrasim_log.get_logger(LoggerType.model.value)
+        result = []
+
+        @helper.double_fork
+        def child():
+            logger.info("logged in child")
+            return os.getpid()
+
+        # another thread is in the middle of a record when a task forks
+        handler = logger.handlers[0]
+        handler.acquire()
+        try:
+            t = threading.Thread(target=lambda: result.append(child()))
+            t.daemon = True
+            t.start()
+            t.join(10)
+        finally:
+            handler.release()
+        assert result and result[0] != os.getpid()
+
+
+class TestReadinessProbe(unittest.TestCase):
+
+    def test_port_listening(self):
+        s = socket.socket()
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+        assert helper.check_if_port_listening(port) is False
+        s.listen(1)
+        assert helper.check_if_port_listening(port) is True
+        s.close()
+
+    def test_unix_socket_listening(self):
+        path = os.path.join(tempfile.mkdtemp(), ".serial")
+        assert helper.check_if_unix_socket_listening(path) is False
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.bind(path)
+        s.listen(1)
+        assert helper.check_if_unix_socket_listening(path) is True
+        s.close()
+        os.remove(path)
+
+    def test_wait_pid_exit(self):
+        proc = subprocess.Popen(["sleep", "0.2"])
+        start = time.time()
+        assert helper.wait_pid_exit(proc.pid, 5) is True
+        assert time.time() - start < 2
+        proc.wait()
+
+        proc = subprocess.Popen(["sleep", "5"])
+        assert helper.wait_pid_exit(proc.pid, 0.1) is False
+        proc.kill()
+        proc.wait()
+
+    def test_wait_file_event(self):
+        path = os.path.join(tempfile.mkdtemp(), ".node.pid")
+
+        def write():
+            time.sleep(0.2)
+            with open(path, "w") as f:
+                f.write("1")
+
+        threading.Thread(target=write).start()
+        start = time.time()
+        assert helper.wait_file_event(path, lambda: os.path.exists(path), 5) is True
+        assert time.time() - start < 2
+        assert helper.wait_file_event(path + ".x", lambda: False, 0.1) is False
+
+
+def build_query_pci(devices):
+    """
+    A large reply like query-pci, strings hold braces, quotes and escapes.
+    """
+    return {"return": [{
+        "bus": 0,
+        "devices": [{
+            "slot": n,
+            "qdev_id": "dev{\"%d\"}\\[%d]" % (n, n),
+            "class_info": {"desc": u"Ethernet controller \u00e9 }"},
+            "regions": [{"bar": b, "address": n << 12 | b, "size": 4096} for b in range(6)]
+        } for n in range(devices)]
+    }], "id": "infrasim-1"}
+
+
+class TestJSONStream(unittest.TestCase):
+
+    def test_random_fragments(self):
+        rand = random.Random(0)
+        messages = [{"QMP": {"version": {}, "capabilities": []}},
+                    {"event": "RESET", "data": {"guest": True}},
+                    build_query_pci(12000),
+                    {"return": {}}]
+        data = "".join(json.dumps(m) + "\r\n" for m in messages)
+        assert len(data) > 4 << 20
+
+        stream = helper.JSONStream()
+        got = []
+        pos = 0
+        while pos < len(data):
+            size = rand.choice([1, 7, 1024, 65536, 1 << 20])
+            stream.feed(data[pos:pos + size])
+            pos += size
+            while True:
+                msg = stream.pop_message()
+                if msg is None:
+                    break
+                got.append(msg)
+        assert got == json.loads(json.dumps(messages))
+
+    def test_escape_at_fragment_end(self):
+        stream = helper.JSONStream()
+        for c in json.dumps({"a": "\\\"}{"}):
+            stream.feed(c)
+        assert stream.pop_message() == {"a": "\\\"}{"}
+        assert stream.pop_message() is None
+
+    def test_read_reply_by_id(self):
+        a, b = socket.socketpair()
+        try:
+            stream = helper.JSONStream(a, bufsize=1000)
+            data = json.dumps({"QMP": {}}) + json.dumps({"return": {}, "id": 1}) + \
+                json.dumps({"event": "STOP"}) + json.dumps(build_query_pci(1000))
+            sender = threading.Thread(target=b.sendall, args=(data,))
+            sender.start()
+            assert stream.read_reply("infrasim-1")["return"][0]["devices"][999]["slot"] == 999
+            assert stream.greeting == {"QMP": {}}
+            assert stream.events == [{"event": "STOP"}]
+            sender.join()
+            b.close()
+            assert stream.read_reply() is None
+        finally:
+            a.close()
+
+    def test_unix_socket_skips_events(self):
+        folder = tempfile.mkdtemp()
+        server = fixtures.FakeQMPServer(os.path.join(folder, ".monitor"))
+        s = helper.UnixSocket(os.path.join(folder, ".monitor"))
+        try:
+            s.connect()
+            assert "QMP" in json.loads(s.recv())
+            s.send(json.dumps({"execute": "qmp_capabilities"}))
+            assert json.loads(s.recv()) == {"return": {}}
+            s.send(json.dumps({"execute": "emit", "arguments": {"n": 1}}))
+            assert json.loads(s.recv()) == {"return": {"n": 1}}
+            assert s.stream.events == [{"event": "TEST", "data": {"n": 1}}]
+        finally:
+            s.close()
+            server.close()
+            os.rmdir(folder)
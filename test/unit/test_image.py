@@ -0,0 +1,80 @@
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+from infrasim import config, image
+
+
+class test_image_cache(unittest.TestCase):
+
+    def setUp(self):
+        self.home = config.infrasim_home
+        config.infrasim_home = tempfile.mkdtemp()
+        self.workspace = os.path.join(config.infrasim_home, "test")
+        os.mkdir(self.workspace)
+
+    def tearDown(self):
+        shutil.rmtree(config.infrasim_home)
+        config.infrasim_home = self.home
+
+    def __drive(self, index):
+        return os.path.join(self.workspace, "disk-sd{}.img".format(index))
+
+    def test_raw_drives_share_base(self):
+        for index in range(4):
+            image.create_drive_image(self.__drive(index), "raw", 8)
+        bases = [f for f in os.listdir(image.get_cache_folder()) if f.endswith(".img")]
+        assert bases == ["base-raw-8G-default-off.img"]
+        for index in range(4):
+            st = os.stat(self.__drive(index))
+            assert st.st_size == 8 << 30
+            # sparse, no data block is written
+            assert st.st_blocks == 0
+
+    def test_base_key(self):
+        a = image.get_base_image("raw", 1, cluster_size="64k")
+        b = image.get_base_image("raw", 1, cluster_size="2M")
+        assert a != b
+        assert image.get_base_image("raw", 1, cluster_size="64k") == a
+
+    def test_no_base_for_preallocated_without_reflink(self):
+        created = []
+        create_image = image.create_image
+        image.create_image = lambda path, *args: created.append(path) or open(path, "wb").close()
+        image._reflink_cache.clear()
+        reflink = image.helper.reflink
+        image.helper.reflink = lambda src, dst: False
+        try:
+            image.create_drive_image(self.__drive(0), "qcow2", 1, preallocation="full")
+        finally:
+            image.create_image = create_image
+            image.helper.reflink = reflink
+            image._reflink_cache.clear()
+        assert created == [self.__drive(0)]
+        assert [f for f in os.listdir(image.get_cache_folder()) if f.endswith(".img")] == []
+
+    def test_qcow2_info_from_header(self):
+        # a qcow2 base is made by qemu-img, put a header in cache instead
+        base = os.path.join(image.get_cache_folder(), "base-qcow2-2G-default-off.img")
+        os.makedirs(image.get_cache_folder())
+        with open(base, "wb") as f:
+            f.write(image.QCOW2_MAGIC + struct.pack(">IQII", 3, 0, 0, 16) + struct.pack(">Q", 2 << 30))
+            f.write("\0" * 4096)
+
+        image.create_drive_image(self.__drive(0), "qcow2", 2)
+        info = image.get_image_info(self.__drive(0), "qcow2")
+        assert info == {"format": "qcow2", "virtual-size": 2 << 30}
+
+    def test_info_cache_follows_mtime(self):
+        image.create_drive_image(self.__drive(0), "raw", 1)
+        assert image.get_image_info(self.__drive(0), "raw")["virtual-size"] == 1 << 30
+        with open(self.__drive(0), "r+b") as f:
+            f.truncate(2 << 30)
+        assert image.get_image_info(self.__drive(0), "raw")["virtual-size"] == 2 << 30
@@ -10,12 +10,17 @@ import yaml
 from infrasim.ipmiconsole import sdr
 from infrasim.ipmiconsole.command import Command_Handler
 from infrasim.ipmiconsole import common
+from infrasim.ipmiconsole import sel
+from infrasim.ipmiconsole.scheduler import SensorScheduler
+from infrasim.ipmiconsole.lan import IpmiLanSession
 from infrasim.model import CNode
 from infrasim.helper import yaml_load
 from infrasim import config
 from test import fixtures
 import unittest
 import shutil
+import socket
+import time
 import os
 
 ch = Command_Handler()
@@ -59,6 +64,378 @@ class test_ipmi_console(unittest.TestCase):
         assert "analog_sample : 8712.000 RPM" in common.msg_queue.get()
 
 
+class test_sdr_parser(unittest.TestCase):
+
+    EMU_FILE = "/tmp/test_sdr.emu"
+
+    def setUp(self):
+        shutil.copy(os.path.join(config.infrasim_data, "dell_r730/dell_r730.emu"), self.EMU_FILE)
+
+    def tearDown(self):
+        os.remove(self.EMU_FILE)
+        sdr._emu_cache.clear()
+
+    def test_parse_full_sensor_record(self):
+        records, values, _ = sdr.read_emu_sdrs(self.EMU_FILE)
+        fan = [r for r in records if r["name"] == "Fan1"][0]
+        assert fan["record_type"] == 0x01
+        assert (fan["mc"], fan["lun"], fan["num"]) == (0x20, 0, 0x30)
+        assert fan["sensor_type"] == 0x04
+        assert fan["event_type"] == 0x01
+        assert fan["rtm"] == 0x03
+        assert fan["su2"] == 18
+        assert fan["m_lb"] == 0x78
+        assert (fan["lnr"], fan["lc"], fan["lnc"]) == (0x00, 0x03, 0x05)
+        assert values[(0x20, 0, 0x30)] == 0x20
+
+    def test_parse_compact_sensor_record(self):
+        records, _, states = sdr.read_emu_sdrs(self.EMU_FILE)
+        intrusion = [r for r in records if r["name"] == "Intrusion"][0]
+        assert intrusion["record_type"] == 0x02
+        assert intrusion["num"] == 0x73
+        assert intrusion["event_type"] == 0x6f
+
+    def test_cached_by_mtime(self):
+        result = sdr.read_emu_sdrs(self.EMU_FILE)
+        assert sdr.read_emu_sdrs(self.EMU_FILE)[0] is result[0]
+        stat = os.stat(self.EMU_FILE)
+        os.utime(self.EMU_FILE, (stat.st_atime, stat.st_mtime + 10))
+        assert sdr.read_emu_sdrs(self.EMU_FILE)[0] is not result[0]
+
+    def test_build_sensors_from_emu(self):
+        count = len(sdr.sensor_list)
+        sdr.parse_sdrs(self.EMU_FILE)
+        assert len(sdr.sensor_list) - count == len(sdr.read_emu_sdrs(self.EMU_FILE)[0])
+        fan = sdr.sensor_name_map["Fan1"]
+        assert fan.get_value() == 0x20
+        assert fan.get_unit() == "RPM"
+        assert fan.get_lc() == 0x03
+
+
+class test_lan_session(unittest.TestCase):
+
+    def setUp(self):
+        readings = dict((num, "\x20\xc0\x00") for num in range(0x30, 0x30 + 200))
+        readings[0x10] = "\x00\xc0\x10\xca"
+        self.bmc = fixtures.FakeLanBmc(readings=readings)
+        self.port = common.env.VBMC_PORT
+        self.ip = common.env.VBMC_IP
+        common.env.VBMC_PORT = self.bmc.port
+        common.env.VBMC_IP = "127.0.0.1"
+        self.password_fetched = 0
+
+        def get_password(refresh=False):
+            self.password_fetched += 1
+            return "admin"
+        sdr.get_vbmc_password = get_password
+
+    def tearDown(self):
+        sdr.get_vbmc_password = common.get_vbmc_password
+        if sdr.lan_session:
+            sdr.lan_session.close()
+            sdr.lan_session = None
+        common.env.VBMC_PORT = self.port
+        common.env.VBMC_IP = self.ip
+        self.bmc.close()
+
+    def test_readings(self):
+        session = IpmiLanSession("127.0.0.1", self.bmc.port, "admin", "admin")
+        session.open()
+        assert session.is_active()
+        assert session.get_sensor_readings([(0x30, 0, "threshold"),
+                                            (0x10, 0, "discrete"),
+                                            (0x11, 0, "discrete")]) == [0x20, "0x10ca", None]
+        session.close()
+        assert self.bmc.sessions == set()
+
+    def test_owner_lun_with_channel(self):
+        # MTT CPU1 of s2600kp is owned by LUN 0 on channel 6, 0x60
+        records, values, _ = sdr.read_emu_sdrs(os.path.join(config.infrasim_data, "s2600kp/s2600kp.emu"))
+        record = [r for r in records if r["name"] == "MTT CPU1"][0]
+        assert (record["mc"], record["lun"], record["num"]) == (0x2c, 0, 0x34)
+        assert (0x2c, 0, 0x34) in values
+
+        self.bmc.readings[0x34] = "\x20\xc0\x00"
+        session = IpmiLanSession("127.0.0.1", self.bmc.port, "admin", "admin")
+        session.open()
+        try:
+            assert session.get_sensor_readings([(0x34, 0x60, "threshold")]) == [0x20]
+        finally:
+            session.close()
+        # netFn sensor/event 0x04, LUN 0
+        assert self.bmc.reading_netfn_luns == [0x04 << 2]
+
+        sensor = sdr.build_sensors(name="owner_lun", ID=0x34, mc=0x2c, value=0, tp=0x01)
+        sensor.set_lun(0x60)
+        assert sensor.get_lun() == 0
+
+    def test_wrong_password(self):
+        session = IpmiLanSession("127.0.0.1", self.bmc.port, "admin", "root", timeout=0.2)
+        with self.assertRaises(common.IpmiError):
+            session.open()
+        assert not session.is_active()
+
+    def test_batch_in_one_session(self):
+        sensors = [(num, 0, "threshold") for num in range(0x30, 0x30 + 200)]
+        assert sdr.read_sensor_raw_values(sensors) == [0x20] * 200
+        assert sdr.read_sensor_raw_values(sensors[:10]) == [0x20] * 10
+        assert self.bmc.opened == 1
+        assert self.password_fetched == 1
+
+    def test_session_timed_out(self):
+        sdr.read_sensor_raw_values([(0x30, 0, "threshold")])
+        self.bmc.sessions.clear()
+        sdr.lan_session._IpmiLanSession__timeout = 0.2
+        assert sdr.read_sensor_raw_values([(0x30, 0, "threshold")]) == [0x20]
+        assert self.bmc.opened == 2
+
+    def test_refresh_sensors(self):
+        sensor = sdr.build_sensors(name="discrete_refresh", ID=0x10, mc=0x20, value="0x0000", tp=0x00)
+        sensor.set_event_type(0x6f)
+        sensor.set_lun(0)
+        ch.get_sensor_value(["0x10"])
+        assert "0x10ca" in common.msg_queue.get()
+
+
+class test_sensor_scheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.batches = []
+        self.scheduler = SensorScheduler(tick=0.05, send=self.batches.append)
+        self.sensors = []
+        for i in range(20):
+            sensor = sdr.build_sensors(name="fan_{}".format(i), ID=0x40 + i,
+                                       mc=0x20, value=0x10, tp=0x04)
+            sensor.set_event_type(0x01)
+            sensor.set_mc(0x20)
+            sensor.set_lun(0)
+            sensor.set_m_lb(1)
+            sensor.set_m_ub(0)
+            sensor.set_b_lb(0)
+            sensor.set_b_ub(0)
+            sensor.set_exp(0)
+            sensor.set_rtm(0x3f)
+            sensor.set_su1(0)
+            sensor.set_su2(0)
+            sensor.set_lnr(0x05)
+            sensor.set_lc(0x10)
+            sensor.set_lnc(0x20)
+            sensor.set_unc(0xa0)
+            sensor.set_uc(0xb0)
+            sensor.set_unr(0xc0)
+            self.scheduler.add(sensor)
+            self.sensors.append(sensor)
+        self.scheduler.start()
+
+    def tearDown(self):
+        self.scheduler.stop()
+
+    def test_user_mode_sensor_is_idle(self):
+        time.sleep(0.2)
+        assert self.batches == []
+
+    def test_auto_mode_batched_per_tick(self):
+        for sensor in self.sensors:
+            sensor.set_interval(0.3)
+            sensor.set_mode("auto")
+        time.sleep(0.5)
+        for sensor in self.sensors:
+            sensor.set_mode("user")
+        # updated twice, all sensors in one or a few batches each round
+        commands = sum(self.batches, [])
+        assert len(commands) == 40
+        assert len(self.batches) < 10
+        for sensor in self.sensors:
+            assert 0x20 < sensor.get_value() < 0xa0
+        assert "sensor_set_value 0x20 0x0 0x40 " in commands[0]
+
+    def test_interval_shortened(self):
+        self.sensors[3].set_interval(60)
+        self.sensors[3].set_mode("auto")
+        time.sleep(0.2)
+        assert len(self.batches) == 1
+        # next update is not left at 60s
+        self.sensors[3].set_interval(0.1)
+        time.sleep(0.3)
+        self.sensors[3].set_mode("user")
+        assert len(self.batches) >= 2
+
+    def test_fault_mode_once(self):
+        self.sensors[3].set_fault_level("uc")
+        self.sensors[3].set_mode("fault")
+        time.sleep(0.2)
+        assert len(self.batches) == 1
+        assert self.sensors[3].get_mode() == "user"
+        assert 0xb0 <= self.sensors[3].get_value() < 0xc0
+
+    def test_output_sensors_until_unknown(self):
+        batches = []
+        read_sensor_raw_values = sdr.read_sensor_raw_values
+        sdr.read_sensor_raw_values = lambda keys: batches.append(keys) or [None] * len(keys)
+        try:
+            ch.output_sensors(["0x41", "0x42", "0x7f", "0x43"])
+        finally:
+            sdr.read_sensor_raw_values = read_sensor_raw_values
+        assert [key[0] for key in batches[0]] == [0x41, 0x42]
+        assert "fan_1" in common.msg_queue.get()
+        assert "fan_2" in common.msg_queue.get()
+        assert common.msg_queue.get() == "sensor: 0x7f not exist\n"
+        assert common.msg_queue.empty()
+
+    def test_output_sensors_illegal_id_reported_once(self):
+        errors = []
+        read_sensor_raw_values = sdr.read_sensor_raw_values
+        sdr.read_sensor_raw_values = lambda keys: [None] * len(keys)
+        common.logger.error = errors.append
+        try:
+            ch.output_sensors(["0x41", "fan"])
+        finally:
+            sdr.read_sensor_raw_values = read_sensor_raw_values
+            del common.logger.error
+        assert errors == ["illegal sensor id fan"]
+        assert "fan_1" in common.msg_queue.get()
+        assert common.msg_queue.empty()
+
+    def test_console_command(self):
+        ch.handle_command("sensor interval set 0x45 2.5")
+        assert "fan_5 update interval: 2.5s" in common.msg_queue.get()
+        assert self.sensors[5].get_interval() == 2.5
+        ch.handle_command("sensor mode set 0x45 auto")
+        assert "changed to auto" in common.msg_queue.get()
+        time.sleep(0.2)
+        assert len(self.batches) == 1
+        ch.handle_command("sensor value set 0x45 48")
+        assert self.sensors[5].get_mode() == "user"
+        assert self.sensors[5].get_value() == 0x30
+
+
+class test_vbmc_channel(unittest.TestCase):
+
+    def setUp(self):
+        self.console = fixtures.FakeLanservConsole()
+        self.channel = common.VbmcChannel(port=self.console.port)
+
+    def tearDown(self):
+        self.channel.close()
+        self.console.close()
+
+    def test_responses_matched_by_prompt(self):
+        rsp = self.channel.execute(["get_user_password 0x20 admin\n"])
+        assert rsp == ["> get_user_password 0x20 admin\r\nnimda 02x0 drowssap_resu_teg\r\n> "]
+
+    def test_batch_in_one_session(self):
+        cmds = ["sensor_set_value 0x20 0 0x{:x} 0x10 0x01".format(i) for i in range(50)]
+        rsp = self.channel.execute(cmds)
+        assert len(rsp) == 50
+        for cmd, r in zip(cmds, rsp):
+            assert r.split("\r\n")[1] == cmd[::-1]
+        self.channel.execute(cmds[:1])
+        assert self.console.connections == 1
+        assert self.console.commands == cmds + cmds[:1]
+
+    def test_reconnect_broken_session(self):
+        self.channel.execute(["a"])
+        self.channel._VbmcChannel__tn.sock.shutdown(socket.SHUT_RDWR)
+        assert self.channel.execute(["b"]) == ["> b\r\nb\r\n> "]
+        assert self.console.connections == 2
+
+    def test_retry_unanswered_only(self):
+        self.channel.execute(["a"])
+        self.console.drop_after = 3
+        rsp = self.channel.execute(["b", "c", "d", "e"])
+        assert [r.split("\r\n")[1] for r in rsp] == ["b", "c", "d", "e"]
+        assert self.console.commands == ["a", "b", "c", "d", "e"]
+        assert self.console.connections == 2
+
+    def test_partial_responses(self):
+        self.console.drop_after = 2
+        rsp = self.channel.execute(["a", "b", "c"])
+        assert rsp[:2] == ["> a\r\na\r\n> ", "> b\r\nb\r\n> "]
+        assert rsp[2] == ""
+        assert self.console.commands == ["a", "b"]
+
+    def test_no_console(self):
+        self.console.close()
+        channel = common.VbmcChannel(port=self.console.port, timeout=1)
+        with self.assertRaises(socket.error):
+            channel.execute(["a"])
+
+
+class test_sel_burst(unittest.TestCase):
+
+    def setUp(self):
+        self.batches = []
+        self.record = sel.OEM_SEL_E0_FF()
+        self.record.set_record_type(0xe0)
+        self.record.set_oem_defined_bytes(range(13))
+
+    def send(self, commands):
+        self.batches.append(commands)
+        return ["> {}\r\nAdded at 0x1\r\n> ".format(cmd.strip()) for cmd in commands]
+
+    def test_commands_in_batches(self):
+        result = sel.SELBurst(self.record, 120, batch=50, send=self.send).run()
+        assert [len(b) for b in self.batches] == [50, 50, 20]
+        assert self.batches[0][0] == "sel_add 0x20 0xe0 " + " ".join(hex(x) for x in range(13)) + "\n"
+        assert result["sent"] == 120
+        assert result["added"] == 120
+        assert result["lost"] == 0
+        assert result["sel_full"] is False
+
+    def test_rate(self):
+        start = time.time()
+        result = sel.SELBurst(self.record, 50, rate=100, send=self.send).run()
+        assert 0.4 < time.time() - start < 1.0
+        assert len(self.batches) == 5
+        assert result["rate"] < 130
+
+    def test_lost_and_sel_full(self):
+        responses = ["> a\r\nAdded at 0x1\r\n> ",
+                     "",
+                     "> a\r\nUnable to add to sel: 0x16\r\n> ",
+                     "> a\r\nUnable to add to sel: 0xb\r\n> "]
+
+        def send(commands):
+            self.batches.append(commands)
+            return responses[:len(commands)]
+
+        result = sel.SELBurst(self.record, 10, batch=4, send=send).run()
+        assert len(self.batches) == 1
+        assert result["added"] == 1
+        assert result["lost"] == 3
+        assert result["unsent"] == 6
+        assert result["sel_full"] is True
+
+    def test_sel_add_error(self):
+        assert sel.get_sel_add_error("> sel_add 0x20 0xe0\r\n\r\n> ") == 0
+        assert sel.get_sel_add_error("") == -1
+        assert sel.get_sel_add_error("Unable to add to sel: 28") == 28
+
+    def test_console_command(self):
+        console = fixtures.FakeLanservConsole()
+        channels = common.vbmc_channels
+        common.vbmc_channels = common.VbmcChannel(port=console.port)
+        try:
+            sensor = sdr.build_sensors(name="psu_status", ID=0x70, mc=0x20, value="0x0000", tp=0x08)
+            sensor.set_event_type(0x6f)
+            sensor.set_mc(0x20)
+            sensor.set_lun(0)
+            sensor.initialize_sel()
+            ch.handle_command("sel burst 0x70 1 assert 30 1000")
+            assert "30/30 entries added" in common.msg_queue.get()
+            assert console.commands == ["sel_add 0x20 0x2 0x0 0x0 0x0 0x0 0x20 0x0 0x4 "
+                                        "0x8 0x70 0x6f 0x1 0x0 0x0"] * 30
+
+            ch.handle_command("sel burst oem 0xc0 1 2 3 4 5 6 5")
+            assert "5/5 entries added" in common.msg_queue.get()
+            assert console.commands[-1] == "sel_add 0x20 0xc0 0x0 0x0 0x0 0x0 0x0 0x0 0x0 " \
+                "0x1 0x2 0x3 0x4 0x5 0x6"
+        finally:
+            common.vbmc_channels.close()
+            common.vbmc_channels = channels
+            console.close()
+
+
 class test_ipmi_console_default_env(unittest.TestCase):
 
     TMP_CONF_FILE = "/tmp/test.yml"
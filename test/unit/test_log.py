@@ -0,0 +1,127 @@
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+
+import gzip
+import logging
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from infrasim import log
+from infrasim.log import LoggerList, LoggerType, log_writer
+
+
+class test_log(unittest.TestCase):
+
+    def setUp(self):
+        self.logdir = tempfile.mkdtemp()
+        self.old_logdir = log.infrasim_logdir
+        log.infrasim_logdir = self.logdir
+        self.logger_list = LoggerList(100)
+        self.logger_list.init("node_log")
+
+    def tearDown(self):
+        self.logger_list.del_logger_list()
+        log_writer.close_handler(os.path.join(self.logdir, "infrasim.log"))
+        log.infrasim_logdir = self.old_logdir
+        shutil.rmtree(self.logdir)
+
+    def read(self, name):
+        log_writer.flush()
+        with open(os.path.join(self.logdir, "node_log", name), "r") as f:
+            return f.read().splitlines()
+
+    def test_shared_handler_per_file(self):
+        model = self.logger_list.get_logger(LoggerType.model.value)
+        qemu = self.logger_list.get_logger(LoggerType.qemu.value)
+        path = os.path.join(self.logdir, "node_log", "runtime.log")
+        assert model.handlers[0]._QueueHandler__handler is log_writer.get_handler(path)
+        assert qemu.handlers[0]._QueueHandler__handler is log_writer.get_handler(path)
+
+        model.info("model %s", "started")
+        qemu.warning("qemu %d", 1)
+        lines = self.read("runtime.log")
+        assert len(lines) == 2
+        assert " - Model - test_log.py:" in lines[0]
+        assert lines[0].endswith(" - INFO - model started")
+        assert " - Qemu - " in lines[1]
+        assert lines[1].endswith(" - WARNING - qemu 1")
+
+    def test_args_rendered_by_caller(self):
+        logger = self.logger_list.get_logger(LoggerType.monitor.value)
+        payload = {"state": "running"}
+        logger.info("%s", payload)
+        payload["state"] = "paused"
+        assert self.read("monitor.log")[0].endswith("{'state': 'running'}")
+
+    def test_exception_traceback(self):
+        logger = self.logger_list.get_logger(LoggerType.config.value)
+        try:
+            raise ValueError("bad config")
+        except ValueError:
+            logger.error("fails to load", exc_info=True)
+        lines = self.read("static.log")
+        assert lines[0].endswith("fails to load")
+        assert lines[-1] == "ValueError: bad config"
+
+    def test_debug_filtered(self):
+        logger = self.logger_list.get_logger(LoggerType.racadm.value)
+        assert logger.isEnabledFor(logging.INFO)
+        assert not logger.isEnabledFor(logging.DEBUG)
+        logger.debug("hidden")
+        logger.info("shown")
+        assert len(self.read("racadm.log")) == 1
+
+    def test_rollover_compressed(self):
+        path = os.path.join(self.logdir, "node_log", "rotate.log")
+        handler = log.CompressedRotatingFileHandler(path, maxBytes=1024, backupCount=3)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        for i in range(100):
+            handler.emit(logging.makeLogRecord({"msg": "line {:02d} {}".format(i, "x" * 40)}))
+        handler.close()
+
+        assert not os.path.exists(path + ".1")
+        rotated = []
+        for i in (3, 2, 1):
+            with gzip.open("{}.{}.gz".format(path, i), "rb") as f:
+                rotated += f.read().splitlines()
+        with open(path, "r") as f:
+            current = f.read().splitlines()
+        assert rotated + current == ["line {:02d} {}".format(i, "x" * 40)
+                                     for i in range(100 - len(rotated) - len(current), 100)]
+
+    def test_fork_while_handler_held(self):
+        logger = self.logger_list.get_logger(LoggerType.model.value)
+        logger.info("parent")
+        log_writer.flush()
+
+        # the writer of parent is in the middle of a record at fork
+        handler = log_writer.get_handler(os.path.join(self.logdir, "node_log", "runtime.log"))
+        handler.acquire()
+        try:
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    logger.info("child")
+                    os._exit(0 if log_writer.flush() else 1)
+                except Exception:
+                    os._exit(2)
+        finally:
+            handler.release()
+
+        deadline = time.time() + 10
+        while True:
+            _, status = os.waitpid(pid, os.WNOHANG)
+            if _ == pid or time.time() > deadline:
+                break
+            time.sleep(0.05)
+        if _ != pid:
+            os.kill(pid, 9)
+            os.waitpid(pid, 0)
+            self.fail("child hangs in log flush")
+        assert os.WEXITSTATUS(status) == 0
+        assert self.read("runtime.log")[-1].endswith(" - INFO - child")
@@ -0,0 +1,97 @@
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+from infrasim import config, materialize
+from infrasim.workspace import Workspace
+from test import fixtures
+
+
+class test_materialize(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.src = os.path.join(self.folder, "src.bin")
+        with open(self.src, "wb") as f:
+            f.write("\x00\x01" * 4096)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_write_unchanged_skipped(self):
+        dst = os.path.join(self.folder, "vbmc.conf")
+        before = materialize.get_stats()
+        assert materialize.write_file(dst, u"name: vbmc\n") is True
+        inode = os.stat(dst).st_ino
+        assert materialize.write_file(dst, "name: vbmc\n") is False
+        assert os.stat(dst).st_ino == inode
+        assert materialize.write_file(dst, "name: vbmc1\n", stat.S_IRWXU) is True
+        assert stat.S_IMODE(os.stat(dst).st_mode) == stat.S_IRWXU
+        after = materialize.get_stats()
+        assert after["written"] - before["written"] == 2
+        assert after["skipped"] - before["skipped"] == 1
+        assert not os.path.exists(dst + ".tmp")
+
+    def test_link_data_file(self):
+        dst = os.path.join(self.folder, "dst.bin")
+        assert materialize.copy_file(self.src, dst, link=True) is True
+        assert os.path.samefile(self.src, dst)
+        assert materialize.copy_file(self.src, dst, link=True) is False
+
+        # a linked file is replaced, the data file is kept
+        materialize.write_file(dst, "changed")
+        with open(self.src, "rb") as f:
+            assert f.read() == "\x00\x01" * 4096
+
+    def test_copy_same_content_skipped(self):
+        dst = os.path.join(self.folder, "dst.bin")
+        shutil.copy(self.src, dst)
+        inode = os.stat(dst).st_ino
+        assert materialize.copy_file(self.src, dst) is False
+        assert os.stat(dst).st_ino == inode
+        with open(dst, "ab") as f:
+            f.write("\x02")
+        assert materialize.copy_file(self.src, dst) is True
+        assert not os.path.samefile(self.src, dst)
+        assert materialize.get_digest(dst) == materialize.get_digest(self.src)
+
+    def test_template_compiled_once(self):
+        env = materialize.get_template_env()
+        assert env.get_template("startcmd") is env.get_template("startcmd")
+        assert "/tmp/infrasim.yml" in materialize.render_template("startcmd", yml_file="/tmp/infrasim.yml")
+
+
+class test_workspace_materialize(unittest.TestCase):
+
+    def setUp(self):
+        self.home = config.infrasim_home
+        config.infrasim_home = tempfile.mkdtemp()
+        self.node_info = fixtures.FakeConfig().get_node_info()
+
+    def tearDown(self):
+        shutil.rmtree(config.infrasim_home)
+        config.infrasim_home = self.home
+
+    def test_init_again_unchanged(self):
+        Workspace(self.node_info).init()
+        workspace = os.path.join(config.infrasim_home, self.node_info["name"])
+        emu = os.path.join(workspace, "data", "{}.emu".format(self.node_info["type"]))
+        data = os.path.join(config.infrasim_data, self.node_info["type"],
+                            "{}.emu".format(self.node_info["type"]))
+        if os.stat(config.infrasim_home).st_dev == os.stat(data).st_dev:
+            assert os.path.samefile(emu, data)
+        assert materialize.get_digest(emu) == materialize.get_digest(data)
+
+        before = materialize.get_stats()
+        Workspace(self.node_info).init()
+        after = materialize.get_stats()
+        assert after["written"] == before["written"]
+        assert after["linked"] == before["linked"]
+        assert after["skipped"] > before["skipped"]
@@ -1956,3 +1956,55 @@ class numa_configuration_2(unittest.TestCase):
             self.numactl.get_cpu_list(4)
         except Exception as e:
             assert str(e) == "All sockets don't have enough processor to bind."
+
+
+class compute_commandline(unittest.TestCase):
+
+    def setUp(self):
+        self.ws = "/tmp/test_compute_commandline"
+        os.makedirs(os.path.join(self.ws, "data"))
+        self.compute_info = fixtures.FakeConfig().get_node_info()["compute"]
+        self.compute_info["storage_backend"] = [{
+            "type": "megasas",
+            "max_drive_per_controller": 16,
+            "drives": [{"size": 1, "format": "raw", "file": os.path.join(self.ws, "sd{}.img".format(i))}
+                       for i in range(16)]
+        }]
+        self.compute = model.CCompute(self.compute_info)
+        self.compute.set_type("dell_r730")
+        self.compute.set_workspace(self.ws)
+        self.compute.set_task_name("test-node")
+        self.compute.init()
+
+    def tearDown(self):
+        shutil.rmtree(self.ws)
+
+    def __qemu_args(self):
+        self.compute.get_commandline()
+        with open(os.path.join(self.ws, "data", "qemu_args.txt")) as f:
+            return f.read()
+
+    def test_render_once(self):
+        args = self.__qemu_args()
+        assert args.count("-device scsi-hd") == 16
+        assert self.__qemu_args() == args
+
+    def test_render_again_on_change(self):
+        args = self.__qemu_args()
+        self.compute_info["memory"]["size"] = 8192
+        assert self.__qemu_args() == args.replace("-m 4096", "-m 8192")
+
+        with open(os.path.join(self.ws, "bootdev"), "w") as f:
+            f.write("cdrom\n")
+        assert "order=d" in self.__qemu_args()
+
+    def test_duplicated_option(self):
+        element = model.CElement()
+        element.add_option("-m 4096")
+        element.add_option("-smp 2")
+        element.add_option("-m 4096")
+        element.add_option("-name test", pos=0)
+        assert element.get_option() == "-name test -m 4096 -smp 2"
+        element.clear_option()
+        element.add_option("-m 4096")
+        assert element.get_option() == "-m 4096"
@@ -0,0 +1,117 @@
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+
+import logging
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from infrasim import config, InfraSimError
+from infrasim.model.elements.qemu_monitor import CQemuMonitor
+from infrasim.monitor import qemu_api
+from test import fixtures
+
+
+class test_qmp_session(unittest.TestCase):
+
+    def setUp(self):
+        self.home = config.infrasim_home
+        config.infrasim_home = tempfile.mkdtemp()
+        os.mkdir(os.path.join(config.infrasim_home, "test"))
+        self.server = fixtures.FakeQMPServer(os.path.join(config.infrasim_home, "test", ".monitor"))
+
+    def tearDown(self):
+        qemu_api.close_all()
+        self.server.close()
+        shutil.rmtree(config.infrasim_home)
+        config.infrasim_home = self.home
+
+    def test_session_is_shared(self):
+        qm = qemu_api.get_qemu_monitor("test")
+        assert qm.greeting["QMP"]["capabilities"] == []
+        assert qm.execute({"execute": "query-status", "arguments": {"n": 1}}) == {"return": {"n": 1}}
+        assert qemu_api.get_qemu_monitor("test") is qm
+        assert qm.execute({"execute": "query-status", "arguments": {"n": 2}}) == {"return": {"n": 2}}
+        assert self.server.connections == 1
+        assert self.server.commands[0]["execute"] == "qmp_capabilities"
+
+    def test_responses_out_of_order(self):
+        qm = qemu_api.get_qemu_monitor("test")
+        results = {}
+
+        def request(n):
+            cmd = {"execute": "echo", "arguments": {"n": n, "delay": (8 - n) * 0.02}, "id": n}
+            results[n] = qm.execute(cmd)
+
+        threads = [threading.Thread(target=request, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for n in range(8):
+            # id of caller is given back
+            assert results[n] == {"return": {"n": n, "delay": (8 - n) * 0.02}, "id": n}
+
+    def test_events_are_buffered(self):
+        qm = qemu_api.get_qemu_monitor("test")
+        qm.execute({"execute": "emit", "arguments": {"n": 1}})
+        qm.execute({"execute": "emit", "arguments": {"n": 2}})
+        assert [e["data"]["n"] for e in qm.get_events()] == [1, 2]
+        assert qm.get_events() == []
+
+    def test_error_without_id(self):
+        qm = qemu_api.get_qemu_monitor("test")
+        assert "error" in qm.execute({"error": "error"})
+
+    def test_reconnect(self):
+        qm = qemu_api.get_qemu_monitor("test")
+        qm.close()
+        assert qemu_api.get_qemu_monitor("test") is qm
+        assert qm.execute({"execute": "query-status"}) == {"return": {}}
+        assert qm.is_connected()
+        assert self.server.connections == 2
+
+    def test_idle_session_closed(self):
+        qm = qemu_api.get_qemu_monitor("test")
+        qm.idle_timeout = 0.1
+        qm.execute({"execute": "query-status", "arguments": {"delay": 0.2}})
+        assert self.server.clients == 1
+        time.sleep(0.5)
+        assert not qm.is_connected()
+        assert self.server.clients == 0
+        assert qm.execute({"execute": "query-status"}) == {"return": {}}
+        assert self.server.connections == 2
+
+    def test_no_monitor(self):
+        assert qemu_api.get_qemu_monitor("absent") is None
+
+
+class test_qemu_monitor_timeout(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, ".monitor")
+        # a QMP chardev taken by another client: connections are queued
+        # but get no greeting
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(self.path)
+        self.sock.listen(1)
+
+    def tearDown(self):
+        self.sock.close()
+        shutil.rmtree(self.folder)
+
+    def test_open_timeout(self):
+        monitor = CQemuMonitor({"mode": "control", "chardev": {"path": self.path}})
+        monitor.logger = logging.getLogger("test")
+        monitor.init()
+        start = time.time()
+        with self.assertRaises(InfraSimError):
+            monitor.open(timeout=0.2)
+        assert time.time() - start < 2
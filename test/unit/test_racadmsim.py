@@ -0,0 +1,94 @@
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+
+import os
+import shutil
+import tempfile
+import unittest
+import yaml
+from infrasim import config
+from infrasim.racadmsim import api, env
+from test import fixtures
+
+
+class test_racadmsim(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.old_home = config.infrasim_home
+        self.old_data = env.racadm_data
+        self.old_node_name = env.node_name
+        config.infrasim_home = os.path.join(self.folder, "home")
+        env.node_name = "test"
+        env.racadm_data = os.path.join(self.folder, "data")
+        os.makedirs(env.racadm_data)
+        os.makedirs(os.path.join(config.infrasim_home, "test", "etc"))
+
+        self.node_info = fixtures.FakeConfig().get_node_info()
+        self.node_info["compute"]["storage_backend"] = [
+            {"type": "ahci", "drives": [{"size": 40, "model": "SATADOM"}]},
+            {"type": "megasas", "drives": [{"size": 8, "slot_number": 0,
+                                            "vendor": "SEAGATE", "serial": "A0"}]}
+        ]
+        self.save_node_info()
+        self.write_data("getled", "LED State : Blinking\nLED Timeout : 0\n")
+        self.write_data("hwinventory", "[Storage]\n{{ storage }}\n[End]\n")
+        self.console = api.RacadmConsole()
+
+    def tearDown(self):
+        config.infrasim_home = self.old_home
+        env.racadm_data = self.old_data
+        env.node_name = self.old_node_name
+        shutil.rmtree(self.folder)
+
+    def save_node_info(self):
+        path = os.path.join(config.infrasim_home, "test", "etc", "infrasim.yml")
+        with open(path, "w") as fp:
+            yaml.dump(self.node_info, fp, default_flow_style=False)
+
+    def write_data(self, name, content):
+        with open(os.path.join(env.racadm_data, name), "w") as fp:
+            fp.write(content)
+
+    def call(self, cmd):
+        # call the command as do() does, with the response as it's kept
+        return self.console.commands[cmd[0]](self.console, None, cmd)
+
+    def test_fake_data_reloaded_once_changed(self):
+        api.preload()
+        assert api.fake_data("getled") == os.linesep.join(["LED State : Blinking", "LED Timeout : 0"])
+        assert api.fake_data("getsysinfo") is None
+
+        self.write_data("getled", "LED State : Lit\n")
+        self.write_data("getsysinfo", "System Model = PowerEdge R730\n")
+        assert api.fake_data("getled") == "LED State : Lit"
+        assert api.fake_data("getsysinfo") == "System Model = PowerEdge R730"
+
+        os.remove(os.path.join(env.racadm_data, "getled"))
+        assert api.fake_data("getled") is None
+
+    def test_storage_rendered_once(self):
+        cmd = ["storage", "get", "pdisks", "-o"]
+        rsp = self.call(cmd)
+        assert "Disk.Bay.0:Enclosure.Internal.0-1:NonRAID.Integrated.1-1" in rsp
+        assert "SEAGATE" in rsp
+        assert self.call(cmd) is rsp
+
+        self.node_info["compute"]["storage_backend"][1]["drives"][0]["vendor"] = "HITACHI"
+        self.save_node_info()
+        rsp = self.call(cmd)
+        assert "HITACHI" in rsp
+        assert "SEAGATE" not in rsp
+
+    def test_hwinventory_follows_fake_data(self):
+        rsp = self.call(["hwinventory"])
+        assert rsp.startswith("[Storage]")
+        assert "SATADOM" in rsp
+        assert self.call(["hwinventory"]) is rsp
+
+        self.write_data("hwinventory", "[Inventory]\n{{ storage }}\n[End]\n")
+        rsp = self.call(["hwinventory"])
+        assert rsp.startswith("[Inventory]")
@@ -0,0 +1,90 @@
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+
+import time
+import unittest
+from infrasim import ArgsNotCorrect, CommandRunFailed
+from infrasim.model.core.task import Task
+from infrasim.model.core.scheduler import TaskScheduler
+
+
+class FakeTask(Task):
+
+    def __init__(self, name, priority, duration=0.2, fail=False):
+        super(FakeTask, self).__init__()
+        self.set_task_name(name)
+        self.set_priority(priority)
+        self.duration = duration
+        self.fail = fail
+        self.started = None
+        self.finished = None
+        self.running = False
+        self.waited = False
+
+    def run(self):
+        if self.running:
+            return False
+        self.started = time.time()
+        time.sleep(self.duration)
+        self.finished = time.time()
+        if self.fail:
+            raise CommandRunFailed(self.get_task_name(), "")
+
+    def wait_ready(self, timeout=15):
+        self.waited = True
+        return True
+
+
+class test_task_scheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.socat = FakeTask("socat", 0)
+        self.bmc = FakeTask("bmc", 1)
+        self.compute = FakeTask("node", 2)
+        self.monitor = FakeTask("monitor", 4)
+        self.compute.add_dependency(self.socat)
+        self.compute.add_dependency(self.bmc)
+        self.monitor.add_dependency(self.compute)
+        self.tasks = [self.monitor, self.compute, self.bmc, self.socat]
+
+    def test_sort_by_dependency(self):
+        ordered = TaskScheduler(self.tasks).sort()
+        assert ordered == [self.socat, self.bmc, self.compute, self.monitor]
+
+    def test_independent_tasks_start_together(self):
+        scheduler = TaskScheduler(self.tasks)
+        elapsed = scheduler.run()
+        assert set(elapsed.keys()) == set(["socat", "bmc", "node", "monitor"])
+        assert abs(self.socat.started - self.bmc.started) < 0.1
+        assert self.compute.started >= max(self.socat.finished, self.bmc.finished)
+        assert self.monitor.started >= self.compute.finished
+        # three levels instead of four serial tasks
+        assert scheduler.get_total() < 4 * 0.2
+
+    def test_dependency_not_scheduled_is_ignored(self):
+        TaskScheduler([self.compute, self.bmc]).run()
+        assert self.socat.started is None
+        assert self.compute.started >= self.bmc.finished
+
+    def test_dependency_loop(self):
+        self.socat.add_dependency(self.monitor)
+        with self.assertRaises(ArgsNotCorrect):
+            TaskScheduler(self.tasks).sort()
+
+    def test_failure_skips_dependents(self):
+        self.bmc.fail = True
+        with self.assertRaises(CommandRunFailed):
+            TaskScheduler(self.tasks).run()
+        assert self.socat.finished is not None
+        assert self.compute.started is None
+        assert self.monitor.started is None
+
+    def test_running_task_not_waited(self):
+        self.bmc.running = True
+        TaskScheduler(self.tasks).run()
+        assert self.bmc.started is None
+        assert not self.bmc.waited
+        assert self.compute.waited
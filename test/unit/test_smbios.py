@@ -0,0 +1,67 @@
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+
+import glob
+import os
+import shutil
+import tempfile
+import unittest
+from infrasim import config
+from infrasim.chassis.smbios import SMBios
+
+
+class test_smbios(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "smbios.bin")
+        shutil.copy(os.path.join(config.infrasim_data, "dell_r730", "dell_r730_smbios.bin"), self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_decode_bundled(self):
+        for path in glob.glob(os.path.join(config.infrasim_data, "*", "*_smbios.bin")):
+            bios = SMBios(path)
+            assert len(bios.get_structures(SMBios.TYPE_SystemInformation)) == 1, path
+            assert bios.get_structures(SMBios.TYPE_ProcessorInformation), path
+
+    def test_modify(self):
+        bios = SMBios(self.path)
+        bios.ModifyData({"type1": {"sn": "SN-TEST-0001"}, "type3": {"sn": "CHASSIS-0001"}})
+        assert bios.save(self.path) is True
+
+        bios = SMBios(self.path)
+        assert "SN-TEST-0001" in bios.get_structures(SMBios.TYPE_SystemInformation)[0]
+        assert "CHASSIS-0001" in bios.get_structures(SMBios.TYPE_ChassisInformation)[0]
+
+    def test_save_skips_same_content(self):
+        bios = SMBios(self.path)
+        bios.ModifyData({"type1": {"sn": "SN-TEST-0001"}})
+        assert bios.save(self.path) is True
+        mtime = os.stat(self.path).st_mtime
+
+        bios = SMBios(self.path)
+        bios.ModifyData({"type1": {"sn": "SN-TEST-0001"}})
+        assert bios.save(self.path) is False
+        assert os.stat(self.path).st_mtime == mtime
+
+        # another destination with the same content
+        copy = os.path.join(self.folder, "copy.bin")
+        shutil.copy(self.path, copy)
+        assert bios.save(copy) is False
+        os.remove(copy)
+        assert bios.save(copy) is True
+
+    def test_not_terminated(self):
+        with open(self.path, "r+b") as f:
+            data = f.read()
+            f.seek(0)
+            f.truncate()
+            # last structure loses its double NUL
+            f.write(data[:-2])
+        with self.assertRaises(Exception):
+            SMBios(self.path)
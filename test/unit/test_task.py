@@ -0,0 +1,126 @@
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from infrasim import CommandRunFailed, config
+from infrasim.model.core.runtime import NodeRuntime
+from infrasim.model.core.task import Task
+
+
+class FakeTask(Task):
+
+    def __init__(self, workspace, cmdline, ready_file=None):
+        super(FakeTask, self).__init__()
+        self.set_task_name("fake")
+        self.set_workspace(workspace)
+        self.cmdline = cmdline
+        self.ready_file = ready_file
+        self.checking_time = 3
+
+    def get_commandline(self):
+        return self.cmdline
+
+    def probe_ready(self):
+        if self.ready_file is None:
+            return None
+        return os.path.exists(self.ready_file)
+
+
+class test_task_readiness(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.workspace)
+
+    def test_run_returns_once_ready(self):
+        ready_file = os.path.join(self.workspace, "ready")
+        task = FakeTask(self.workspace,
+                        "sh -c 'sleep 0.2; touch {}; sleep 10'".format(ready_file),
+                        ready_file)
+        start = time.time()
+        task.run()
+        assert time.time() - start < task.checking_time
+        assert task.task_is_running()
+        assert task.wait_ready(1) is True
+        task.terminate()
+        assert not task.task_is_running()
+
+    def test_run_fails_at_once(self):
+        task = FakeTask(self.workspace, "sh -c 'sleep 0.2; exit 1'")
+        start = time.time()
+        with self.assertRaises(CommandRunFailed):
+            task.run()
+        assert time.time() - start < task.checking_time
+        assert not task.task_is_running()
+
+    def test_run_without_probe(self):
+        task = FakeTask(self.workspace, "sleep 10")
+        task.checking_time = 0.5
+        task.run()
+        assert task.is_ready() is True
+        task.terminate()
+
+    def test_wait_ready_detects_exit(self):
+        ready_file = os.path.join(self.workspace, "ready")
+        task = FakeTask(self.workspace, "sleep 1", ready_file)
+        task.checking_time = 0.1
+        task.run()
+        start = time.time()
+        assert task.wait_ready(10) is False
+        assert time.time() - start < 5
+
+
+class test_node_runtime(unittest.TestCase):
+
+    def setUp(self):
+        self.home = config.infrasim_home
+        config.infrasim_home = tempfile.mkdtemp()
+        self.workspace = os.path.join(config.infrasim_home, "test")
+        os.makedirs(os.path.join(self.workspace, "etc"))
+
+    def tearDown(self):
+        shutil.rmtree(config.infrasim_home)
+        config.infrasim_home = self.home
+
+    def test_stop_without_model(self):
+        serial_socket = os.path.join(self.workspace, ".serial")
+        open(serial_socket, "w").close()
+        tasks = []
+        for name, priority in [("test-socat", 0), ("test-node", 2)]:
+            task = FakeTask(self.workspace, "sleep 10")
+            task.set_task_name(name)
+            task.set_priority(priority)
+            task.checking_time = 0.5
+            task.run()
+            tasks.append(task)
+        NodeRuntime.save({"name": "test", "compute": {}}, self.workspace, tasks)
+        with open(NodeRuntime.get_manifest_path(self.workspace), "r") as f:
+            manifest = json.load(f)
+        manifest["tasks"][0]["serial_socket"] = serial_socket
+        with open(NodeRuntime.get_manifest_path(self.workspace), "w") as f:
+            json.dump(manifest, f)
+
+        runtime = NodeRuntime.load("test")
+        assert [t.get_task_name() for t in runtime.get_task_list()] == ["test-socat", "test-node"]
+        runtime.status()
+        runtime.stop()
+        for task in tasks:
+            assert not task.task_is_running()
+            assert not os.path.exists(task.get_pid_file())
+        assert not os.path.exists(serial_socket)
+
+    def test_load_other_version(self):
+        assert NodeRuntime.load("test") is None
+        with open(NodeRuntime.get_manifest_path(self.workspace), "w") as f:
+            json.dump({"version": NodeRuntime.VERSION + 1, "name": "test", "tasks": []}, f)
+        assert NodeRuntime.load("test") is None
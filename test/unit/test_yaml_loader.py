@@ -0,0 +1,87 @@
+'''
+*********************************************************
+Copyright @ 2015 EMC Corporation All Rights Reserved
+*********************************************************
+'''
+
+import os
+import shutil
+import tempfile
+import unittest
+import yaml
+from infrasim import yaml_loader
+from infrasim.yaml_loader import YAMLLoader, load_yaml
+
+
+class test_yaml_loader(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.node_yml = os.path.join(self.folder, "node.yml")
+        self.drives_yml = os.path.join(self.folder, "drives.yml")
+        self.write(self.node_yml, "name: node\ncompute:\n  drives: !include drives.yml\n")
+        self.write(self.drives_yml, "- size: 8\n- size: 16\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    @staticmethod
+    def write(path, content):
+        with open(path, "w") as f:
+            f.write(content)
+
+    def touch(self, path, content):
+        # keep mtime changed within a coarse timestamp
+        self.write(path, content)
+        st = os.stat(path)
+        os.utime(path, (st.st_atime, st.st_mtime + 10))
+
+    def test_include(self):
+        with open(self.node_yml, "r") as fp:
+            loader = YAMLLoader(fp)
+            info = loader.get_data()
+        assert info == {"name": "node", "compute": {"drives": [{"size": 8}, {"size": 16}]}}
+        assert [dep for dep, _ in loader.includes] == [self.drives_yml]
+
+    def test_cached_copy(self):
+        info = load_yaml(self.node_yml)
+        info["compute"]["drives"].append({"size": 32})
+        assert load_yaml(self.node_yml)["compute"]["drives"] == [{"size": 8}, {"size": 16}]
+
+        entry = yaml_loader._yaml_cache[self.node_yml]
+        load_yaml(self.node_yml)
+        assert yaml_loader._yaml_cache[self.node_yml] is entry
+
+    def test_invalidated_by_change(self):
+        load_yaml(self.node_yml)
+        self.touch(self.node_yml, "name: other\ncompute:\n  drives: !include drives.yml\n")
+        assert load_yaml(self.node_yml)["name"] == "other"
+
+        self.touch(self.drives_yml, "- size: 4\n")
+        assert load_yaml(self.node_yml)["compute"]["drives"] == [{"size": 4}]
+
+    def test_included_file_removed(self):
+        load_yaml(self.node_yml)
+        os.remove(self.drives_yml)
+        with self.assertRaises(IOError):
+            load_yaml(self.node_yml)
+
+    def test_missing_file(self):
+        with self.assertRaises(IOError):
+            load_yaml(os.path.join(self.folder, "missing.yml"))
+
+    def test_python_tag_refused(self):
+        self.write(self.node_yml, "name: !!python/object/apply:time.time []\n")
+        with self.assertRaises(yaml.constructor.ConstructorError):
+            load_yaml(self.node_yml)
+
+    def test_tags_of_yaml_dump(self):
+        # workspaces written by yaml.dump before
+        info = {u"name": u"node", "slots": (1, 2), "wwn": 0x5000c500852e2971}
+        self.write(self.node_yml, yaml.dump(info, default_flow_style=False))
+        assert load_yaml(self.node_yml) == {"name": "node", "slots": (1, 2), "wwn": 0x5000c500852e2971}
+
+        self.write(self.node_yml, yaml.safe_dump(info, default_flow_style=False))
+        assert "!!" not in open(self.node_yml).read()
+        assert "0x5000c500852e2971" in open(self.node_yml).read()
+        assert load_yaml(self.node_yml) == {"name": "node", "slots": [1, 2], "wwn": 0x5000c500852e2971}